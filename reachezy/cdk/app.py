@@ -9,6 +9,7 @@ from stacks.storage_stack import StorageStack
 from stacks.auth_stack import AuthStack
 from stacks.api_stack import ApiStack
 from stacks.pipeline_stack import PipelineStack
+from stacks.search_stack import SearchStack
 
 app = cdk.App()
 
@@ -60,4 +61,15 @@ pipeline = PipelineStack(
     env=env,
 )
 
+# ---------- 7. Search (OpenSearch Serverless, experimental) ----------
+if str(app.node.try_get_context("opensearch_enabled") or "false").lower() == "true":
+    search = SearchStack(
+        app,
+        "Reachezy-Search",
+        db_instance=database.db_instance,
+        db_secret=database.db_secret,
+        search_clients=[api.brand_search_fn],
+        env=env,
+    )
+
 app.synth()
@@ -122,6 +122,23 @@ class ApiStack(cdk.Stack):
         )
         videos_bucket.grant_put(presign_upload_fn)
 
+        # Batch pipeline mode: start_analysis groups a creator's pending videos into
+        # one execution of the batch state machine (defined in PipelineStack)
+        if str(self.node.try_get_context("batch_pipeline") or "false").lower() == "true":
+            batch_state_machine_arn = self.format_arn(
+                service="states",
+                resource="stateMachine",
+                resource_name="reachezy-video-analysis-batch",
+                arn_format=cdk.ArnFormat.COLON_RESOURCE_NAME,
+            )
+            presign_upload_fn.add_environment("BATCH_STATE_MACHINE_ARN", batch_state_machine_arn)
+            presign_upload_fn.add_to_role_policy(
+                iam.PolicyStatement(
+                    actions=["states:StartExecution"],
+                    resources=[batch_state_machine_arn],
+                )
+            )
+
         # ----- 3. creator_profile — GET/PUT /creator/profile -----
         creator_profile_fn = _lambda.Function(
             self,
@@ -217,6 +234,12 @@ class ApiStack(cdk.Stack):
         db_secret.grant_read(user_auth_fn)
 
         # ----- 8. brand_search — POST /brand/search (Amazon Bedrock-powered) -----
+        search_backend = self.node.try_get_context("search_backend") or "pgvector"
+        search_shadow_backend = self.node.try_get_context("search_shadow_backend") or ""
+        opensearch_endpoint = self.node.try_get_context("opensearch_endpoint") or ""
+        # memory backend: vectors from the S3 snapshot (PipelineStack's SearchSnapshotFn),
+        # held in the container — needs the memory and /tmp to match the catalog
+        search_in_memory = "memory" in (search_backend, search_shadow_backend)
         brand_search_fn = _lambda.Function(
             self,
             "BrandSearchFn",
@@ -225,7 +248,8 @@ class ApiStack(cdk.Stack):
             handler="handler.handler",
             code=_lambda.Code.from_asset(os.path.join(lambdas_dir, "brand_search")),
             layers=[shared_layer],
-            memory_size=512,
+            memory_size=int(self.node.try_get_context("search_memory_mb") or 1769) if search_in_memory else 512,
+            ephemeral_storage_size=cdk.Size.mebibytes(2048) if search_in_memory else None,
             timeout=cdk.Duration.seconds(30),
             environment={
                 **db_env,
@@ -234,9 +258,46 @@ class ApiStack(cdk.Stack):
                 "AI_PROVIDER": ai_provider,
                 "GROQ_API_KEY": groq_api_key,
                 "BEDROCK_ROLE_ARN": bedrock_role_arn,
+                "BEDROCK_FAILOVER_REGIONS": self.node.try_get_context("bedrock_failover_regions") or "",
+                # exact | halfvec | binary — see scripts/bench_search_recall.py
+                "SEARCH_INDEX_MODE": self.node.try_get_context("search_index_mode") or "exact",
+                "SEARCH_CANDIDATES": str(self.node.try_get_context("search_candidates") or 200),
+                # pgvector | opensearch | memory — see scripts/compare_search_backends.py
+                "SEARCH_BACKEND": search_backend,
+                "SEARCH_SHADOW_BACKEND": search_shadow_backend,
+                "SEARCH_SHADOW_SAMPLE_RATE": str(self.node.try_get_context("search_shadow_sample_rate") or 0.1),
+                # Collection endpoint of Reachezy-Search (context, to avoid a cross-stack cycle)
+                "OPENSEARCH_ENDPOINT": opensearch_endpoint,
+                "SEARCH_SNAPSHOT_BUCKET": frames_bucket.bucket_name if search_in_memory else "",
             },
         )
+        self._brand_search_fn = brand_search_fn
         db_secret.grant_read(brand_search_fn)
+        if search_in_memory:
+            frames_bucket.grant_read(brand_search_fn, "search-snapshots/*")
+        # Shadow comparisons run in an async invocation of the function itself
+        # (ARN by name — a grant on brand_search_fn would be a dependency cycle)
+        if search_shadow_backend:
+            brand_search_fn.add_to_role_policy(
+                iam.PolicyStatement(
+                    actions=["lambda:InvokeFunction"],
+                    resources=[self.format_arn(
+                        service="lambda",
+                        resource="function",
+                        resource_name="reachezy-brand-search",
+                        arn_format=cdk.ArnFormat.COLON_RESOURCE_NAME,
+                    )],
+                )
+            )
+        # Data access is granted by SearchStack's access policy (search_clients)
+        if opensearch_endpoint:
+            brand_search_fn.add_to_role_policy(
+                iam.PolicyStatement(
+                    effect=iam.Effect.ALLOW,
+                    actions=["aoss:APIAccessAll"],
+                    resources=["*"],
+                )
+            )
         # Grant Bedrock InvokeModel permission for Nova Lite query parsing
         brand_search_fn.add_to_role_policy(
             iam.PolicyStatement(
@@ -263,11 +324,35 @@ class ApiStack(cdk.Stack):
             handler="handler.handler",
             code=_lambda.Code.from_asset(os.path.join(lambdas_dir, "brand_wishlist")),
             layers=[shared_layer],
+            memory_size=512,
+            timeout=cdk.Duration.seconds(15),
+            environment={
+                **db_env,
+                # GET /brand/wishlist/recommendations searches around the wishlist centroids
+                "SEARCH_INDEX_MODE": self.node.try_get_context("search_index_mode") or "exact",
+                "WISHLIST_MAX_CENTROIDS": str(self.node.try_get_context("wishlist_max_centroids") or 3),
+            },
+        )
+        db_secret.grant_read(brand_wishlist_fn)
+
+        # ----- 10. creator_similar — GET /creator/{id}/similar -----
+        creator_similar_fn = _lambda.Function(
+            self,
+            "CreatorSimilarFn",
+            function_name="reachezy-creator-similar",
+            runtime=_lambda.Runtime.PYTHON_3_12,
+            handler="handler.handler",
+            code=_lambda.Code.from_asset(os.path.join(lambdas_dir, "creator_similar")),
+            layers=[shared_layer],
             memory_size=256,
             timeout=cdk.Duration.seconds(10),
-            environment={**db_env},
+            environment={
+                **db_env,
+                # Used only to build a missing neighbor list on the spot
+                "SEARCH_INDEX_MODE": self.node.try_get_context("search_index_mode") or "exact",
+            },
         )
-        db_secret.grant_read(brand_wishlist_fn)
+        db_secret.grant_read(creator_similar_fn)
 
         # =====================================================================
         # API Gateway
@@ -370,6 +455,15 @@ class ApiStack(cdk.Stack):
             authorization_type=apigw.AuthorizationType.COGNITO,
         )
 
+        # GET /creator/{id}/similar (no API GW auth — custom token validation)
+        creator_id_resource = creator_resource.add_resource("{id}")
+        creator_similar_resource = creator_id_resource.add_resource("similar")
+        creator_similar_resource.add_method(
+            "GET",
+            apigw.LambdaIntegration(creator_similar_fn),
+            authorization_type=apigw.AuthorizationType.NONE,
+        )
+
         # POST /auth/user (no auth — handles signup/login internally)
         auth_user_resource = auth_resource.add_resource("user")
         auth_user_resource.add_method(
@@ -405,6 +499,14 @@ class ApiStack(cdk.Stack):
             authorization_type=apigw.AuthorizationType.NONE,
         )
 
+        # GET /brand/wishlist/recommendations (no API GW auth — custom token validation)
+        wishlist_recommendations_resource = brand_wishlist_resource.add_resource("recommendations")
+        wishlist_recommendations_resource.add_method(
+            "GET",
+            apigw.LambdaIntegration(brand_wishlist_fn),
+            authorization_type=apigw.AuthorizationType.NONE,
+        )
+
         # ---------- CloudFormation Outputs ----------
         cdk.CfnOutput(self, "ApiUrl", value=self._api.url)
 
@@ -413,3 +515,7 @@ class ApiStack(cdk.Stack):
     @property
     def api(self) -> apigw.RestApi:
         return self._api
+
+    @property
+    def brand_search_fn(self) -> _lambda.Function:
+        return self._brand_search_fn
@@ -24,8 +24,23 @@ class PipelineStack(cdk.Stack):
 
     Chain: frame_extractor -> video_analyzer -> embedding_generator -> profile_aggregator
 
+    With `-c fused_extract_analyze=true` the first two steps collapse into a single
+    video_analyzer invocation (fused_handler) that keeps frames in memory:
+    video_analyzer (extract+analyze) -> embedding_generator -> profile_aggregator
+
     Triggered automatically when a new object is created in the videos S3 bucket
     (via EventBridge).
+
+    A second batch state machine runs the same per-video steps for all of a
+    creator's pending uploads inside a Map state and aggregates the profile once.
+
+    With `-c aggregation_queued=true` the per-video AggregateProfile step only
+    enqueues the creator; a scheduled worker aggregates each creator once per
+    upload burst (see profile_aggregator.worker_handler).
+
+    With `-c search_snapshot=true` a scheduled Lambda exports creator vectors
+    to the frames bucket for brand_search's in-memory backend
+    (`-c search_backend=memory` on the API stack).
     """
 
     def __init__(
@@ -106,6 +121,9 @@ class PipelineStack(cdk.Stack):
         groq_api_key = self.node.try_get_context("groq_api_key") or ""
         bedrock_model_id = self.node.try_get_context("bedrock_model_id") or "us.amazon.nova-2-lite-v1:0"
         bedrock_role_arn = self.node.try_get_context("bedrock_role_arn") or ""
+        # Fused mode: extract + analyze in one Lambda (no frame S3 round-trip)
+        fused_extract_analyze = str(self.node.try_get_context("fused_extract_analyze") or "false").lower() == "true"
+        aggregation_queued = str(self.node.try_get_context("aggregation_queued") or "false").lower() == "true"
 
         # Common environment variables
         base_env = {
@@ -115,10 +133,17 @@ class PipelineStack(cdk.Stack):
             "FRAMES_BUCKET": frames_bucket.bucket_name,
             "GUARDRAIL_ID": guardrail.attr_guardrail_id,
             "GUARDRAIL_VERSION": "DRAFT",
+            # "output" (ApplyGuardrail on text only), "input" (guard the multimodal call) or "off"
+            "GUARDRAIL_MODE": self.node.try_get_context("guardrail_mode") or "output",
             "AI_PROVIDER": ai_provider,
             "GROQ_API_KEY": groq_api_key,
             "BEDROCK_MODEL_ID": bedrock_model_id,
             "BEDROCK_ROLE_ARN": bedrock_role_arn,
+            # Comma-separated regions to fail over to while a model's breaker is open
+            "BEDROCK_FAILOVER_REGIONS": self.node.try_get_context("bedrock_failover_regions") or "",
+            "DEDUP_ENABLED": str(self.node.try_get_context("dedup_enabled") or "true").lower(),
+            "DEDUP_PHASH": str(self.node.try_get_context("dedup_phash") or "false").lower(),
+            "ANALYSIS_CACHE_ENABLED": str(self.node.try_get_context("analysis_cache_enabled") or "true").lower(),
         }
 
         # NOTE: Lambdas run outside VPC for hackathon.
@@ -138,25 +163,27 @@ class PipelineStack(cdk.Stack):
             description="Static FFmpeg binary at /opt/bin/ffmpeg for video frame extraction",
         )
 
-        frame_extractor_fn = _lambda.Function(
-            self,
-            "FrameExtractorFn",
-            function_name="reachezy-frame-extractor",
-            runtime=_lambda.Runtime.PYTHON_3_12,
-            handler="handler.handler",
-            code=_lambda.Code.from_asset(os.path.join(lambdas_dir, "frame_extractor")),
-            layers=[shared_layer, ffmpeg_layer],
-            memory_size=512,
-            timeout=cdk.Duration.seconds(120),
-            tracing=_lambda.Tracing.ACTIVE,
-            environment={
-                **base_env,
-                "VIDEOS_BUCKET": videos_bucket.bucket_name,
-            },
-        )
-        db_secret.grant_read(frame_extractor_fn)
-        videos_bucket.grant_read(frame_extractor_fn)
-        frames_bucket.grant_read_write(frame_extractor_fn)
+        frame_extractor_fn = None
+        if not fused_extract_analyze:
+            frame_extractor_fn = _lambda.Function(
+                self,
+                "FrameExtractorFn",
+                function_name="reachezy-frame-extractor",
+                runtime=_lambda.Runtime.PYTHON_3_12,
+                handler="handler.handler",
+                code=_lambda.Code.from_asset(os.path.join(lambdas_dir, "frame_extractor")),
+                layers=[shared_layer, ffmpeg_layer],
+                memory_size=512,
+                timeout=cdk.Duration.seconds(120),
+                tracing=_lambda.Tracing.ACTIVE,
+                environment={
+                    **base_env,
+                    "VIDEOS_BUCKET": videos_bucket.bucket_name,
+                },
+            )
+            db_secret.grant_read(frame_extractor_fn)
+            videos_bucket.grant_read(frame_extractor_fn)
+            frames_bucket.grant_read_write(frame_extractor_fn)
 
         # ----- 2. Video Analyzer (Amazon Nova Lite via Bedrock + Guardrails) -----
         video_analyzer_fn = _lambda.Function(
@@ -164,19 +191,24 @@ class PipelineStack(cdk.Stack):
             "VideoAnalyzerFn",
             function_name="reachezy-video-analyzer",
             runtime=_lambda.Runtime.PYTHON_3_12,
-            handler="handler.handler",
+            handler="handler.fused_handler" if fused_extract_analyze else "handler.handler",
             code=_lambda.Code.from_asset(os.path.join(lambdas_dir, "video_analyzer")),
-            layers=[shared_layer],
+            layers=[shared_layer, ffmpeg_layer] if fused_extract_analyze else [shared_layer],
             memory_size=1024,
-            timeout=cdk.Duration.seconds(180),
+            timeout=cdk.Duration.seconds(240 if fused_extract_analyze else 180),
             tracing=_lambda.Tracing.ACTIVE,
             environment={
                 **base_env,
                 "BEDROCK_REGION": "us-east-1",
+                "VIDEOS_BUCKET": videos_bucket.bucket_name,
             },
         )
         db_secret.grant_read(video_analyzer_fn)
-        frames_bucket.grant_read(video_analyzer_fn)
+        if fused_extract_analyze:
+            videos_bucket.grant_read(video_analyzer_fn)
+            frames_bucket.grant_read_write(video_analyzer_fn)
+        else:
+            frames_bucket.grant_read(video_analyzer_fn)
         # Grant Bedrock InvokeModel permission
         video_analyzer_fn.add_to_role_policy(
             iam.PolicyStatement(
@@ -249,10 +281,130 @@ class PipelineStack(cdk.Stack):
             memory_size=256,
             timeout=cdk.Duration.seconds(60),
             tracing=_lambda.Tracing.ACTIVE,
-            environment={**base_env},
+            environment={
+                **base_env,
+                "AGGREGATION_MODE": "queued" if aggregation_queued else "direct",
+                "AGGREGATION_DEBOUNCE_SECONDS": str(self.node.try_get_context("aggregation_debounce_seconds") or 30),
+                "AGGREGATION_MAX_DELAY_SECONDS": str(self.node.try_get_context("aggregation_max_delay_seconds") or 120),
+            },
         )
         db_secret.grant_read(profile_aggregator_fn)
 
+        # ----- 4b. Aggregation worker (queued mode) — drains aggregation_jobs every minute -----
+        aggregation_worker_fn = None
+        if aggregation_queued:
+            aggregation_worker_fn = _lambda.Function(
+                self,
+                "AggregationWorkerFn",
+                function_name="reachezy-aggregation-worker",
+                runtime=_lambda.Runtime.PYTHON_3_12,
+                handler="handler.worker_handler",
+                code=_lambda.Code.from_asset(os.path.join(lambdas_dir, "profile_aggregator")),
+                layers=[shared_layer],
+                memory_size=256,
+                timeout=cdk.Duration.seconds(120),
+                tracing=_lambda.Tracing.ACTIVE,
+                environment={**base_env},
+            )
+            db_secret.grant_read(aggregation_worker_fn)
+            events.Rule(
+                self,
+                "AggregationWorkerSchedule",
+                rule_name="reachezy-aggregation-worker",
+                schedule=events.Schedule.rate(cdk.Duration.minutes(1)),
+                targets=[events_targets.LambdaFunction(aggregation_worker_fn)],
+            )
+
+        search_index_mode = self.node.try_get_context("search_index_mode") or "exact"
+
+        # ----- 4c. Outbox consumer — fans change_outbox rows out to search + caches -----
+        outbox_consumer_fn = _lambda.Function(
+            self,
+            "OutboxConsumerFn",
+            function_name="reachezy-outbox-consumer",
+            runtime=_lambda.Runtime.PYTHON_3_12,
+            handler="handler.handler",
+            code=_lambda.Code.from_asset(os.path.join(lambdas_dir, "outbox_consumer")),
+            layers=[shared_layer],
+            memory_size=256,
+            timeout=cdk.Duration.seconds(120),
+            tracing=_lambda.Tracing.ACTIVE,
+            environment={
+                **base_env,
+                # creator_neighbors refresh searches the same pgvector index as brand_search
+                "SEARCH_INDEX_MODE": search_index_mode,
+            },
+        )
+        db_secret.grant_read(outbox_consumer_fn)
+        events.Rule(
+            self,
+            "OutboxConsumerSchedule",
+            rule_name="reachezy-outbox-consumer",
+            schedule=events.Schedule.rate(cdk.Duration.minutes(1)),
+            targets=[events_targets.LambdaFunction(outbox_consumer_fn)],
+        )
+
+        # ----- 4d. Creator neighbors — nightly full refresh of creator_neighbors -----
+        # Runs every 15 minutes through the night window (01:30-05:30 IST); each
+        # run takes the stalest lists until its time is up, later runs are no-ops
+        neighbor_refresh_fn = _lambda.Function(
+            self,
+            "NeighborRefreshFn",
+            function_name="reachezy-neighbor-refresh",
+            runtime=_lambda.Runtime.PYTHON_3_12,
+            handler="handler.refresh_handler",
+            code=_lambda.Code.from_asset(os.path.join(lambdas_dir, "creator_similar")),
+            layers=[shared_layer],
+            memory_size=256,
+            timeout=cdk.Duration.minutes(10),
+            tracing=_lambda.Tracing.ACTIVE,
+            environment={
+                **base_env,
+                "SEARCH_INDEX_MODE": search_index_mode,
+            },
+        )
+        db_secret.grant_read(neighbor_refresh_fn)
+        events.Rule(
+            self,
+            "NeighborRefreshSchedule",
+            rule_name="reachezy-neighbor-refresh",
+            schedule=events.Schedule.cron(minute="0/15", hour="20-23"),
+            targets=[events_targets.LambdaFunction(neighbor_refresh_fn)],
+        )
+
+        # ----- 4e. Search snapshot — creator vectors to S3 for brand_search's memory backend -----
+        search_snapshot_fn = None
+        if str(self.node.try_get_context("search_snapshot") or "false").lower() == "true":
+            search_snapshot_fn = _lambda.Function(
+                self,
+                "SearchSnapshotFn",
+                function_name="reachezy-search-snapshot",
+                runtime=_lambda.Runtime.PYTHON_3_12,
+                handler="handler.handler",
+                code=_lambda.Code.from_asset(os.path.join(lambdas_dir, "search_snapshot")),
+                layers=[shared_layer],
+                memory_size=1024,
+                ephemeral_storage_size=cdk.Size.mebibytes(2048),
+                timeout=cdk.Duration.minutes(10),
+                tracing=_lambda.Tracing.ACTIVE,
+                environment={
+                    **base_env,
+                    "SEARCH_SNAPSHOT_BUCKET": frames_bucket.bucket_name,
+                },
+            )
+            db_secret.grant_read(search_snapshot_fn)
+            frames_bucket.grant_read_write(search_snapshot_fn, "search-snapshots/*")
+            frames_bucket.grant_delete(search_snapshot_fn, "search-snapshots/*")
+            events.Rule(
+                self,
+                "SearchSnapshotSchedule",
+                rule_name="reachezy-search-snapshot",
+                schedule=events.Schedule.rate(
+                    cdk.Duration.minutes(int(self.node.try_get_context("search_snapshot_minutes") or 15))
+                ),
+                targets=[events_targets.LambdaFunction(search_snapshot_fn)],
+            )
+
         # ----- 5. Error Handler -----
         error_handler_fn = _lambda.Function(
             self,
@@ -279,90 +431,196 @@ class PipelineStack(cdk.Stack):
             "interval": cdk.Duration.seconds(5),
             "max_attempts": 3,
             "backoff_rate": 2.0,
+            # Spread retries so parallel executions don't re-hit a throttled Bedrock in lockstep
+            "jitter_strategy": sfn.JitterType.FULL,
+        }
+        # Model output that failed validation (after the analyzer's own repair call)
+        # won't get better on a retry — fail straight to the error handler.
+        # Must be added before retry_config: retriers are matched in order.
+        no_retry_analysis_config = {
+            "errors": ["AnalysisValidationError"],
+            "max_attempts": 0,
         }
 
-        # Error Catching task
-        error_catch_task = sfn_tasks.LambdaInvoke(
-            self,
-            "HandleError",
-            lambda_function=error_handler_fn,
-            payload_response_only=True,
-        )
+        def build_video_chain(prefix, with_aggregate):
+            """Build the per-video steps; construct IDs are prefixed per state machine.
+
+            with_aggregate=True  : single-video pipeline, ends in AggregateProfile
+            with_aggregate=False : batch Map item, ends after embedding
+            """
+            # Error Catching task
+            error_catch_task = sfn_tasks.LambdaInvoke(
+                self,
+                f"{prefix}HandleError",
+                lambda_function=error_handler_fn,
+                payload_response_only=True,
+            )
 
-        catch_props = {
-            "errors": ["States.ALL"],
-            "handler": error_catch_task,
-            "result_path": "$.errorInfo"
-        }
+            catch_props = {
+                "errors": ["States.ALL"],
+                "handler": error_catch_task,
+                "result_path": "$.errorInfo"
+            }
+
+            if fused_extract_analyze:
+                # Steps 1+2 — Extract frames in memory and analyze them in one invocation
+                analyze_task = sfn_tasks.LambdaInvoke(
+                    self,
+                    f"{prefix}ExtractAndAnalyzeVideo",
+                    lambda_function=video_analyzer_fn,
+                    result_path="$.analyzeResult",
+                    payload_response_only=True,
+                )
+                analyze_task.add_retry(**no_retry_analysis_config)
+                analyze_task.add_retry(**retry_config)
+                analyze_task.add_catch(**catch_props)
+                first_task = analyze_task
+                dedup_result_path = "$.analyzeResult"
+            else:
+                # Step 1 — Extract frames from uploaded video
+                extract_task = sfn_tasks.LambdaInvoke(
+                    self,
+                    f"{prefix}ExtractFrames",
+                    lambda_function=frame_extractor_fn,
+                    result_path="$.extractResult",
+                    payload_response_only=True,
+                )
+                extract_task.add_retry(**retry_config)
+                extract_task.add_catch(**catch_props)
+
+                # Step 2 — Analyze video frames with AI (Bedrock or Groq)
+                analyze_task = sfn_tasks.LambdaInvoke(
+                    self,
+                    f"{prefix}AnalyzeVideo",
+                    lambda_function=video_analyzer_fn,
+                    payload=sfn.TaskInput.from_object({
+                        "video_id": sfn.JsonPath.string_at("$.extractResult.video_id"),
+                        "creator_id": sfn.JsonPath.string_at("$.extractResult.creator_id"),
+                        "frame_keys": sfn.JsonPath.list_at("$.extractResult.frame_keys"),
+                        "duration_seconds": sfn.JsonPath.number_at("$.extractResult.duration_seconds"),
+                    }),
+                    result_path="$.analyzeResult",
+                    payload_response_only=True,
+                )
+                analyze_task.add_retry(**no_retry_analysis_config)
+                analyze_task.add_retry(**retry_config)
+                analyze_task.add_catch(**catch_props)
+                first_task = extract_task
+                dedup_result_path = "$.extractResult"
+
+            # Step 3 — Generate embeddings
+            embed_task = sfn_tasks.LambdaInvoke(
+                self,
+                f"{prefix}GenerateEmbeddings",
+                lambda_function=embedding_generator_fn,
+                payload=sfn.TaskInput.from_object({
+                    "video_id": sfn.JsonPath.string_at("$.analyzeResult.video_id"),
+                    "creator_id": sfn.JsonPath.string_at("$.analyzeResult.creator_id"),
+                    "analysis": sfn.JsonPath.object_at("$.analyzeResult.analysis"),
+                }),
+                result_path="$.embedResult",
+                payload_response_only=True,
+            )
+            embed_task.add_retry(**retry_config)
+            embed_task.add_catch(**catch_props)
+
+            # Re-uploaded content (see shared/dedup.py) already has its analysis and
+            # embedding copied — skip straight to aggregation
+            skip_duplicate = sfn.Pass(
+                self,
+                f"{prefix}SkipDuplicateVideo",
+                parameters={
+                    "video_id.$": f"{dedup_result_path}.video_id",
+                    "creator_id.$": f"{dedup_result_path}.creator_id",
+                },
+                result_path="$.embedResult",
+            )
+            is_duplicate = sfn.Condition.and_(
+                sfn.Condition.is_present(f"{dedup_result_path}.dedup_hit"),
+                sfn.Condition.boolean_equals(f"{dedup_result_path}.dedup_hit", True),
+            )
+            dedup_choice = sfn.Choice(self, f"{prefix}IsDuplicateVideo")
+            if fused_extract_analyze:
+                remaining = embed_task
+            else:
+                remaining = analyze_task.next(embed_task)
+
+            if with_aggregate:
+                # Step 4 — Aggregate results into creator profile
+                aggregate_task = sfn_tasks.LambdaInvoke(
+                    self,
+                    f"{prefix}AggregateProfile",
+                    lambda_function=profile_aggregator_fn,
+                    payload=sfn.TaskInput.from_object({
+                        "video_id": sfn.JsonPath.string_at("$.embedResult.video_id"),
+                        "creator_id": sfn.JsonPath.string_at("$.embedResult.creator_id"),
+                    }),
+                    result_path="$.aggregateResult",
+                    payload_response_only=True,
+                )
+                aggregate_task.add_retry(**retry_config)
+                aggregate_task.add_catch(**catch_props)
+                remaining = remaining.next(aggregate_task)
+                skip_duplicate.next(aggregate_task)
 
-        # Step 1 — Extract frames from uploaded video
-        extract_task = sfn_tasks.LambdaInvoke(
-            self,
-            "ExtractFrames",
-            lambda_function=frame_extractor_fn,
-            result_path="$.extractResult",
-            payload_response_only=True,
-        )
-        extract_task.add_retry(**retry_config)
-        extract_task.add_catch(**catch_props)
+            dedup_choice.when(is_duplicate, skip_duplicate)
+            dedup_choice.otherwise(remaining)
+
+            # Chain: extract -> [dedup?] -> analyze -> embed (-> aggregate)
+            return first_task.next(dedup_choice)
+
+        chain = build_video_chain("", with_aggregate=True)
 
-        # Step 2 — Analyze video frames with AI (Bedrock or Groq)
-        analyze_task = sfn_tasks.LambdaInvoke(
+        self._state_machine = sfn.StateMachine(
             self,
-            "AnalyzeVideo",
-            lambda_function=video_analyzer_fn,
-            payload=sfn.TaskInput.from_object({
-                "video_id": sfn.JsonPath.string_at("$.extractResult.video_id"),
-                "creator_id": sfn.JsonPath.string_at("$.extractResult.creator_id"),
-                "frame_keys": sfn.JsonPath.list_at("$.extractResult.frame_keys"),
-                "duration_seconds": sfn.JsonPath.number_at("$.extractResult.duration_seconds"),
-            }),
-            result_path="$.analyzeResult",
-            payload_response_only=True,
+            "VideoAnalysisPipeline",
+            state_machine_name="reachezy-video-analysis",
+            definition_body=sfn.DefinitionBody.from_chainable(chain),
+            timeout=cdk.Duration.minutes(15),
+            tracing_enabled=True,
         )
-        analyze_task.add_retry(**retry_config)
-        analyze_task.add_catch(**catch_props)
 
-        # Step 3 — Generate embeddings
-        embed_task = sfn_tasks.LambdaInvoke(
+        # =====================================================================
+        # Batch State Machine — one execution per creator upload batch
+        # =====================================================================
+        # presign_upload starts this (when BATCH_STATE_MACHINE_ARN is set) with
+        #   { creator_id, videos: [{ source_bucket, s3_key, video_id, creator_id }, ...] }
+        # Videos fan out through a Map state with bounded concurrency, then the
+        # creator profile is aggregated once instead of once per video.
+        batch_max_concurrency = int(self.node.try_get_context("batch_max_concurrency") or 4)
+
+        batch_map = sfn.Map(
             self,
-            "GenerateEmbeddings",
-            lambda_function=embedding_generator_fn,
-            payload=sfn.TaskInput.from_object({
-                "video_id": sfn.JsonPath.string_at("$.analyzeResult.video_id"),
-                "creator_id": sfn.JsonPath.string_at("$.analyzeResult.creator_id"),
-                "analysis": sfn.JsonPath.object_at("$.analyzeResult.analysis"),
-            }),
-            result_path="$.embedResult",
-            payload_response_only=True,
+            "AnalyzeVideoBatch",
+            items_path="$.videos",
+            max_concurrency=batch_max_concurrency,
+            result_path="$.videoResults",
         )
-        embed_task.add_retry(**retry_config)
-        embed_task.add_catch(**catch_props)
+        batch_map.item_processor(build_video_chain("Batch", with_aggregate=False))
 
-        # Step 4 — Aggregate results into creator profile
-        aggregate_task = sfn_tasks.LambdaInvoke(
+        batch_aggregate_task = sfn_tasks.LambdaInvoke(
             self,
-            "AggregateProfile",
+            "BatchAggregateProfile",
             lambda_function=profile_aggregator_fn,
             payload=sfn.TaskInput.from_object({
-                "video_id": sfn.JsonPath.string_at("$.embedResult.video_id"),
-                "creator_id": sfn.JsonPath.string_at("$.embedResult.creator_id"),
+                "video_id": sfn.JsonPath.string_at("$.videos[0].video_id"),
+                "creator_id": sfn.JsonPath.string_at("$.creator_id"),
+                # The batch is already coalesced — never wait on the aggregation queue
+                "immediate": True,
             }),
             result_path="$.aggregateResult",
             payload_response_only=True,
         )
-        aggregate_task.add_retry(**retry_config)
-        aggregate_task.add_catch(**catch_props)
+        batch_aggregate_task.add_retry(**retry_config)
 
-        # Chain: extract -> analyze -> embed -> aggregate
-        chain = extract_task.next(analyze_task).next(embed_task).next(aggregate_task)
-
-        self._state_machine = sfn.StateMachine(
+        self._batch_state_machine = sfn.StateMachine(
             self,
-            "VideoAnalysisPipeline",
-            state_machine_name="reachezy-video-analysis",
-            definition_body=sfn.DefinitionBody.from_chainable(chain),
-            timeout=cdk.Duration.minutes(15),
+            "VideoAnalysisBatchPipeline",
+            state_machine_name="reachezy-video-analysis-batch",
+            definition_body=sfn.DefinitionBody.from_chainable(
+                batch_map.next(batch_aggregate_task)
+            ),
+            timeout=cdk.Duration.minutes(60),
             tracing_enabled=True,
         )
 
@@ -423,6 +681,14 @@ class PipelineStack(cdk.Stack):
                         statistic="Sum", period=cdk.Duration.minutes(5)
                     ),
                 ],
+                right=[
+                    self._batch_state_machine.metric_started(
+                        statistic="Sum", period=cdk.Duration.minutes(5)
+                    ),
+                    self._batch_state_machine.metric_failed(
+                        statistic="Sum", period=cdk.Duration.minutes(5)
+                    ),
+                ],
             )
         )
 
@@ -432,7 +698,12 @@ class PipelineStack(cdk.Stack):
             ("VideoAnalyzer", video_analyzer_fn),
             ("EmbeddingGenerator", embedding_generator_fn),
             ("ProfileAggregator", profile_aggregator_fn),
+            ("AggregationWorker", aggregation_worker_fn),
+            ("OutboxConsumer", outbox_consumer_fn),
+            ("NeighborRefresh", neighbor_refresh_fn),
+            ("SearchSnapshot", search_snapshot_fn),
         ]
+        lambda_fns = [(label, fn) for label, fn in lambda_fns if fn is not None]
         dashboard.add_widgets(
             cloudwatch.GraphWidget(
                 title="Lambda Duration (ms)",
@@ -489,10 +760,101 @@ class PipelineStack(cdk.Stack):
         )
         sfn_failure_alarm.add_alarm_action(cw_actions.SnsAction(alarm_topic))
 
+        # Widget 4: Re-upload dedup hit rate (EMF metrics from shared/dedup.py)
+        dedup_hits = cloudwatch.Metric(
+            namespace="ReachEzy/Pipeline",
+            metric_name="DedupHit",
+            statistic="Sum",
+            period=cdk.Duration.hours(1),
+        )
+        dedup_misses = cloudwatch.Metric(
+            namespace="ReachEzy/Pipeline",
+            metric_name="DedupMiss",
+            statistic="Sum",
+            period=cdk.Duration.hours(1),
+        )
+        dashboard.add_widgets(
+            cloudwatch.GraphWidget(
+                title="Re-upload Dedup",
+                width=24,
+                left=[dedup_hits, dedup_misses],
+                right=[
+                    cloudwatch.MathExpression(
+                        expression="100 * hits / (hits + misses)",
+                        using_metrics={"hits": dedup_hits, "misses": dedup_misses},
+                        label="Dedup hit rate (%)",
+                        period=cdk.Duration.hours(1),
+                    )
+                ],
+            )
+        )
+
+        # Widget 5: Analysis cache (EMF metrics from shared/analysis_cache.py)
+        dashboard.add_widgets(
+            cloudwatch.GraphWidget(
+                title="Analysis Cache",
+                width=24,
+                left=[
+                    cloudwatch.Metric(
+                        namespace="ReachEzy/Pipeline",
+                        metric_name=name,
+                        statistic="Sum",
+                        period=cdk.Duration.hours(1),
+                    )
+                    for name in ("AnalysisCacheHit", "AnalysisCacheMiss")
+                ],
+            )
+        )
+
+        # Widget 6: Bedrock throttling + circuit breakers (shared/bedrock_client.py)
+        dashboard.add_widgets(
+            cloudwatch.GraphWidget(
+                title="Bedrock Throttling",
+                width=24,
+                left=[
+                    cloudwatch.MathExpression(
+                        expression=f"SUM(SEARCH('{{ReachEzy/Pipeline,ModelId}} MetricName=\"{name}\"', 'Sum', 300))",
+                        label=name,
+                        period=cdk.Duration.minutes(5),
+                    )
+                    for name in ("BedrockThrottle", "BedrockBreakerOpen", "BedrockCircuitRejected")
+                ],
+            )
+        )
+
+        # Widget 7: Aggregation queue (EMF metrics from profile_aggregator, queued mode)
+        if aggregation_queued:
+            dashboard.add_widgets(
+                cloudwatch.GraphWidget(
+                    title="Profile Aggregation Queue",
+                    width=24,
+                    left=[
+                        cloudwatch.Metric(
+                            namespace="ReachEzy/Pipeline",
+                            metric_name=name,
+                            statistic="Sum",
+                            period=cdk.Duration.minutes(5),
+                        )
+                        for name in ("AggregationQueued", "AggregationCoalesced", "AggregationFailed")
+                    ],
+                    right=[
+                        cloudwatch.Metric(
+                            namespace="ReachEzy/Pipeline",
+                            metric_name="AggregationRequestsPerRun",
+                            statistic="Average",
+                            period=cdk.Duration.minutes(5),
+                        )
+                    ],
+                )
+            )
+
         # ---------- CloudFormation Outputs ----------
         cdk.CfnOutput(
             self, "StateMachineArn", value=self._state_machine.state_machine_arn
         )
+        cdk.CfnOutput(
+            self, "BatchStateMachineArn", value=self._batch_state_machine.state_machine_arn
+        )
         cdk.CfnOutput(
             self, "GuardrailId", value=guardrail.attr_guardrail_id
         )
@@ -505,3 +867,7 @@ class PipelineStack(cdk.Stack):
     @property
     def state_machine(self) -> sfn.StateMachine:
         return self._state_machine
+
+    @property
+    def batch_state_machine(self) -> sfn.StateMachine:
+        return self._batch_state_machine
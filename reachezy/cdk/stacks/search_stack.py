@@ -1,7 +1,9 @@
 """SearchStack — Amazon OpenSearch Serverless for vector search (experimental).
 
 Feature-flagged: only deployed when `opensearch_enabled=true` is passed via CDK context.
-SQL search (pgvector) remains the primary search path; OpenSearch is additive.
+SQL search (pgvector) remains the default search path; brand_search queries the
+collection when deployed with `search_backend=opensearch` (or as a shadow backend)
+and `opensearch_endpoint=<CollectionEndpoint output>`.
 """
 
 import os
@@ -11,6 +13,8 @@ import aws_cdk.aws_rds as rds
 import aws_cdk.aws_lambda as _lambda
 import aws_cdk.aws_secretsmanager as secretsmanager
 import aws_cdk.aws_iam as iam
+import aws_cdk.aws_events as events
+import aws_cdk.aws_events_targets as events_targets
 import aws_cdk.aws_opensearchserverless as oss
 
 
@@ -23,6 +27,7 @@ class SearchStack(cdk.Stack):
         construct_id: str,
         db_instance: rds.DatabaseInstance,
         db_secret: secretsmanager.ISecret,
+        search_clients: list = None,
         **kwargs,
     ) -> None:
         super().__init__(scope, construct_id, **kwargs)
@@ -64,7 +69,7 @@ class SearchStack(cdk.Stack):
         self._collection.add_dependency(network_policy)
 
         # =====================================================================
-        # OpenSearch Sync Lambda — indexes creator profiles after aggregation
+        # OpenSearch Sync Lambda — drains search_sync_queue with the _bulk API
         # =====================================================================
 
         shared_layer = _lambda.LayerVersion(
@@ -84,8 +89,8 @@ class SearchStack(cdk.Stack):
             handler="handler.handler",
             code=_lambda.Code.from_asset(os.path.join(lambdas_dir, "opensearch_sync")),
             layers=[shared_layer],
-            memory_size=256,
-            timeout=cdk.Duration.seconds(60),
+            memory_size=512,
+            timeout=cdk.Duration.minutes(5),
             environment={
                 "DB_HOST": db_instance.db_instance_endpoint_address,
                 "DB_NAME": "reachezy",
@@ -96,6 +101,15 @@ class SearchStack(cdk.Stack):
         )
         db_secret.grant_read(sync_fn)
 
+        # Drain the sync queue every minute; full reindex: invoke with {"action": "reindex"}
+        events.Rule(
+            self,
+            "OpenSearchSyncSchedule",
+            rule_name="reachezy-opensearch-sync",
+            schedule=events.Schedule.rate(cdk.Duration.minutes(1)),
+            targets=[events_targets.LambdaFunction(sync_fn)],
+        )
+
         # Grant AOSS data access
         sync_fn.add_to_role_policy(
             iam.PolicyStatement(
@@ -105,13 +119,15 @@ class SearchStack(cdk.Stack):
             )
         )
 
-        # Data access policy
+        # Data access policy — the sync Lambda plus Lambdas that query the
+        # index (search_clients, e.g. brand_search with SEARCH_BACKEND=opensearch)
+        principals = ",".join(f'"{fn.role.role_arn}"' for fn in [sync_fn, *(search_clients or [])])
         oss.CfnAccessPolicy(
             self,
             "DataAccessPolicy",
             name="reachezy-data-access",
             type="data",
-            policy=f'[{{"Rules":[{{"ResourceType":"index","Resource":["index/reachezy-creators/*"],"Permission":["aoss:*"]}},{{"ResourceType":"collection","Resource":["collection/reachezy-creators"],"Permission":["aoss:*"]}}],"Principal":["{sync_fn.role.role_arn}"]}}]',
+            policy=f'[{{"Rules":[{{"ResourceType":"index","Resource":["index/reachezy-creators/*"],"Permission":["aoss:*"]}},{{"ResourceType":"collection","Resource":["collection/reachezy-creators"],"Permission":["aoss:*"]}}],"Principal":[{principals}]}}]',
         )
 
         # ---------- Outputs ----------
@@ -2,30 +2,49 @@
 
 Search flow:
   1. Parse query with AI (Bedrock Nova / Groq / basic_parse)
-  2. Embed query with Titan → pgvector cosine similarity against creator embeddings
-  3. Apply hard filters (city, follower range)
-  4. Fall back to text-based scoring if embedding fails
+  2. Embed query with Titan → nearest creator aggregate embeddings from the
+     SEARCH_BACKEND (shared/search_backends.py): pgvector HNSW (default),
+     OpenSearch filtered k-NN, or an in-memory NumPy index
+  3. Hard filters (city, follower range) are applied inside the vector search
+  4. Load the matching creators + rate cards from Postgres
+  5. Fall back to pgvector, then to text-based scoring, if a step fails
+
+SEARCH_SHADOW_BACKEND runs a second backend on a sample of searches and logs
+result overlap and latency against the primary. The comparison runs in a
+separate asynchronous invocation of this function, off the request path.
 
 Fallback chain for parsing: Bedrock (Nova 2 → Nova v1) → Groq → basic_parse
 """
 
 import os
 import json
-import hashlib
-import math
+import random
+import time
 import boto3
-import requests as http_requests
 from shared.db import get_db_connection
 from shared.auth import get_user_from_token
-from shared.bedrock_client import get_bedrock_client
+from shared.embeddings import EMBEDDING_MODEL_ID, embed_text, hash_embedding
+from shared.llm_providers import LLMChainError, LLMRequest, build_chain, complete_sync, env_float
+from shared.metrics import emit_metric
+from shared.search_backends import compare_hits, get_backend
 
 # --- Provider config ---
 AI_PROVIDER = os.environ.get("AI_PROVIDER", "bedrock")  # "bedrock" or "groq"
 
-# --- OpenSearch config (experimental, feature-flagged) ---
-OPENSEARCH_ENDPOINT = os.environ.get("OPENSEARCH_ENDPOINT", "")
-OPENSEARCH_INDEX = os.environ.get("OPENSEARCH_INDEX", "creator-profiles")
-OPENSEARCH_ENABLED = os.environ.get("OPENSEARCH_ENABLED", "false").lower() == "true"
+# --- Search backend (see shared/search_backends.py) ---
+# "pgvector" (default), "opensearch" or "memory"; OPENSEARCH_ENABLED=true is the
+# older spelling of SEARCH_BACKEND=opensearch
+SEARCH_BACKEND = os.environ.get("SEARCH_BACKEND") or (
+    "opensearch" if os.environ.get("OPENSEARCH_ENABLED", "false").lower() == "true" else "pgvector"
+)
+# Shadow mode: also run this backend on a sample of searches and log how its
+# results and latency compare with SEARCH_BACKEND (not returned to the client).
+# Runs in an async ("Event") invocation of this function so it adds no latency.
+SEARCH_SHADOW_BACKEND = os.environ.get("SEARCH_SHADOW_BACKEND", "")
+SEARCH_SHADOW_SAMPLE_RATE = env_float("SEARCH_SHADOW_SAMPLE_RATE", 0.1)
+# Treat the parsed niche as a hard filter (it otherwise only shapes the embedding)
+SEARCH_NICHE_FILTER = os.environ.get("SEARCH_NICHE_FILTER", "false").lower() == "true"
+SEARCH_RESULT_LIMIT = 50
 
 # Bedrock config — Nova 2 Lite primary, Nova Lite v1 fallback
 BEDROCK_REGION = os.environ.get("BEDROCK_REGION", "us-east-1")
@@ -34,11 +53,19 @@ BEDROCK_MODEL_FALLBACKS = [
     BEDROCK_MODEL_ID,
     "amazon.nova-lite-v1:0",  # v1 fallback
 ]
+# Search is behind API Gateway's 29s timeout — back off at most once per model,
+# bound the whole parse chain, and optionally hedge a slow model with the next one
+SEARCH_BEDROCK_RETRIES = int(os.environ.get("SEARCH_BEDROCK_RETRIES", "1"))
+SEARCH_LLM_DEADLINE = env_float("SEARCH_LLM_DEADLINE_SECONDS", 12)
+SEARCH_HEDGE_AFTER = env_float("SEARCH_HEDGE_AFTER_SECONDS")
+
+# Titan vectors for recent query texts (oldest evicted first)
+QUERY_EMBEDDING_CACHE_SIZE = 256
+_query_embedding_cache = {}
 
 # Groq config (OpenAI-compatible API)
 GROQ_API_KEY = os.environ.get("GROQ_API_KEY", "")
 GROQ_MODEL = os.environ.get("GROQ_MODEL", "openai/gpt-oss-120b")
-GROQ_ENDPOINT = "https://api.groq.com/openai/v1/chat/completions"
 
 CORS_HEADERS = {
     "Access-Control-Allow-Origin": "*",
@@ -80,113 +107,47 @@ Rules:
 Query: """
 
 
-def _parse_query_with_bedrock(query):
-    """Use Amazon Bedrock with model fallback chain (Nova 2 → Nova v1)."""
-    bedrock = get_bedrock_client(region=BEDROCK_REGION)
-
-    guardrail_kwargs = {}
+def _parse_query(query):
+    """Route to AI provider with automatic fallback chain:
+    Bedrock (Nova 2 → v1) → Groq → basic_parse
+    """
+    guardrail_config = None
     guardrail_id = os.environ.get("GUARDRAIL_ID")
-    guardrail_version = os.environ.get("GUARDRAIL_VERSION", "DRAFT")
     if guardrail_id:
-        guardrail_kwargs["guardrailConfig"] = {
+        guardrail_config = {
             "guardrailIdentifier": guardrail_id,
-            "guardrailVersion": guardrail_version,
+            "guardrailVersion": os.environ.get("GUARDRAIL_VERSION", "DRAFT"),
         }
 
-    last_error = None
-    for model_id in BEDROCK_MODEL_FALLBACKS:
-        try:
-            print(f"Trying Bedrock model: {model_id}")
-            response = bedrock.converse(
-                modelId=model_id,
-                messages=[{
-                    "role": "user",
-                    "content": [{"text": PARSE_PROMPT + query}],
-                }],
-                inferenceConfig={
-                    "maxTokens": 512,
-                    "temperature": 0.1,
-                },
-                **guardrail_kwargs,
-            )
-
-            raw_text = response["output"]["message"]["content"][0]["text"]
-            result = _extract_json(raw_text)
-            print(f"Success with Bedrock model {model_id}")
-            return result
-
-        except Exception as e:
-            # If guardrail is the problem, retry without it
-            if "guardrail" in str(e).lower() and guardrail_kwargs:
-                print(f"Guardrail error with {model_id}, retrying without guardrail: {e}")
-                try:
-                    response = bedrock.converse(
-                        modelId=model_id,
-                        messages=[{
-                            "role": "user",
-                            "content": [{"text": PARSE_PROMPT + query}],
-                        }],
-                        inferenceConfig={"maxTokens": 512, "temperature": 0.1},
-                    )
-                    raw_text = response["output"]["message"]["content"][0]["text"]
-                    result = _extract_json(raw_text)
-                    print(f"Success with Bedrock model {model_id} (no guardrail)")
-                    return result
-                except Exception as e2:
-                    last_error = e2
-                    print(f"Bedrock model {model_id} also failed without guardrail: {e2}")
-                    continue
-            last_error = e
-            print(f"Bedrock model {model_id} failed: {e}")
-            continue
-
-    print(f"All Bedrock models failed, last error: {last_error}")
-    raise last_error
-
-
-def _parse_query_with_groq(query):
-    """Use Groq inference API to parse a natural language query."""
-    resp = http_requests.post(
-        GROQ_ENDPOINT,
-        headers={
-            "Authorization": f"Bearer {GROQ_API_KEY}",
-            "Content-Type": "application/json",
-        },
-        json={
-            "model": GROQ_MODEL,
-            "max_tokens": 512,
-            "temperature": 0.1,
-            "messages": [{"role": "user", "content": PARSE_PROMPT + query}],
-        },
-        timeout=30,
+    chain = build_chain(
+        AI_PROVIDER,
+        bedrock_models=BEDROCK_MODEL_FALLBACKS,
+        bedrock_region=BEDROCK_REGION,
+        groq_model=GROQ_MODEL,
+        groq_api_key=GROQ_API_KEY,
+        groq_timeout=SEARCH_LLM_DEADLINE,
+    )
+    request = LLMRequest(
+        [{"text": PARSE_PROMPT + query}],
+        max_tokens=512,
+        temperature=0.1,
+        guardrail_config=guardrail_config,
+        max_retries=SEARCH_BEDROCK_RETRIES,
     )
 
-    if not resp.ok:
-        raise RuntimeError(f"Groq API error: {resp.status_code} {resp.text[:500]}")
-
-    raw_text = resp.json()["choices"][0]["message"]["content"]
-    return _extract_json(raw_text)
-
-
-def _parse_query(query):
-    """Route to AI provider with automatic fallback chain:
-    Bedrock (Nova 2 → v1) → Groq → basic_parse
-    """
-    # Try Bedrock first (if configured as primary)
-    if AI_PROVIDER != "groq":
-        try:
-            print(f"Attempting Bedrock for query parsing")
-            return _parse_query_with_bedrock(query)
-        except Exception as e:
-            print(f"Bedrock failed entirely: {e}, trying Groq fallback")
-
-    # Try Groq as fallback (or primary if AI_PROVIDER=groq)
-    if GROQ_API_KEY:
-        try:
-            print(f"Attempting Groq ({GROQ_MODEL}) for query parsing")
-            return _parse_query_with_groq(query)
-        except Exception as e:
-            print(f"Groq failed: {e}, falling back to basic_parse")
+    try:
+        # A response that isn't valid JSON moves on to the next provider
+        result = complete_sync(
+            request,
+            chain,
+            parse=_extract_json,
+            deadline=SEARCH_LLM_DEADLINE,
+            hedge_after=SEARCH_HEDGE_AFTER,
+        )
+        print(f"Query parsed by {result.provider}/{result.model_id} in {result.latency_ms}ms")
+        return result.parsed
+    except LLMChainError as e:
+        print(f"{e}, falling back to basic_parse")
 
     # Last resort: keyword-based parsing
     print("All AI providers failed, using basic_parse")
@@ -276,86 +237,119 @@ def _generate_query_embedding(text):
     """Generate a Titan embedding for the search query.
 
     Uses same model + dimensions as embedding_generator (Titan V2, 1024d).
-    Falls back to hash-based embedding if Titan is unavailable.
+    Falls back to hash-based embedding if Titan is unavailable. Repeated
+    queries in a warm container reuse the previous Titan vector.
     """
-    embedding_dim = 1024
-    embedding_model = "amazon.titan-embed-text-v2:0"
+    cached = _query_embedding_cache.get(text)
+    if cached is not None:
+        print("Query embedding served from container cache")
+        return cached
+
+    embedding, model_id = embed_text(
+        text,
+        region=BEDROCK_REGION,
+        fallback=hash_embedding,
+        use_store=False,
+        max_retries=SEARCH_BEDROCK_RETRIES,
+    )
+    if model_id == EMBEDDING_MODEL_ID:
+        print("Query embedding generated via Titan")
+        if len(_query_embedding_cache) >= QUERY_EMBEDDING_CACHE_SIZE:
+            _query_embedding_cache.pop(next(iter(_query_embedding_cache)))
+        _query_embedding_cache[text] = embedding
+    return embedding
+
+
+def _search_filters(parsed):
+    """Hard filters for the vector backends (city, followers; niche if enabled)."""
+    filters = {
+        "city": parsed.get("city"),
+        "min_followers": parsed.get("min_followers"),
+        "max_followers": parsed.get("max_followers"),
+    }
+    if SEARCH_NICHE_FILTER:
+        filters["niche"] = parsed.get("niche")
+    return filters
+
+
+def _backend_search(name, query_embedding, filters):
+    """Run one backend, emitting its latency. Returns (hits, latency_ms)."""
+    start = time.perf_counter()
+    hits = get_backend(name).search(query_embedding, filters, SEARCH_RESULT_LIMIT)
+    latency_ms = round((time.perf_counter() - start) * 1000, 1)
+    emit_metric("SearchBackendLatency", latency_ms, unit="Milliseconds", dimensions={"Backend": name})
+    return hits, latency_ms
+
+
+def _hydrate(cur, hits):
+    """Creator rows for [(creator_id, similarity)], in hit order, similarity last."""
+    if not hits:
+        return []
+    cur.execute(
+        """
+        SELECT c.id, c.username, c.display_name, c.bio, c.niche, c.city,
+               c.followers_count, c.media_count, c.profile_picture_url,
+               c.style_profile,
+               r.reel_rate, r.story_rate, r.post_rate, r.accepts_barter
+        FROM creators c
+        LEFT JOIN rate_cards r ON r.creator_id = c.id
+        WHERE c.id = ANY(%s::uuid[])
+        """,
+        ([creator_id for creator_id, _ in hits],),
+    )
+    rows = {str(row[0]): row for row in cur.fetchall()}
+    return [(*rows[creator_id], similarity) for creator_id, similarity in hits if creator_id in rows]
+
 
+def _dispatch_shadow(context, query_embedding, filters, primary, primary_hits, primary_ms):
+    """Hand the shadow comparison to an async invocation of this function."""
     try:
-        bedrock = get_bedrock_client(region=BEDROCK_REGION)
-        response = bedrock.invoke_model(
-            modelId=embedding_model,
-            contentType="application/json",
-            accept="application/json",
-            body=json.dumps({
-                "inputText": text,
-                "dimensions": embedding_dim,
-                "normalize": True,
+        boto3.client("lambda").invoke(
+            FunctionName=context.invoked_function_arn,
+            InvocationType="Event",
+            Payload=json.dumps({
+                "shadow_search": {
+                    "query_embedding": [float(x) for x in query_embedding],
+                    "filters": filters,
+                    "primary": primary,
+                    "primary_hits": primary_hits,
+                    "primary_ms": primary_ms,
+                }
             }),
         )
-        result = json.loads(response["body"].read())
-        print("Query embedding generated via Titan")
-        return result["embedding"]
     except Exception as e:
-        print(f"Titan embedding failed ({e}), using hash-based fallback")
-        return _hash_embedding(text, embedding_dim)
-
-
-def _hash_embedding(text, dim=1024):
-    """Deterministic hash-based embedding fallback (mirrors embedding_generator)."""
-    values = []
-    seed = text.encode("utf-8")
-    while len(values) < dim:
-        h = hashlib.sha512(seed).digest()
-        for j in range(0, 64, 4):
-            if len(values) >= dim:
-                break
-            val = int.from_bytes(h[j:j + 4], "big")
-            values.append((val / 2147483648.0) - 1.0)
-        seed = h
-    norm = math.sqrt(sum(v * v for v in values))
-    if norm > 0:
-        values = [v / norm for v in values]
-    return values
+        print(f"Shadow search dispatch failed: {e}")
+        emit_metric("SearchShadowError", dimensions={"Backend": SEARCH_SHADOW_BACKEND})
 
 
-def _build_semantic_query(parsed, query_embedding):
-    """Build pgvector cosine similarity search query.
+def _shadow_compare(query_embedding, filters, primary, primary_hits, primary_ms):
+    """Run SEARCH_SHADOW_BACKEND and log overlap / latency against the primary.
 
-    Uses the <=> operator (cosine distance) against creator aggregate embeddings.
-    Hard filters (city, followers) are applied as WHERE clauses.
+    Runs in the async invocation sent by _dispatch_shadow.
     """
-    embedding_str = "[" + ",".join(str(v) for v in query_embedding) + "]"
-    params = [embedding_str, embedding_str]  # once for SELECT, once for ORDER BY
-
-    hard_conditions = ["ve.embedding IS NOT NULL"]
-    if parsed.get("city"):
-        hard_conditions.append("c.city ILIKE %s")
-        params.append(f"%{parsed['city']}%")
-    if parsed.get("min_followers"):
-        hard_conditions.append("c.followers_count >= %s")
-        params.append(parsed["min_followers"])
-    if parsed.get("max_followers"):
-        hard_conditions.append("c.followers_count <= %s")
-        params.append(parsed["max_followers"])
-
-    where_clause = " AND ".join(hard_conditions)
-
-    sql = f"""
-        SELECT c.id, c.username, c.display_name, c.bio, c.niche, c.city,
-               c.followers_count, c.media_count, c.profile_picture_url,
-               c.style_profile,
-               r.reel_rate, r.story_rate, r.post_rate, r.accepts_barter,
-               1 - (ve.embedding <=> %s::vector) AS similarity
-        FROM creators c
-        LEFT JOIN rate_cards r ON r.creator_id = c.id
-        JOIN video_embeddings ve ON ve.creator_id = c.id
-             AND ve.is_creator_aggregate = TRUE
-        WHERE {where_clause}
-        ORDER BY ve.embedding <=> %s::vector ASC
-        LIMIT 50
-    """
-    return sql, params
+    try:
+        hits, latency_ms = _backend_search(SEARCH_SHADOW_BACKEND, query_embedding, filters)
+    except Exception as e:
+        print(f"Shadow search ({SEARCH_SHADOW_BACKEND}) failed: {e}")
+        get_db_connection().rollback()
+        emit_metric("SearchShadowError", dimensions={"Backend": SEARCH_SHADOW_BACKEND})
+        return
+
+    comparison = compare_hits(primary_hits, hits)
+    print(json.dumps({
+        "shadow_search": {
+            "primary": primary,
+            "shadow": SEARCH_SHADOW_BACKEND,
+            "filters": filters,
+            "primary_count": len(primary_hits),
+            "shadow_count": len(hits),
+            "primary_ms": primary_ms,
+            "shadow_ms": latency_ms,
+            **comparison,
+        }
+    }))
+    emit_metric("SearchShadowOverlap", round(comparison["overlap"], 3), unit="None",
+                dimensions={"Backend": SEARCH_SHADOW_BACKEND})
 
 
 def _build_text_fallback_query(parsed):
@@ -410,6 +404,14 @@ def _build_text_fallback_query(parsed):
 
 def handler(event, context):
     """POST /brand/search — semantic creator search for brands."""
+    if "shadow_search" in event:
+        shadow = event["shadow_search"]
+        _shadow_compare(
+            shadow["query_embedding"], shadow["filters"], shadow["primary"],
+            [tuple(hit) for hit in shadow["primary_hits"]], shadow["primary_ms"],
+        )
+        return {"statusCode": 200}
+
     try:
         # Lenient auth for demo — allow anonymous search if token is invalid
         user = get_user_from_token(event)
@@ -434,21 +436,41 @@ def handler(event, context):
         cur = conn.cursor()
         search_method = "text"
 
-        # Try embedding-based semantic search first
+        # Try embedding-based semantic search first: the configured backend,
+        # then pgvector if that backend is unavailable. The query is embedded
+        # once and the vector shared by every backend tried.
+        filters = _search_filters(parsed)
+        query_embedding = None
+        rows = None
         try:
-            embedding_text = _build_search_embedding_text(parsed, query)
-            query_embedding = _generate_query_embedding(embedding_text)
-            sql, params = _build_semantic_query(parsed, query_embedding)
-            cur.execute(sql, params)
-            rows = cur.fetchall()
-            search_method = "embedding"
-            print(f"Embedding search returned {len(rows)} results")
+            query_embedding = _generate_query_embedding(_build_search_embedding_text(parsed, query))
         except Exception as e:
-            print(f"Embedding search failed ({e}), falling back to text search")
+            print(f"Query embedding failed: {e}")
+        backends = [SEARCH_BACKEND] + (["pgvector"] if SEARCH_BACKEND != "pgvector" else [])
+        if query_embedding is None:
+            backends = []
+        for backend in backends:
+            try:
+                hits, latency_ms = _backend_search(backend, query_embedding, filters)
+                rows = _hydrate(cur, hits)
+                search_method = "embedding"
+                search_backend = backend
+                print(f"Embedding search ({backend}) returned {len(rows)} results in {latency_ms}ms")
+                break
+            except Exception as e:
+                print(f"Embedding search ({backend}) failed: {e}")
+                conn.rollback()
+
+        if rows is None:
+            print("Falling back to text search")
             sql, params = _build_text_fallback_query(parsed)
             cur.execute(sql, params)
             rows = cur.fetchall()
+            search_backend = None
             print(f"Text fallback returned {len(rows)} results")
+        elif (SEARCH_SHADOW_BACKEND and SEARCH_SHADOW_BACKEND != search_backend
+              and random.random() < SEARCH_SHADOW_SAMPLE_RATE):
+            _dispatch_shadow(context, query_embedding, filters, search_backend, hits, latency_ms)
 
         creators = []
         for row in rows:
@@ -487,6 +509,7 @@ def handler(event, context):
                 "results": creators,
                 "count": len(creators),
                 "search_method": search_method,
+                "search_backend": search_backend,
             }),
         }
 
@@ -1,70 +1,198 @@
-"""Brand Wishlist Lambda — CRUD for brand wishlists (save/unsave creators)."""
+"""Brand Wishlist Lambda — CRUD for brand wishlists (save/unsave creators).
 
+GET /brand/wishlist/recommendations suggests unsaved creators close to the
+wishlist's centroids (see shared/wishlist.py).
+"""
+
+import base64
+import hashlib
 import json
+import uuid
+from datetime import datetime
 from shared.db import get_db_connection
 from shared.auth import require_brand
+from shared.metrics import emit_metric
+from shared.wishlist import RECOMMENDATION_MAX, recommend, refit_if_needed
 
 CORS_HEADERS = {
     "Access-Control-Allow-Origin": "*",
     "Content-Type": "application/json",
 }
 
+WISHLIST_PAGE_SIZE = 50
+WISHLIST_MAX_PAGE_SIZE = 200
+
+# ?fields= projection: field -> selected columns
+WISHLIST_FIELDS = {
+    "creator_id": ["c.id"],
+    "username": ["c.username"],
+    "display_name": ["c.display_name"],
+    "bio": ["c.bio"],
+    "niche": ["c.niche"],
+    "city": ["c.city"],
+    "followers_count": ["c.followers_count"],
+    "media_count": ["c.media_count"],
+    "profile_picture_url": ["c.profile_picture_url"],
+    "style_profile": ["c.style_profile"],
+    "rates": ["r.reel_rate", "r.story_rate", "r.post_rate", "r.accepts_barter"],
+    "saved_at": ["bw.created_at"],
+}
+
+
+def _format_creator(row):
+    """Creator dict from the shared profile + rate card columns (row[0:14])."""
+    style = row[9] or {}
+    if isinstance(style, str):
+        style = json.loads(style)
+
+    creator = {
+        "creator_id": str(row[0]),
+        "username": row[1],
+        "display_name": row[2],
+        "bio": row[3],
+        "niche": row[4],
+        "city": row[5],
+        "followers_count": row[6],
+        "media_count": row[7],
+        "profile_picture_url": row[8],
+        "style_profile": style,
+        "rates": None,
+    }
+    if row[10] is not None:
+        creator["rates"] = {
+            "reel_rate": row[10],
+            "story_rate": row[11],
+            "post_rate": row[12],
+            "accepts_barter": row[13],
+        }
+    return creator
+
+
+def _wishlist_version(cur, user_id):
+    """The brand's wishlist version (0 if it never saved anyone)."""
+    cur.execute("SELECT version FROM brand_wishlist_state WHERE user_id = %s", (str(user_id),))
+    row = cur.fetchone()
+    return row[0] if row else 0
+
+
+def _etag(user_id, version, params):
+    """Weak ETag for one page: wishlist version + the request's page parameters."""
+    page = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:12]
+    return f'W/"{user_id}-{version}-{page}"'
+
+
+def _encode_cursor(saved_at, creator_id):
+    return base64.urlsafe_b64encode(f"{saved_at.isoformat()}|{creator_id}".encode()).decode()
+
+
+def _decode_cursor(cursor):
+    """(saved_at, creator_id) from a page cursor; raises ValueError if malformed."""
+    try:
+        saved_at, creator_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(saved_at), str(uuid.UUID(creator_id))
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def _parse_fields(value):
+    """Requested fields (all by default); raises ValueError on an unknown one."""
+    if not value:
+        return list(WISHLIST_FIELDS)
+    fields = [f.strip() for f in value.split(",") if f.strip()]
+    unknown = [f for f in fields if f not in WISHLIST_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return ["creator_id"] + [f for f in WISHLIST_FIELDS if f in fields and f != "creator_id"]
+
+
+def _get_wishlist(user_id, fields, limit, cursor=None):
+    """One page of the brand's wishlist, newest first. Returns (creators, next_cursor).
+
+    Keyset pagination on (created_at, creator_id): each page is an index
+    range scan, however deep. Only the requested fields are selected, and
+    rate_cards is joined only when rates are asked for.
+    """
+    columns = [col for f in fields for col in WISHLIST_FIELDS[f]]
+    sql = f"""
+        SELECT {", ".join(columns)}, bw.created_at
+        FROM brand_wishlists bw
+        JOIN creators c ON bw.creator_id = c.id
+        {"LEFT JOIN rate_cards r ON r.creator_id = c.id" if "rates" in fields else ""}
+        WHERE bw.user_id = %s
+    """
+    params = [str(user_id)]
+    if cursor:
+        sql += " AND (bw.created_at, bw.creator_id) < (%s, %s::uuid)"
+        params.extend(cursor)
+    sql += " ORDER BY bw.created_at DESC, bw.creator_id DESC LIMIT %s"
+    params.append(limit + 1)
+
+    cur = get_db_connection().cursor()
+    cur.execute(sql, params)
+    rows = cur.fetchall()
+
+    creators = []
+    for row in rows[:limit]:
+        values = iter(row)
+        creator = {}
+        for field in fields:
+            if field == "rates":
+                rates = dict(zip(("reel_rate", "story_rate", "post_rate", "accepts_barter"), values))
+                creator["rates"] = rates if rates["reel_rate"] is not None else None
+            elif field == "style_profile":
+                style = next(values) or {}
+                creator["style_profile"] = json.loads(style) if isinstance(style, str) else style
+            elif field == "saved_at":
+                saved_at = next(values)
+                creator["saved_at"] = saved_at.isoformat() if saved_at else None
+            else:
+                value = next(values)
+                creator[field] = str(value) if field == "creator_id" else value
+        creators.append(creator)
+
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]
+        next_cursor = _encode_cursor(last[-1], creators[-1]["creator_id"])
+    return creators, next_cursor
 
-def _get_wishlist(user_id):
-    """List all creators in the brand's wishlist with full profiles."""
+
+def _get_recommendations(user_id, limit):
+    """Unsaved creators near the wishlist centroids, best first. Returns (creators, cached)."""
     conn = get_db_connection()
     cur = conn.cursor()
+    hits, cached = recommend(cur, user_id)
+    conn.commit()
+    hits = hits[:limit]
+    if not hits:
+        return [], cached
+
     cur.execute(
         """
         SELECT c.id, c.username, c.display_name, c.bio, c.niche, c.city,
                c.followers_count, c.media_count, c.profile_picture_url,
                c.style_profile,
-               r.reel_rate, r.story_rate, r.post_rate, r.accepts_barter,
-               bw.created_at
-        FROM brand_wishlists bw
-        JOIN creators c ON bw.creator_id = c.id
+               r.reel_rate, r.story_rate, r.post_rate, r.accepts_barter
+        FROM creators c
         LEFT JOIN rate_cards r ON r.creator_id = c.id
-        WHERE bw.user_id = %s
-        ORDER BY bw.created_at DESC
+        WHERE c.id = ANY(%s::uuid[])
         """,
-        (str(user_id),),
+        ([creator_id for creator_id, _, _ in hits],),
     )
-    rows = cur.fetchall()
+    rows = {str(row[0]): row for row in cur.fetchall()}
 
     creators = []
-    for row in rows:
-        style = row[9] or {}
-        if isinstance(style, str):
-            style = json.loads(style)
-
-        creator = {
-            "creator_id": str(row[0]),
-            "username": row[1],
-            "display_name": row[2],
-            "bio": row[3],
-            "niche": row[4],
-            "city": row[5],
-            "followers_count": row[6],
-            "media_count": row[7],
-            "profile_picture_url": row[8],
-            "style_profile": style,
-            "rates": None,
-            "saved_at": row[14].isoformat() if row[14] else None,
-        }
-        if row[10] is not None:
-            creator["rates"] = {
-                "reel_rate": row[10],
-                "story_rate": row[11],
-                "post_rate": row[12],
-                "accepts_barter": row[13],
-            }
-        creators.append(creator)
-
-    return creators
+    for creator_id, similarity, cluster in hits:
+        if creator_id in rows:
+            creator = _format_creator(rows[creator_id])
+            creator["similarity"] = round(similarity, 4)
+            creator["centroid"] = cluster
+            creators.append(creator)
+    return creators, cached
 
 
 def _add_to_wishlist(user_id, creator_id):
-    """Add a creator to the brand's wishlist."""
+    """Add a creator to the brand's wishlist. Returns (added, wishlist version)."""
     conn = get_db_connection()
     cur = conn.cursor()
     cur.execute(
@@ -76,13 +204,16 @@ def _add_to_wishlist(user_id, creator_id):
         """,
         (str(user_id), str(creator_id)),
     )
+    added = cur.fetchone() is not None
+    if added:
+        refit_if_needed(cur, user_id)
+    version = _wishlist_version(cur, user_id)
     conn.commit()
-    result = cur.fetchone()
-    return result is not None
+    return added, version
 
 
 def _remove_from_wishlist(user_id, creator_id):
-    """Remove a creator from the brand's wishlist."""
+    """Remove a creator from the brand's wishlist. Returns (removed, wishlist version)."""
     conn = get_db_connection()
     cur = conn.cursor()
     cur.execute(
@@ -93,12 +224,23 @@ def _remove_from_wishlist(user_id, creator_id):
         (str(user_id), str(creator_id)),
     )
     deleted = cur.rowcount > 0
+    if deleted:
+        refit_if_needed(cur, user_id)
+    version = _wishlist_version(cur, user_id)
     conn.commit()
-    return deleted
+    return deleted, version
 
 
 def handler(event, context):
-    """GET/POST/DELETE /brand/wishlist — manage brand wishlists."""
+    """GET/POST/DELETE /brand/wishlist — manage brand wishlists.
+
+    GET /brand/wishlist?limit=N&cursor=C&fields=a,b — one page, newest first;
+    pass next_cursor back as cursor for the next page. Responses carry an
+    ETag; a matching If-None-Match gets 304. POST / DELETE return the new
+    wishlist version, so clients can update their list without re-fetching.
+
+    GET /brand/wishlist/recommendations?limit=N — recommendations from the wishlist.
+    """
     try:
         user = require_brand(event)
         user_id = user["user_id"]
@@ -108,12 +250,60 @@ def handler(event, context):
             or event.get("requestContext", {}).get("http", {}).get("method", "GET")
         )
 
-        if http_method == "GET":
-            creators = _get_wishlist(user_id)
+        path = event.get("resource") or event.get("path") or event.get("rawPath") or ""
+        if http_method == "GET" and path.rstrip("/").endswith("/recommendations"):
+            params = event.get("queryStringParameters") or {}
+            try:
+                limit = min(max(int(params.get("limit", 20)), 1), RECOMMENDATION_MAX)
+            except ValueError:
+                limit = 20
+            creators, cached = _get_recommendations(user_id, limit)
+            emit_metric("WishlistRecommendations", dimensions={"Cached": str(cached).lower()})
             return {
                 "statusCode": 200,
                 "headers": CORS_HEADERS,
-                "body": json.dumps({"wishlist": creators, "count": len(creators)}),
+                "body": json.dumps({"recommendations": creators, "count": len(creators), "cached": cached}),
+            }
+
+        if http_method == "GET":
+            params = event.get("queryStringParameters") or {}
+            try:
+                fields = _parse_fields(params.get("fields"))
+                cursor = _decode_cursor(params["cursor"]) if params.get("cursor") else None
+                limit = min(max(int(params.get("limit", WISHLIST_PAGE_SIZE)), 1), WISHLIST_MAX_PAGE_SIZE)
+            except ValueError as e:
+                return {
+                    "statusCode": 400,
+                    "headers": CORS_HEADERS,
+                    "body": json.dumps({"error": str(e)}),
+                }
+
+            # The version moves on every save / unsave and on changes to a saved
+            # creator, so an unchanged page is answered without running the join
+            version = _wishlist_version(get_db_connection().cursor(), user_id)
+            etag = _etag(user_id, version, {"fields": fields, "limit": limit, "cursor": params.get("cursor")})
+            headers = {
+                **CORS_HEADERS,
+                "ETag": etag,
+                "Cache-Control": "private, no-cache",
+                "Access-Control-Expose-Headers": "ETag",
+            }
+            request_headers = {k.lower(): v for k, v in (event.get("headers") or {}).items()}
+            if_none_match = request_headers.get("if-none-match") or ""
+            if if_none_match.strip() == "*" or etag[2:] in [t.strip().removeprefix("W/") for t in if_none_match.split(",")]:
+                emit_metric("WishlistNotModified")
+                return {"statusCode": 304, "headers": headers, "body": ""}
+
+            creators, next_cursor = _get_wishlist(user_id, fields, limit, cursor)
+            return {
+                "statusCode": 200,
+                "headers": headers,
+                "body": json.dumps({
+                    "wishlist": creators,
+                    "count": len(creators),
+                    "next_cursor": next_cursor,
+                    "version": version,
+                }),
             }
 
         elif http_method == "POST":
@@ -125,11 +315,11 @@ def handler(event, context):
                     "headers": CORS_HEADERS,
                     "body": json.dumps({"error": "creator_id is required"}),
                 }
-            added = _add_to_wishlist(user_id, creator_id)
+            added, version = _add_to_wishlist(user_id, creator_id)
             return {
                 "statusCode": 200,
                 "headers": CORS_HEADERS,
-                "body": json.dumps({"added": added, "creator_id": creator_id}),
+                "body": json.dumps({"added": added, "creator_id": creator_id, "version": version}),
             }
 
         elif http_method == "DELETE":
@@ -141,11 +331,11 @@ def handler(event, context):
                     "headers": CORS_HEADERS,
                     "body": json.dumps({"error": "creator_id is required"}),
                 }
-            removed = _remove_from_wishlist(user_id, creator_id)
+            removed, version = _remove_from_wishlist(user_id, creator_id)
             return {
                 "statusCode": 200,
                 "headers": CORS_HEADERS,
-                "body": json.dumps({"removed": removed, "creator_id": creator_id}),
+                "body": json.dumps({"removed": removed, "creator_id": creator_id, "version": version}),
             }
 
         else:
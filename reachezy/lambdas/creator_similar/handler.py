@@ -0,0 +1,181 @@
+"""Creator Similar Lambda — "more like this" creators for a creator.
+
+GET /creator/{id}/similar reads the precomputed creator_neighbors list
+(shared/neighbors.py) joined to the creator rows in one indexed query: no
+query parsing and no embedding call. A creator whose list hasn't been built
+yet gets it computed from its aggregate embedding on the spot.
+
+refresh_handler is the nightly full refresh (scheduled in PipelineStack).
+"""
+
+import json
+import uuid
+from shared.auth import require_brand
+from shared.db import get_db_connection
+from shared.metrics import emit_metric
+from shared.neighbors import NEIGHBORS_K, refresh_creator, stale_creators
+
+CORS_HEADERS = {
+    "Access-Control-Allow-Origin": "*",
+    "Content-Type": "application/json",
+}
+
+# Creators recomputed per transaction by the nightly refresh
+REFRESH_BATCH_SIZE = 100
+# Stop starting batches when less than this much Lambda time is left
+WORKER_RESERVE_MS = 30000
+
+
+def _get_similar(cur, creator_id, limit):
+    """(rows, has_list) — neighbor creator rows best first, similarity last.
+
+    A list counts only once it has been computed in full (creator_neighbor_state);
+    rows without it are partial merges and aren't served.
+    """
+    cur.execute("SELECT 1 FROM creator_neighbor_state WHERE creator_id = %s", (creator_id,))
+    if cur.fetchone() is None:
+        return [], False
+    cur.execute(
+        """
+        SELECT c.id, c.username, c.display_name, c.bio, c.niche, c.city,
+               c.followers_count, c.media_count, c.profile_picture_url,
+               c.style_profile,
+               r.reel_rate, r.story_rate, r.post_rate, r.accepts_barter,
+               n.similarity
+        FROM creator_neighbors n
+        JOIN creators c ON c.id = n.neighbor_id
+        LEFT JOIN rate_cards r ON r.creator_id = c.id
+        WHERE n.creator_id = %s
+        ORDER BY n.similarity DESC
+        LIMIT %s
+        """,
+        (creator_id, limit),
+    )
+    return cur.fetchall(), True
+
+
+def _format_creator(row):
+    style = row[9] or {}
+    if isinstance(style, str):
+        style = json.loads(style)
+
+    creator = {
+        "creator_id": str(row[0]),
+        "username": row[1],
+        "display_name": row[2],
+        "bio": row[3],
+        "niche": row[4],
+        "city": row[5],
+        "followers_count": row[6],
+        "media_count": row[7],
+        "profile_picture_url": row[8],
+        "style_profile": style,
+        "rates": None,
+        "similarity": round(float(row[14]), 4),
+    }
+    if row[10] is not None:
+        creator["rates"] = {
+            "reel_rate": row[10],
+            "story_rate": row[11],
+            "post_rate": row[12],
+            "accepts_barter": row[13],
+        }
+    return creator
+
+
+def handler(event, context):
+    """GET /creator/{id}/similar?limit=N — creators most similar to a creator."""
+    try:
+        require_brand(event)
+
+        creator_id = (event.get("pathParameters") or {}).get("id")
+        params = event.get("queryStringParameters") or {}
+        try:
+            limit = min(max(int(params.get("limit", 10)), 1), NEIGHBORS_K)
+        except ValueError:
+            limit = 10
+
+        try:
+            creator_id = str(uuid.UUID(creator_id or ""))
+            conn = get_db_connection()
+            cur = conn.cursor()
+            cur.execute("SELECT 1 FROM creators WHERE id = %s", (creator_id,))
+            found = cur.fetchone() is not None
+        except ValueError:
+            found = False
+        if not found:
+            return {
+                "statusCode": 404,
+                "headers": CORS_HEADERS,
+                "body": json.dumps({"error": "Creator not found"}),
+            }
+
+        rows, has_list = _get_similar(cur, creator_id, limit)
+        source = "precomputed"
+        if not has_list:
+            # Not built yet (new aggregate the outbox hasn't reached): build it now
+            if refresh_creator(cur, creator_id, reverse=False) is not None:
+                conn.commit()
+                rows, _ = _get_similar(cur, creator_id, limit)
+                source = "computed"
+            else:
+                conn.rollback()
+        emit_metric("SimilarCreatorsLookup", dimensions={"Source": source})
+
+        creators = [_format_creator(row) for row in rows]
+        return {
+            "statusCode": 200,
+            "headers": CORS_HEADERS,
+            "body": json.dumps({
+                "creator_id": creator_id,
+                "results": creators,
+                "count": len(creators),
+                "source": source,
+            }),
+        }
+
+    except ValueError as ve:
+        status = 401 if "Unauthorized" in str(ve) else 403
+        return {
+            "statusCode": status,
+            "headers": CORS_HEADERS,
+            "body": json.dumps({"error": str(ve)}),
+        }
+    except Exception as e:
+        print(f"Error in creator_similar: {e}")
+        return {
+            "statusCode": 500,
+            "headers": CORS_HEADERS,
+            "body": json.dumps({"error": "Internal server error"}),
+        }
+
+
+def refresh_handler(event, context):
+    """Nightly: recompute every neighbor list older than NEIGHBORS_MAX_AGE_HOURS.
+
+    Runs repeatedly through the night window; each run takes the stalest
+    lists in batches until its time is up, so a catalog larger than one
+    invocation can handle is covered over several runs.
+
+    Returns:
+        { refreshed, remaining }
+    """
+    conn = get_db_connection()
+    cur = conn.cursor()
+    refreshed = 0
+    remaining = True
+
+    while context is None or context.get_remaining_time_in_millis() > WORKER_RESERVE_MS:
+        batch = stale_creators(cur, REFRESH_BATCH_SIZE)
+        if not batch:
+            remaining = False
+            conn.commit()
+            break
+        for creator_id in batch:
+            refresh_creator(cur, creator_id, reverse=False)
+        conn.commit()
+        refreshed += len(batch)
+
+    emit_metric("CreatorNeighborsRefreshed", refreshed)
+    print(f"Neighbor refresh: {refreshed} creators, more remaining: {remaining}")
+    return {"refreshed": refreshed, "remaining": remaining}
@@ -5,20 +5,24 @@ Supports two modes (controlled by AI_PROVIDER env var):
   - "groq"    : Hash-based fallback (Groq has no embedding API)
 
 When Bedrock quotas are unavailable, automatically falls back to hash-based.
+Titan calls are batched and cached by input via shared.embeddings.
 """
 
 import os
 import json
-import hashlib
-import math
-import boto3
 from shared.db import get_db_connection
-from shared.bedrock_client import get_bedrock_client
+from shared.embeddings import (
+    EMBEDDING_DIM,
+    EMBEDDING_MODEL_ID,
+    HASH_EMBEDDING_MODEL,
+    content_hash,
+    embed_texts,
+    hash_embedding,
+    to_pgvector,
+)
 
-EMBEDDING_DIM = 1024
 AI_PROVIDER = os.environ.get("AI_PROVIDER", "bedrock")
 BEDROCK_REGION = os.environ.get("BEDROCK_REGION", "us-east-1")
-EMBEDDING_MODEL_ID = "amazon.titan-embed-text-v2:0"
 
 
 def _build_embedding_text(analysis):
@@ -52,62 +56,102 @@ def _build_embedding_text(analysis):
     return ". ".join(parts)
 
 
-def _generate_titan_embedding(text, dim=EMBEDDING_DIM):
-    """Generate an embedding vector using Amazon Titan Text Embeddings V2 via Bedrock."""
-    bedrock = get_bedrock_client(region=BEDROCK_REGION)
+def _generate_embeddings(texts):
+    """Embed texts with Titan (batched, store-cached), falling back to hash per text.
 
-    response = bedrock.invoke_model(
-        modelId=EMBEDDING_MODEL_ID,
-        contentType="application/json",
-        accept="application/json",
-        body=json.dumps({
-            "inputText": text,
-            "dimensions": dim,
-            "normalize": True,
-        }),
+    Returns a list of (embedding, model_id).
+    """
+    if AI_PROVIDER == "groq":
+        # Groq has no embedding API — use hash-based fallback
+        print("Using hash-based embedding (Groq mode, no embedding API available)")
+        return [(hash_embedding(text), HASH_EMBEDDING_MODEL) for text in texts]
+
+    print(f"Using Amazon Titan Text Embeddings V2 for {len(texts)} text(s)")
+    return embed_texts(texts, region=BEDROCK_REGION, fallback=hash_embedding)
+
+
+def _expected_model():
+    return HASH_EMBEDDING_MODEL if AI_PROVIDER == "groq" else EMBEDDING_MODEL_ID
+
+
+def _store_embedding(cur, video_id, creator_id, embedding_text, embedding, model_id):
+    """Replace the per-video embedding row (the creator aggregate row is left alone)."""
+    cur.execute(
+        "DELETE FROM video_embeddings WHERE video_id = %s AND is_creator_aggregate = FALSE",
+        (video_id,)
     )
+    cur.execute(
+        """
+        INSERT INTO video_embeddings (
+            video_id, creator_id, embedding, embedding_input,
+            embedding_input_hash, embedding_model, is_creator_aggregate
+        )
+        VALUES (%s, %s, %s::vector, %s, %s, %s, FALSE)
+        """,
+        (video_id, creator_id, to_pgvector(embedding), embedding_text, content_hash(embedding_text), model_id),
+    )
+
 
-    result = json.loads(response["body"].read())
-    return result["embedding"]
+def _row_to_analysis(row):
+    """video_analyses columns → the analysis dict shape _build_embedding_text expects."""
+    topics = row[5]
+    if isinstance(topics, str):
+        topics = json.loads(topics)
+    return {
+        "energy_level": row[0],
+        "aesthetic": row[1],
+        "setting": row[2],
+        "production_quality": row[3],
+        "content_type": row[4],
+        "topics": topics or [],
+        "text_on_screen": row[6],
+        "face_visible": row[7],
+        "summary": row[8],
+    }
 
 
-def _generate_hash_embedding(text, dim=EMBEDDING_DIM):
-    """Generate a deterministic embedding vector using chained SHA-512 hashes.
+def backfill(event):
+    """Embed every analysis whose stored embedding is missing or out of date.
 
-    Fallback when real embedding models are unavailable.
-    Produces a normalized vector of `dim` dimensions from the input text.
+    Input:  { action: "backfill", creator_id?: str, batch_size?: int }
+    Output: { checked, embedded, unchanged }
     """
-    values = []
-    seed = text.encode("utf-8")
-    while len(values) < dim:
-        h = hashlib.sha512(seed).digest()
-        for j in range(0, 64, 4):
-            if len(values) >= dim:
-                break
-            val = int.from_bytes(h[j:j + 4], "big")
-            values.append((val / 2147483648.0) - 1.0)
-        seed = h
-
-    norm = math.sqrt(sum(v * v for v in values))
-    if norm > 0:
-        values = [v / norm for v in values]
-
-    return values
-
-
-def _generate_embedding(text):
-    """Generate embedding using Titan if available, otherwise fall back to hash."""
-    if AI_PROVIDER == "groq":
-        # Groq has no embedding API — use hash-based fallback
-        print("Using hash-based embedding (Groq mode, no embedding API available)")
-        return _generate_hash_embedding(text)
+    batch_size = int(event.get("batch_size", 64))
+    conn = get_db_connection()
+    cur = conn.cursor()
 
-    try:
-        print("Using Amazon Titan Text Embeddings V2")
-        return _generate_titan_embedding(text)
-    except Exception as e:
-        print(f"Titan embedding failed ({e}), falling back to hash-based")
-        return _generate_hash_embedding(text)
+    sql = """
+        SELECT va.energy_level, va.aesthetic, va.setting, va.production_quality,
+               va.content_type, va.topics, va.has_text_overlay, va.face_visible, va.summary,
+               va.video_id, va.creator_id, ve.embedding_input_hash, ve.embedding_model
+        FROM video_analyses va
+        LEFT JOIN video_embeddings ve
+               ON ve.video_id = va.video_id AND ve.is_creator_aggregate = FALSE
+    """
+    params = []
+    if event.get("creator_id"):
+        sql += " WHERE va.creator_id = %s"
+        params.append(event["creator_id"])
+    cur.execute(sql, params)
+    rows = cur.fetchall()
+
+    expected_model = _expected_model()
+    pending = []
+    for row in rows:
+        text = _build_embedding_text(_row_to_analysis(row))
+        if row[11] == content_hash(text) and row[12] == expected_model:
+            continue
+        pending.append((str(row[9]), str(row[10]), text))
+
+    print(f"Embedding backfill: {len(pending)} of {len(rows)} analyses need (re-)embedding")
+    for start in range(0, len(pending), batch_size):
+        chunk = pending[start:start + batch_size]
+        results = _generate_embeddings([text for _, _, text in chunk])
+        for (video_id, creator_id, text), (embedding, model_id) in zip(chunk, results):
+            _store_embedding(cur, video_id, creator_id, text, embedding, model_id)
+        conn.commit()
+
+    return {"checked": len(rows), "embedded": len(pending), "unchanged": len(rows) - len(pending)}
 
 
 def handler(event, context):
@@ -115,10 +159,14 @@ def handler(event, context):
 
     Receives:
         { video_id, creator_id, analysis: {...} }
+        or { action: "backfill", ... } to batch re-embed stale analyses (see backfill)
 
     Returns:
-        { video_id, creator_id, embedding_stored: True }
+        { video_id, creator_id, embedding_stored: True, reused }
     """
+    if event.get("action") == "backfill":
+        return backfill(event)
+
     video_id = event["video_id"]
     creator_id = event["creator_id"]
     analysis = event["analysis"]
@@ -126,30 +174,36 @@ def handler(event, context):
     # Build embedding text from analysis
     embedding_text = _build_embedding_text(analysis)
 
-    # Generate embedding (Titan or hash-based fallback)
-    embedding = _generate_embedding(embedding_text)
-
-    # Format embedding as pgvector-compatible string: "[0.1,0.2,...]"
-    embedding_str = "[" + ",".join(str(v) for v in embedding) + "]"
-
-    # Replace old video embedding if it exists, then insert new one
     conn = get_db_connection()
     cur = conn.cursor()
-    cur.execute(
-        "DELETE FROM video_embeddings WHERE video_id = %s",
-        (video_id,)
-    )
+
+    # Unchanged input (retry, re-run, dedup copy)? Keep the stored vector.
     cur.execute(
         """
-        INSERT INTO video_embeddings (video_id, creator_id, embedding, is_creator_aggregate)
-        VALUES (%s, %s, %s::vector, FALSE)
+        SELECT embedding_input_hash, embedding_model FROM video_embeddings
+        WHERE video_id = %s AND is_creator_aggregate = FALSE
         """,
-        (video_id, creator_id, embedding_str),
+        (video_id,),
     )
+    row = cur.fetchone()
+    if row and row[0] == content_hash(embedding_text) and row[1] == _expected_model():
+        print(f"Embedding input unchanged for video {video_id}, skipping")
+        return {
+            "video_id": video_id,
+            "creator_id": creator_id,
+            "embedding_stored": True,
+            "reused": True,
+        }
+
+    # Generate embedding (Titan or hash-based fallback)
+    embedding, model_id = _generate_embeddings([embedding_text])[0]
+
+    _store_embedding(cur, video_id, creator_id, embedding_text, embedding, model_id)
     conn.commit()
 
     return {
         "video_id": video_id,
         "creator_id": creator_id,
         "embedding_stored": True,
+        "reused": False,
     }
@@ -1,167 +1,376 @@
 """OpenSearch Sync Lambda — indexes creator profiles + embeddings into OpenSearch Serverless.
 
-Triggered after profile_aggregator completes. Indexes the creator's style_profile
-and embedding vector into OpenSearch for k-NN similarity search.
+Drains search_sync_queue (filled by shared.search_sync.enqueue_search_sync)
+on a schedule: claims a batch of creator ids with FOR UPDATE SKIP LOCKED and
+a short lease, loads them in one query and commits, then writes them with the
+_bulk API (chunked by document count and bytes, retrying items that fail
+with 429 / 5xx) without holding any row lock.
+Creators that no longer exist or have no aggregate embedding are deleted
+from the index.
 
+Events:
+    {}                                   drain the queue (scheduled)
+    { creator_id } / { creator_ids }     index these creators now
+    { action: "reindex", version?, delete_old? }
+                                         blue/green rebuild into <index>-v<version>
+                                         (see shared/opensearch.py), then flip the alias
+
+Writes go to every index behind the OPENSEARCH_INDEX alias plus any pending
+blue/green index. The signed HTTP session (shared/opensearch.py) and those
+write targets are cached per container.
 Feature-flagged: only runs if OPENSEARCH_ENDPOINT is set.
 """
 
 import os
 import json
-import boto3
-import requests as http_requests
-from requests_aws4auth import AWS4Auth
+import random
+import time
 from shared.db import get_db_connection
+from shared.metrics import emit_metric
+from shared.opensearch import (
+    OPENSEARCH_ENDPOINT,
+    OPENSEARCH_INDEX,
+    alias_targets,
+    flip_alias,
+    get_session,
+    start_blue_green,
+    versioned_index,
+    write_targets,
+)
 
-OPENSEARCH_ENDPOINT = os.environ.get("OPENSEARCH_ENDPOINT", "")
-OPENSEARCH_INDEX = os.environ.get("OPENSEARCH_INDEX", "creator-profiles")
-REGION = os.environ.get("AWS_REGION", "us-east-1")
+SYNC_BATCH_SIZE = int(os.environ.get("SYNC_BATCH_SIZE", "200"))
+BULK_MAX_DOCS = int(os.environ.get("BULK_MAX_DOCS", "500"))
+BULK_MAX_BYTES = int(os.environ.get("BULK_MAX_BYTES", str(5 * 1024 * 1024)))
+BULK_MAX_RETRIES = int(os.environ.get("BULK_MAX_RETRIES", "3"))
+SYNC_MAX_ATTEMPTS = int(os.environ.get("SYNC_MAX_ATTEMPTS", "8"))
+# Claimed rows are hidden from other workers this long (longer than the
+# Lambda timeout), so a worker that dies mid-batch is retried afterwards
+SYNC_CLAIM_SECONDS = int(os.environ.get("SYNC_CLAIM_SECONDS", "360"))
+REINDEX_FETCH_SIZE = 500
+# Stop claiming batches when less than this much Lambda time is left
+WORKER_RESERVE_MS = 20000
 
+# Warm containers re-read the alias targets after this long; a blue/green
+# reindex waits it out before streaming, so no change misses the new index
+WRITE_TARGETS_TTL = 30
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+_write_targets = None
+_write_targets_at = 0.0
 
-def _get_auth():
-    """Get AWS4Auth for OpenSearch Serverless."""
-    credentials = boto3.Session().get_credentials().get_frozen_credentials()
-    return AWS4Auth(
-        credentials.access_key,
-        credentials.secret_key,
-        REGION,
-        "aoss",
-        session_token=credentials.token,
-    )
 
+def _get_write_targets():
+    """Live + pending indexes behind OPENSEARCH_INDEX, cached for WRITE_TARGETS_TTL."""
+    global _write_targets, _write_targets_at
+    if _write_targets is None or time.time() - _write_targets_at > WRITE_TARGETS_TTL:
+        _write_targets = write_targets()
+        _write_targets_at = time.time()
+    return _write_targets
+
+
+# =============================================================================
+# Documents
+# =============================================================================
+
+CREATOR_DOC_SQL = """
+    SELECT c.id, c.username, c.display_name, c.niche, c.city,
+           c.followers_count, c.style_profile,
+           r.reel_rate, r.story_rate, r.post_rate, r.accepts_barter,
+           ve.embedding::text
+    FROM creators c
+    LEFT JOIN rate_cards r ON r.creator_id = c.id
+    LEFT JOIN video_embeddings ve
+           ON ve.creator_id = c.id AND ve.is_creator_aggregate = TRUE
+"""
 
-def _ensure_index(auth):
-    """Create the k-NN index if it doesn't exist."""
-    url = f"{OPENSEARCH_ENDPOINT}/{OPENSEARCH_INDEX}"
-    resp = http_requests.head(url, auth=auth, timeout=10)
-    if resp.status_code == 200:
-        return
-
-    index_body = {
-        "settings": {
-            "index": {
-                "knn": True,
-                "knn.algo_param.ef_search": 100,
-            }
-        },
-        "mappings": {
-            "properties": {
-                "creator_id": {"type": "keyword"},
-                "username": {"type": "keyword"},
-                "display_name": {"type": "text"},
-                "niche": {"type": "keyword"},
-                "city": {"type": "keyword"},
-                "followers_count": {"type": "integer"},
-                "dominant_energy": {"type": "keyword"},
-                "dominant_aesthetic": {"type": "keyword"},
-                "primary_content_type": {"type": "keyword"},
-                "topics": {"type": "keyword"},
-                "style_summary": {"type": "text"},
-                "consistency_score": {"type": "float"},
-                "embedding": {
-                    "type": "knn_vector",
-                    "dimension": 1024,
-                    "method": {
-                        "name": "hnsw",
-                        "space_type": "cosinesimil",
-                        "engine": "nmslib",
-                    },
-                },
-            }
-        },
+
+def _row_to_doc(row):
+    """(creator_id, doc or None) — None means the creator can't be indexed."""
+    creator_id = str(row[0])
+    if row[11] is None:
+        return creator_id, None
+
+    style = row[6] or {}
+    if isinstance(style, str):
+        style = json.loads(style)
+
+    return creator_id, {
+        "creator_id": creator_id,
+        "username": row[1],
+        "display_name": row[2],
+        "niche": row[3],
+        "city": row[4],
+        "followers_count": row[5],
+        "dominant_energy": style.get("dominant_energy"),
+        "dominant_aesthetic": style.get("dominant_aesthetic"),
+        "primary_content_type": style.get("primary_content_type"),
+        "topics": style.get("topics", []),
+        "style_summary": style.get("style_summary", ""),
+        "consistency_score": style.get("consistency_score", 0),
+        "reel_rate": row[7],
+        "story_rate": row[8],
+        "post_rate": row[9],
+        "accepts_barter": row[10],
+        "embedding": json.loads(row[11]),
     }
 
-    resp = http_requests.put(
-        url,
-        auth=auth,
-        json=index_body,
-        headers={"Content-Type": "application/json"},
-        timeout=30,
+
+def _fetch_docs(cur, creator_ids):
+    """{creator_id: doc or None} for every requested id (None = delete from index)."""
+    cur.execute(CREATOR_DOC_SQL + " WHERE c.id = ANY(%s::uuid[])", (list(creator_ids),))
+    docs = {str(c): None for c in creator_ids}
+    for row in cur.fetchall():
+        creator_id, doc = _row_to_doc(row)
+        docs[creator_id] = doc
+    return docs
+
+
+# =============================================================================
+# _bulk
+# =============================================================================
+
+def _bulk_lines(index, creator_id, doc):
+    if doc is None:
+        return json.dumps({"delete": {"_index": index, "_id": creator_id}}) + "\n"
+    return (json.dumps({"index": {"_index": index, "_id": creator_id}}) + "\n"
+            + json.dumps(doc) + "\n")
+
+
+def _chunks(actions):
+    """Split [(key, ndjson)] into bodies under BULK_MAX_DOCS / BULK_MAX_BYTES."""
+    chunk, size = [], 0
+    for key, lines in actions:
+        line_bytes = len(lines.encode("utf-8"))
+        if chunk and (len(chunk) >= BULK_MAX_DOCS or size + line_bytes > BULK_MAX_BYTES):
+            yield chunk
+            chunk, size = [], 0
+        chunk.append((key, lines))
+        size += line_bytes
+    if chunk:
+        yield chunk
+
+
+def _send_bulk(chunk):
+    """POST one _bulk body. Returns {key: (status, error)} for failed items."""
+    session = get_session()
+    body = "".join(lines for _, lines in chunk)
+    resp = session.post(
+        f"{OPENSEARCH_ENDPOINT}/_bulk",
+        data=body.encode("utf-8"),
+        headers={"Content-Type": "application/x-ndjson"},
+        timeout=60,
     )
-    print(f"Index creation response: {resp.status_code} {resp.text[:200]}")
+    if resp.status_code in RETRYABLE_STATUS:
+        return {key: (resp.status_code, resp.text[:200]) for key, _ in chunk}
+    resp.raise_for_status()
 
+    result = resp.json()
+    if not result.get("errors"):
+        return {}
 
-def handler(event, context):
-    """Index a creator's profile + embedding into OpenSearch.
+    failed = {}
+    for (key, _), item in zip(chunk, result.get("items", [])):
+        op = next(iter(item.values()))
+        status = op.get("status", 500)
+        # Deleting a document that isn't indexed is fine
+        if status >= 300 and not (status == 404 and "delete" in item):
+            failed[key] = (status, json.dumps(op.get("error"))[:200])
+    return failed
 
-    Receives:
-        { creator_id: str }
 
-    Silently skips if OPENSEARCH_ENDPOINT is not configured.
+def bulk_index(docs, indexes=None):
+    """Index / delete {creator_id: doc or None} via _bulk.
+
+    Writes to `indexes`, by default every write target (live + pending) of
+    OPENSEARCH_INDEX. Items failing with 429 / 5xx are retried with backoff;
+    returns {creator_id: error} for anything still failing in any index.
     """
-    if not OPENSEARCH_ENDPOINT:
-        print("OPENSEARCH_ENDPOINT not set, skipping sync")
-        return {"status": "skipped", "reason": "opensearch not configured"}
+    indexes = indexes or _get_write_targets()
+    pending = {
+        (creator_id, index): _bulk_lines(index, creator_id, doc)
+        for creator_id, doc in docs.items()
+        for index in indexes
+    }
+    errors = {}
 
-    creator_id = event.get("creator_id")
-    if not creator_id:
-        return {"status": "error", "reason": "creator_id required"}
+    for attempt in range(BULK_MAX_RETRIES + 1):
+        retry = {}
+        for chunk in _chunks(pending.items()):
+            for key, (status, error) in _send_bulk(chunk).items():
+                if status in RETRYABLE_STATUS and attempt < BULK_MAX_RETRIES:
+                    retry[key] = pending[key]
+                else:
+                    errors[key[0]] = f"{key[1]} {status}: {error}"
+        if not retry:
+            break
+        emit_metric("OpenSearchBulkRetry", len(retry))
+        time.sleep(random.uniform(0, min(8.0, 0.5 * (2 ** attempt))))
+        pending = retry
 
-    try:
-        conn = get_db_connection()
-        cur = conn.cursor()
+    indexed = len(docs) - len(errors)
+    emit_metric("OpenSearchDocsSynced", indexed)
+    if errors:
+        emit_metric("OpenSearchDocsFailed", len(errors))
+    return errors
+
+
+# =============================================================================
+# Queue worker / reindex
+# =============================================================================
+
+def drain_queue(context=None):
+    """Sync queued creators in batches until the queue is empty or time runs low.
 
-        # Fetch creator data + embedding
+    Each batch is claimed (run_after pushed out by SYNC_CLAIM_SECONDS) and its
+    documents loaded in one short transaction, so writers enqueueing the same
+    creators never wait on OpenSearch. Rows are then deleted or rescheduled
+    only if they weren't re-enqueued meanwhile (enqueued_at unchanged); a
+    re-enqueued creator stays queued and is synced again with fresh data.
+    """
+    conn = get_db_connection()
+    cur = conn.cursor()
+    synced = failed = 0
+
+    while context is None or context.get_remaining_time_in_millis() > WORKER_RESERVE_MS:
         cur.execute(
             """
-            SELECT c.id, c.username, c.display_name, c.niche, c.city,
-                   c.followers_count, c.style_profile, c.embedding
-            FROM creators c
-            WHERE c.id = %s
+            UPDATE search_sync_queue q
+            SET run_after = NOW() + make_interval(secs => %s)
+            FROM (
+                SELECT creator_id FROM search_sync_queue
+                WHERE run_after <= NOW() AND attempts < %s
+                ORDER BY enqueued_at
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            ) claimed
+            WHERE q.creator_id = claimed.creator_id
+            RETURNING q.creator_id, q.enqueued_at
             """,
-            (creator_id,),
+            (SYNC_CLAIM_SECONDS, SYNC_MAX_ATTEMPTS, SYNC_BATCH_SIZE),
         )
-        row = cur.fetchone()
-        if not row:
-            return {"status": "error", "reason": f"creator {creator_id} not found"}
-
-        style = row[6] or {}
-        if isinstance(style, str):
-            style = json.loads(style)
-
-        embedding = row[7]
-        if embedding is None:
-            print(f"No embedding for creator {creator_id}, skipping OpenSearch sync")
-            return {"status": "skipped", "reason": "no embedding"}
-
-        # Convert pgvector list to Python list if needed
-        if isinstance(embedding, str):
-            embedding = json.loads(embedding)
-        embedding = list(embedding)
-
-        auth = _get_auth()
-        _ensure_index(auth)
-
-        # Index the document
-        doc = {
-            "creator_id": str(row[0]),
-            "username": row[1],
-            "display_name": row[2],
-            "niche": row[3],
-            "city": row[4],
-            "followers_count": row[5],
-            "dominant_energy": style.get("dominant_energy"),
-            "dominant_aesthetic": style.get("dominant_aesthetic"),
-            "primary_content_type": style.get("primary_content_type"),
-            "topics": style.get("topics", []),
-            "style_summary": style.get("style_summary", ""),
-            "consistency_score": style.get("consistency_score", 0),
-            "embedding": embedding,
-        }
-
-        url = f"{OPENSEARCH_ENDPOINT}/{OPENSEARCH_INDEX}/_doc/{creator_id}"
-        resp = http_requests.put(
-            url,
-            auth=auth,
-            json=doc,
-            headers={"Content-Type": "application/json"},
-            timeout=15,
+        claimed = {str(row[0]): row[1] for row in cur.fetchall()}
+        if not claimed:
+            conn.commit()
+            break
+        docs = _fetch_docs(cur, claimed)
+        conn.commit()
+
+        try:
+            errors = bulk_index(docs)
+        except Exception as e:
+            print(f"Bulk sync failed for {len(claimed)} creators: {e}")
+            errors = {creator_id: str(e) for creator_id in claimed}
+
+        done = [c for c in claimed if c not in errors]
+        cur.execute(
+            """
+            DELETE FROM search_sync_queue q
+            USING (SELECT UNNEST(%s::uuid[]) AS creator_id, UNNEST(%s::timestamp[]) AS enqueued_at) d
+            WHERE q.creator_id = d.creator_id AND q.enqueued_at = d.enqueued_at
+            """,
+            (done, [claimed[c] for c in done]),
         )
+        for creator_id, error in errors.items():
+            cur.execute(
+                """
+                UPDATE search_sync_queue
+                SET attempts = attempts + 1,
+                    last_error = %s,
+                    run_after = NOW() + make_interval(secs => 30 * POWER(2, attempts))
+                WHERE creator_id = %s AND enqueued_at = %s
+                """,
+                (error[:1000], creator_id, claimed[creator_id]),
+            )
+        conn.commit()
+        synced += len(done)
+        failed += len(errors)
+        print(f"Synced {len(done)} creators ({len(errors)} failed)")
+
+    return {"status": "drained", "synced": synced, "failed": failed}
+
+
+def _stream_all(index):
+    """Stream every creator into `index` using a server-side cursor. Returns (total, failed)."""
+    conn = get_db_connection()
+    cur = conn.cursor(name="opensearch_reindex")
+    cur.itersize = REINDEX_FETCH_SIZE
+    cur.execute(CREATOR_DOC_SQL + " ORDER BY c.id")
+
+    total = failed = 0
+    batch = {}
+    for row in cur:
+        creator_id, doc = _row_to_doc(row)
+        if doc is not None:
+            batch[creator_id] = doc
+        if len(batch) >= BULK_MAX_DOCS:
+            failed += len(bulk_index(batch, [index]))
+            total += len(batch)
+            batch = {}
+    if batch:
+        failed += len(bulk_index(batch, [index]))
+        total += len(batch)
+    cur.close()
+    conn.commit()
+    return total, failed
+
+
+def reindex_all(version=None, delete_old=False):
+    """Rebuild versioned index `version` (default: current) from Postgres.
+
+    If that index isn't live yet this is a blue/green rollout (see
+    shared/opensearch.py): the index is created as pending, filled, and the
+    alias flipped to it only when every document made it. Otherwise the live
+    index is re-filled in place.
+    """
+    global _write_targets
+    index = versioned_index(version)
+    blue_green = index not in alias_targets(OPENSEARCH_INDEX)
+    if blue_green:
+        start_blue_green(index)
+        _write_targets = None
+        print(f"Created pending index {index}; waiting {WRITE_TARGETS_TTL}s for sync workers to pick it up")
+        time.sleep(WRITE_TARGETS_TTL + 5)
+
+    total, failed = _stream_all(index)
+    print(f"Reindexed {total} creators into {index} ({failed} failed)")
+
+    result = {"status": "reindexed", "index": index, "indexed": total - failed, "failed": failed}
+    if blue_green:
+        if failed:
+            # Stay pending (still receiving sync writes); re-run to retry
+            result["status"] = "incomplete"
+            return result
+        result["replaced"] = flip_alias(index, delete_old=delete_old)
+        _write_targets = None
+    return result
+
+
+def handler(event, context):
+    """Sync creators into OpenSearch (see module docstring for events).
+
+    Silently skips if OPENSEARCH_ENDPOINT is not configured.
+    """
+    if not OPENSEARCH_ENDPOINT:
+        print("OPENSEARCH_ENDPOINT not set, skipping sync")
+        return {"status": "skipped", "reason": "opensearch not configured"}
+
+    event = event or {}
+    try:
+        if event.get("action") == "reindex":
+            return reindex_all(event.get("version"), delete_old=bool(event.get("delete_old")))
+
+        creator_ids = event.get("creator_ids") or ([event["creator_id"]] if event.get("creator_id") else [])
+        if creator_ids:
+            cur = get_db_connection().cursor()
+            errors = bulk_index(_fetch_docs(cur, creator_ids))
+            get_db_connection().commit()
+            return {"status": "indexed", "indexed": len(creator_ids) - len(errors), "errors": errors}
 
-        print(f"Indexed creator {creator_id}: {resp.status_code}")
-        return {"status": "indexed", "creator_id": creator_id}
+        return drain_queue(context)
 
     except Exception as e:
         # Fail silently — OpenSearch is experimental, don't break the pipeline
-        print(f"OpenSearch sync error for creator {creator_id}: {e}")
+        print(f"OpenSearch sync error: {e}")
+        get_db_connection().rollback()
         return {"status": "error", "reason": str(e)}
@@ -0,0 +1,30 @@
+"""Outbox Consumer Lambda — delivers change_outbox rows (scheduled every minute).
+
+See shared/outbox.py for the handlers and delivery guarantees.
+"""
+
+from shared.db import get_db_connection
+from shared.outbox import process_outbox, purge_processed
+
+# Stop claiming batches when less than this much Lambda time is left
+WORKER_RESERVE_MS = 10000
+
+
+def handler(event, context):
+    """Drain the outbox, then purge old delivered rows.
+
+    Returns:
+        { delivered, purged }
+    """
+    conn = get_db_connection()
+    delivered = 0
+
+    while context is None or context.get_remaining_time_in_millis() > WORKER_RESERVE_MS:
+        count = process_outbox(conn)
+        if not count:
+            break
+        delivered += count
+
+    purged = purge_processed(conn)
+    print(f"Outbox: delivered {delivered}, purged {purged}")
+    return {"delivered": delivered, "purged": purged}
@@ -53,8 +53,48 @@ def _handle_presign(body):
     }
 
 
+def _start_batch_execution(sfn, cur, conn, state_machine_arn, source_bucket, creator_id, videos):
+    """Start a single batch Step Function execution covering all of a creator's pending videos."""
+    items = [
+        {
+            "source_bucket": source_bucket,
+            "s3_key": s3_key,
+            "video_id": str(video_id),
+            "creator_id": str(creator_id),
+        }
+        for video_id, s3_key in videos
+    ]
+    video_ids = [item["video_id"] for item in items]
+
+    try:
+        sfn.start_execution(
+            stateMachineArn=state_machine_arn,
+            name=f"batch-{creator_id}-{uuid.uuid4().hex[:8]}",
+            input=json.dumps({"creator_id": str(creator_id), "videos": items}),
+        )
+    except Exception as e:
+        print(f"Failed to start batch SFN for creator {creator_id}: {e}")
+        return {
+            "statusCode": 500,
+            "headers": {"Access-Control-Allow-Origin": "*", "Content-Type": "application/json"},
+            "body": json.dumps({"error": "Failed to start analysis"}),
+        }
+
+    cur.execute(
+        "UPDATE video_uploads SET status = 'processing' WHERE id = ANY(%s::uuid[])",
+        (video_ids,),
+    )
+    conn.commit()
+
+    return {
+        "statusCode": 200,
+        "headers": {"Access-Control-Allow-Origin": "*", "Content-Type": "application/json"},
+        "body": json.dumps({"started": video_ids, "count": len(video_ids), "mode": "batch"}),
+    }
+
+
 def _handle_start_analysis(body):
-    """Start the Step Function for each uploaded video."""
+    """Start the Step Function for each uploaded video (or one batch execution for all of them)."""
     creator_id = body.get("creator_id")
     if not creator_id:
         return {
@@ -79,8 +119,14 @@ def _handle_start_analysis(body):
         }
 
     sfn = boto3.client("stepfunctions")
-    state_machine_arn = os.environ["STATE_MACHINE_ARN"]
     source_bucket = os.environ["UPLOAD_BUCKET"]
+
+    # Batch mode: one execution for all pending videos, one profile aggregation
+    batch_state_machine_arn = os.environ.get("BATCH_STATE_MACHINE_ARN")
+    if batch_state_machine_arn:
+        return _start_batch_execution(sfn, cur, conn, batch_state_machine_arn, source_bucket, creator_id, videos)
+
+    state_machine_arn = os.environ["STATE_MACHINE_ARN"]
     started = []
 
     for video_id, s3_key in videos:
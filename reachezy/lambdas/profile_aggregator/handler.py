@@ -1,108 +1,200 @@
+"""Profile Aggregator Lambda — derives a creator's style profile and aggregate embedding.
+
+Both are maintained incrementally by triggers (see seed/schema.sql), so the
+cost no longer grows with the creator's video count:
+
+  - style_profile is derived from per-creator counters (shared.style_state)
+    kept by a trigger on video_analyses
+  - the aggregate embedding is the normalized running sum of per-video
+    embeddings in creator_embedding_state, kept by a trigger on
+    video_embeddings; it is rebuilt with SQL SUM() only when the state is
+    missing or out of step with the per-video rows
+
+An event with "rebuild": true recounts both from scratch.
+
+With AGGREGATION_MODE=queued the pipeline's aggregation step only enqueues the
+creator in aggregation_jobs (one row per creator, so a burst of uploads
+coalesces into one job). Each new request pushes the job back by
+AGGREGATION_DEBOUNCE_SECONDS, capped at AGGREGATION_MAX_DELAY_SECONDS after the
+first request; worker_handler (on a schedule) claims due jobs with
+FOR UPDATE SKIP LOCKED and aggregates each creator once.
+"""
+
 import json
-import math
-from collections import Counter
+import os
+import time
 from shared.db import get_db_connection
+from shared.metrics import emit_metric
+from shared.style_state import derive_style_profile, load_style_counts, rebuild_style_counts
 
+AGGREGATION_MODE = os.environ.get("AGGREGATION_MODE", "direct")  # "direct" or "queued"
+AGGREGATION_DEBOUNCE_SECONDS = int(os.environ.get("AGGREGATION_DEBOUNCE_SECONDS", "30"))
+AGGREGATION_MAX_DELAY_SECONDS = int(os.environ.get("AGGREGATION_MAX_DELAY_SECONDS", "120"))
+AGGREGATION_MAX_ATTEMPTS = int(os.environ.get("AGGREGATION_MAX_ATTEMPTS", "5"))
+# Stop claiming jobs when less than this much Lambda time is left
+WORKER_RESERVE_MS = 15000
 
-def _mode(values):
-    """Return the most common value from a list. Returns None if list is empty."""
-    if not values:
-        return None
-    counter = Counter(values)
-    return counter.most_common(1)[0][0]
+
+def _rebuild_embedding_state(cur, creator_id):
+    """Recompute the running sum/count from the per-video rows (full rebuild)."""
+    cur.execute(
+        """
+        INSERT INTO creator_embedding_state (creator_id, embedding_sum, video_count, rebuilt_at)
+        SELECT %s, SUM(embedding), COUNT(*), NOW()
+        FROM video_embeddings
+        WHERE creator_id = %s AND is_creator_aggregate = FALSE AND embedding IS NOT NULL
+        HAVING COUNT(*) > 0
+        ON CONFLICT (creator_id) DO UPDATE SET
+            embedding_sum = EXCLUDED.embedding_sum,
+            video_count = EXCLUDED.video_count,
+            rebuilt_at = NOW(),
+            updated_at = NOW()
+        """,
+        (creator_id, creator_id),
+    )
+    if cur.rowcount == 0:
+        cur.execute("DELETE FROM creator_embedding_state WHERE creator_id = %s", (creator_id,))
 
 
-def _compute_consistency_score(analyses):
-    """Compute a consistency score (0-100) based on tag variance.
+def _refresh_aggregate_embedding(cur, creator_id, video_id, rebuild=False):
+    """Write the creator aggregate row from creator_embedding_state.
 
-    Higher score = more consistent style across videos.
+    Returns the number of videos in the aggregate (0 if there are none yet).
     """
-    if len(analyses) <= 1:
-        return 100
+    if not rebuild:
+        cur.execute(
+            """
+            SELECT s.video_count,
+                   (SELECT COUNT(*) FROM video_embeddings ve
+                    WHERE ve.creator_id = %s AND ve.is_creator_aggregate = FALSE
+                      AND ve.embedding IS NOT NULL)
+            FROM creator_embedding_state s
+            WHERE s.creator_id = %s
+            """,
+            (creator_id, creator_id),
+        )
+        row = cur.fetchone()
+        if not row or row[0] != row[1]:
+            print(f"Embedding state for {creator_id} missing or stale ({row}), rebuilding")
+            rebuild = True
 
-    fields = ["energy_level", "aesthetic", "setting", "production_quality", "content_type"]
-    field_scores = []
+    if rebuild:
+        _rebuild_embedding_state(cur, creator_id)
 
-    for field in fields:
-        values = [a.get(field) for a in analyses if a.get(field)]
-        if not values:
-            continue
-        counter = Counter(values)
-        most_common_count = counter.most_common(1)[0][1]
-        # Ratio of the most common value to total values
-        consistency = most_common_count / len(values)
-        field_scores.append(consistency)
+    cur.execute(
+        """
+        SELECT video_count FROM creator_embedding_state
+        WHERE creator_id = %s AND video_count > 0
+        """,
+        (creator_id,),
+    )
+    row = cur.fetchone()
+    if not row:
+        return 0
 
-    if not field_scores:
-        return 50
+    # Upsert the creator aggregate embedding safely via Delete + Insert
+    cur.execute(
+        "DELETE FROM video_embeddings WHERE creator_id = %s AND is_creator_aggregate = TRUE",
+        (creator_id,)
+    )
+    # The mean points the same way as the sum, so normalizing the sum gives the same vector
+    cur.execute(
+        """
+        INSERT INTO video_embeddings (video_id, creator_id, embedding, is_creator_aggregate)
+        SELECT %s, creator_id, l2_normalize(embedding_sum), TRUE
+        FROM creator_embedding_state
+        WHERE creator_id = %s
+        """,
+        (video_id, creator_id),
+    )
+    return row[0]
 
-    # Average consistency across all fields, scaled to 0-100
-    return round((sum(field_scores) / len(field_scores)) * 100)
 
+def _aggregate(cur, creator_id, video_id, rebuild=False):
+    """Recompute and store a creator's style profile and aggregate embedding.
 
-def _normalize_vector(vec):
-    """L2 normalize a vector using pure Python."""
-    magnitude = math.sqrt(sum(v * v for v in vec))
-    if magnitude == 0:
-        return vec
-    return [v / magnitude for v in vec]
+    Runs in the caller's transaction (the caller commits). Returns the
+    style_profile, or None if the creator has no analyses.
+    """
+    # Serialize aggregations of the same creator (creators row + aggregate embedding)
+    cur.execute("SELECT pg_advisory_xact_lock(hashtext(%s))", (str(creator_id),))
 
+    # Style counters are maintained incrementally; recount only if missing or asked to
+    counts = {} if rebuild else load_style_counts(cur, creator_id)
+    if not counts:
+        rebuild_style_counts(cur, creator_id)
+        counts = load_style_counts(cur, creator_id)
 
-def _average_embeddings(embeddings):
-    """Compute element-wise average of multiple embedding vectors, then L2 normalize."""
-    if not embeddings:
+    style_profile = derive_style_profile(counts)
+    if style_profile is None:
         return None
 
-    dim = len(embeddings[0])
-    count = len(embeddings)
-
-    # Element-wise sum
-    avg = [0.0] * dim
-    for emb in embeddings:
-        for i in range(dim):
-            avg[i] += emb[i]
-
-    # Element-wise average
-    avg = [v / count for v in avg]
-
-    # L2 normalize
-    return _normalize_vector(avg)
+    # Compute creator aggregate embedding (mean of all video embeddings)
+    embedded_videos = _refresh_aggregate_embedding(cur, creator_id, video_id, rebuild=rebuild)
+    print(f"Aggregate embedding for {creator_id} covers {embedded_videos} video(s)")
 
+    # Update creators.style_profile JSONB
+    cur.execute(
+        """
+        UPDATE creators
+        SET style_profile = %s::jsonb, updated_at = NOW()
+        WHERE id = %s
+        """,
+        (json.dumps(style_profile), creator_id),
+    )
 
-def _build_composite_summary(analyses, dominant_energy, dominant_aesthetic,
-                              primary_content_type, all_topics):
-    """Build a creator-level summary reflecting all analyzed videos."""
-    total = len(analyses)
+    # Update all video_uploads status to 'completed' for this creator
+    cur.execute(
+        """
+        UPDATE video_uploads
+        SET status = 'completed'
+        WHERE creator_id = %s AND status IN ('uploaded', 'processing')
+        """,
+        (creator_id,),
+    )
 
-    # Always build a creator-level summary (even for 1 video)
-    parts = []
-    if primary_content_type:
-        parts.append(primary_content_type)
-    if dominant_aesthetic:
-        parts.append(dominant_aesthetic)
-    if dominant_energy:
-        parts.append(dominant_energy)
+    return style_profile
 
-    style_desc = ", ".join(parts) if parts else "mixed-style"
-    topic_str = ", ".join(all_topics[:5]) if all_topics else "various subjects"
 
-    if total == 1:
-        return f"Creator produces {style_desc} content focused on {topic_str}."
+def _enqueue(cur, creator_id, video_id):
+    """Add or push back the creator's pending job. Returns True if one was already queued.
 
-    return (
-        f"Across {total} videos: Creator produces {style_desc} content "
-        f"focused on {topic_str}."
+    A new request also clears a failed job's attempts, so a creator whose job
+    ran out of retries is aggregated again on the next upload.
+    """
+    cur.execute(
+        """
+        INSERT INTO aggregation_jobs (creator_id, video_id, run_after)
+        VALUES (%s, %s, NOW() + make_interval(secs => %s))
+        ON CONFLICT (creator_id) DO UPDATE SET
+            video_id = EXCLUDED.video_id,
+            request_count = aggregation_jobs.request_count + 1,
+            last_requested_at = NOW(),
+            attempts = 0,
+            last_error = NULL,
+            run_after = LEAST(
+                NOW() + make_interval(secs => %s),
+                aggregation_jobs.first_requested_at + make_interval(secs => %s)
+            )
+        RETURNING request_count > 1
+        """,
+        (creator_id, video_id, AGGREGATION_DEBOUNCE_SECONDS,
+         AGGREGATION_DEBOUNCE_SECONDS, AGGREGATION_MAX_DELAY_SECONDS),
     )
+    return cur.fetchone()[0]
 
 
 def handler(event, context):
     """Aggregate style profile and embeddings for a creator.
 
     Receives:
-        { video_id, creator_id }
+        { video_id, creator_id, rebuild?, immediate? }
 
     Returns:
         { creator_id, style_profile }
+        or, in queued mode, { creator_id, queued: true, coalesced }
+
+    "immediate": true aggregates now even in queued mode (batch pipeline).
     """
     video_id = event["video_id"]
     creator_id = event["creator_id"]
@@ -110,144 +202,92 @@ def handler(event, context):
     conn = get_db_connection()
     cur = conn.cursor()
 
-    # Fetch ALL video analyses for this creator
-    cur.execute(
-        """
-        SELECT va.video_id, va.energy_level, va.aesthetic, va.setting,
-               va.production_quality, va.content_type, va.topics,
-               va.dominant_colors, va.has_text_overlay, va.face_visible, va.summary
-        FROM video_analyses va
-        JOIN video_uploads vu ON va.video_id = vu.id
-        WHERE va.creator_id = %s
-        ORDER BY vu.created_at DESC
-        """,
-        (creator_id,),
-    )
-    rows = cur.fetchall()
+    if AGGREGATION_MODE == "queued" and not event.get("immediate"):
+        coalesced = _enqueue(cur, creator_id, video_id)
+        conn.commit()
+        emit_metric("AggregationCoalesced" if coalesced else "AggregationQueued")
+        print(f"Queued aggregation for {creator_id} (coalesced={coalesced})")
+        return {"creator_id": creator_id, "queued": True, "coalesced": coalesced}
+
+    style_profile = _aggregate(cur, creator_id, video_id, rebuild=bool(event.get("rebuild")))
+    conn.commit()
 
-    if not rows:
+    if style_profile is None:
         return {
             "creator_id": creator_id,
             "style_profile": {"error": "No video analyses found"},
         }
 
-    analyses = []
-    for row in rows:
-        topics = row[6]
-        if isinstance(topics, str):
-            topics = json.loads(topics)
-
-        analyses.append({
-            "video_id": str(row[0]),
-            "energy_level": row[1],
-            "aesthetic": row[2],
-            "setting": row[3],
-            "production_quality": row[4],
-            "content_type": row[5],
-            "topics": topics or [],
-            "has_text_overlay": row[8],
-            "face_visible": row[9],
-            "summary": row[10],
-        })
-
-    # Compute aggregate style profile
-    all_topics = []
-    for a in analyses:
-        all_topics.extend(a.get("topics", []))
-    all_topics = list(set(all_topics))  # deduplicate
-
-    face_count = sum(1 for a in analyses if a.get("face_visible"))
-    text_count = sum(1 for a in analyses if a.get("has_text_overlay"))
-    total = len(analyses)
-
-    # Compute energy_score: high/chaotic=80-90, medium/moderate=50-60, low/calm=20-30
-    dominant_energy = _mode([a["energy_level"] for a in analyses if a.get("energy_level")]) or "medium"
-    energy_map = {"high": 80, "chaotic": 90, "medium": 55, "moderate": 55, "low": 30, "calm": 25}
-    energy_score = energy_map.get(dominant_energy, 50)
-
-    # Compute settings breakdown
-    setting_counter = Counter([a["setting"] for a in analyses if a.get("setting")])
-    settings = [
-        {"name": name, "pct": round((count / total) * 100)}
-        for name, count in setting_counter.most_common()
-    ] if total > 0 else []
-
-    style_profile = {
-        "dominant_energy": dominant_energy,
-        "energy_score": energy_score,
-        "dominant_aesthetic": _mode([a["aesthetic"] for a in analyses if a.get("aesthetic")]),
-        "primary_content_type": _mode([a["content_type"] for a in analyses if a.get("content_type")]),
-        "topics": all_topics,
-        "face_visible_pct": round((face_count / total) * 100, 1) if total > 0 else 0,
-        "text_overlay_pct": round((text_count / total) * 100, 1) if total > 0 else 0,
-        "settings": settings,
-        "style_summary": _build_composite_summary(analyses, dominant_energy,
-            _mode([a["aesthetic"] for a in analyses if a.get("aesthetic")]),
-            _mode([a["content_type"] for a in analyses if a.get("content_type")]),
-            all_topics),
-        "video_count": total,
-        "consistency_score": _compute_consistency_score(analyses),
+    return {
+        "creator_id": creator_id,
+        "style_profile": style_profile,
     }
 
-    # Compute creator aggregate embedding (average of all video embeddings)
-    cur.execute(
-        """
-        SELECT embedding::text
-        FROM video_embeddings
-        WHERE creator_id = %s AND is_creator_aggregate = FALSE
-        """,
-        (creator_id,),
-    )
-    embedding_rows = cur.fetchall()
 
-    embeddings = []
-    for erow in embedding_rows:
-        raw = erow[0]
-        # Parse pgvector string format "[0.1,0.2,...]"
-        raw = raw.strip("[]")
-        vec = [float(v) for v in raw.split(",")]
-        embeddings.append(vec)
+def worker_handler(event, context):
+    """Scheduled worker: run due aggregation_jobs, one creator per transaction.
 
-    if embeddings:
-        aggregate_embedding = _average_embeddings(embeddings)
-        embedding_str = "[" + ",".join(str(v) for v in aggregate_embedding) + "]"
+    Jobs are claimed with FOR UPDATE SKIP LOCKED, so concurrent workers never
+    run the same creator; a request arriving mid-run waits on the row lock and
+    re-queues the creator after the job is deleted. A failed run is rolled back
+    to a savepoint taken after the claim, so the job is rescheduled while still
+    locked, and retried with backoff up to AGGREGATION_MAX_ATTEMPTS.
 
-        # Upsert the creator aggregate embedding safely via Delete + Insert
-        cur.execute(
-            "DELETE FROM video_embeddings WHERE creator_id = %s AND is_creator_aggregate = TRUE",
-            (creator_id,)
-        )
+    Returns:
+        { processed, failed }
+    """
+    conn = get_db_connection()
+    cur = conn.cursor()
+    processed = failed = 0
+
+    while context is None or context.get_remaining_time_in_millis() > WORKER_RESERVE_MS:
         cur.execute(
             """
-            INSERT INTO video_embeddings (video_id, creator_id, embedding, is_creator_aggregate)
-            VALUES (%s, %s, %s::vector, TRUE)
+            SELECT creator_id, video_id, request_count, first_requested_at
+            FROM aggregation_jobs
+            WHERE run_after <= NOW() AND attempts < %s
+            ORDER BY run_after
+            LIMIT 1
+            FOR UPDATE SKIP LOCKED
             """,
-            (video_id, creator_id, embedding_str),
+            (AGGREGATION_MAX_ATTEMPTS,),
         )
+        job = cur.fetchone()
+        if not job:
+            conn.commit()
+            break
+
+        creator_id, video_id, request_count, first_requested_at = job
+        creator_id = str(creator_id)
+        start = time.time()
+        cur.execute("SAVEPOINT aggregate")
+        try:
+            _aggregate(cur, creator_id, str(video_id))
+            cur.execute("DELETE FROM aggregation_jobs WHERE creator_id = %s", (creator_id,))
+        except Exception as e:
+            # Undoes the aggregation only; the job row stays locked by this worker
+            cur.execute("ROLLBACK TO SAVEPOINT aggregate")
+            print(f"Aggregation failed for {creator_id}: {e}")
+            cur.execute(
+                """
+                UPDATE aggregation_jobs
+                SET attempts = attempts + 1,
+                    last_error = %s,
+                    run_after = NOW() + make_interval(secs => 30 * POWER(2, attempts))
+                WHERE creator_id = %s
+                """,
+                (str(e)[:1000], creator_id),
+            )
+            conn.commit()
+            emit_metric("AggregationFailed")
+            failed += 1
+            continue
+        conn.commit()
 
-    # Update creators.style_profile JSONB
-    cur.execute(
-        """
-        UPDATE creators
-        SET style_profile = %s::jsonb, updated_at = NOW()
-        WHERE id = %s
-        """,
-        (json.dumps(style_profile), creator_id),
-    )
-
-    # Update all video_uploads status to 'completed' for this creator
-    cur.execute(
-        """
-        UPDATE video_uploads
-        SET status = 'completed'
-        WHERE creator_id = %s AND status IN ('uploaded', 'processing')
-        """,
-        (creator_id,),
-    )
-
-    conn.commit()
+        processed += 1
+        print(f"Aggregated {creator_id}: {request_count} request(s) coalesced "
+              f"in {(time.time() - start) * 1000:.0f}ms")
+        emit_metric("AggregationRequestsPerRun", request_count)
 
-    return {
-        "creator_id": creator_id,
-        "style_profile": style_profile,
-    }
+    print(f"Aggregation worker done: {processed} processed, {failed} failed")
+    return {"processed": processed, "failed": failed}
@@ -0,0 +1,89 @@
+"""Search Snapshot Lambda — exports creators to a columnar S3 snapshot (scheduled).
+
+Streams every creator, with its aggregate embedding (if any), rate card and
+style fields, through a server-side cursor into a versioned .npy snapshot
+(shared/vector_snapshot.py), uploads it to SEARCH_SNAPSHOT_BUCKET and moves
+LATEST. brand_search's memory backend polls LATEST; offline ranking and
+analytics read the same snapshot (scripts/creator_snapshot.py) instead of
+the production database. When nothing changed since the last snapshot, only
+LATEST's valid_at is moved forward.
+
+"Nothing changed" is decided in commit order, not by timestamps: the outbox
+triggers record every insert, update and delete of creators, rate cards and
+aggregates with the writing transaction's id, and a change counts if its
+transaction is not visible in the snapshot's pg_snapshot. A row timestamp
+is set when the writer's transaction starts, so a change that commits after
+the snapshot can carry a time before it.
+"""
+
+import shutil
+import time
+from shared.db import get_db_connection
+from shared.metrics import emit_metric
+from shared.outbox import OUTBOX_RETENTION_DAYS
+from shared.vector_snapshot import (
+    SNAPSHOT_BUCKET,
+    SNAPSHOT_DIR,
+    build_snapshot,
+    latest_manifest,
+    touch_latest,
+    upload_snapshot,
+)
+
+
+def _changed_since(cur, manifest):
+    """(any change committed outside `manifest`'s snapshot, now as database epoch seconds).
+
+    Unknown when the manifest predates xact_snapshot, or is older than the
+    outbox keeps processed rows; both count as changed.
+    """
+    snapshot = manifest.get("xact_snapshot")
+    if not snapshot or time.time() - manifest["built_at"] > OUTBOX_RETENTION_DAYS * 86400:
+        return True, None
+    cur.execute(
+        """
+        SELECT EXISTS (
+                   SELECT 1 FROM change_outbox
+                   WHERE xact_id >= pg_snapshot_xmin(%s::pg_snapshot)
+                     AND NOT pg_visible_in_snapshot(xact_id, %s::pg_snapshot)),
+               EXTRACT(EPOCH FROM NOW())
+        """,
+        (snapshot, snapshot),
+    )
+    changed, now = cur.fetchone()
+    return changed, float(now)
+
+
+def handler(event, context):
+    """Build and publish a snapshot. Event: { force? }.
+
+    Returns:
+        { status, version?, count? }
+    """
+    if not SNAPSHOT_BUCKET:
+        print("SEARCH_SNAPSHOT_BUCKET not set, skipping snapshot")
+        return {"status": "skipped", "reason": "no snapshot bucket"}
+
+    conn = get_db_connection()
+    if not (event or {}).get("force"):
+        try:
+            previous = latest_manifest()
+        except Exception:
+            previous = None
+        changed, now = _changed_since(conn.cursor(), previous) if previous else (True, None)
+        conn.rollback()
+        if not changed:
+            # Still current: extend its validity so readers' freshness bound holds
+            touch_latest(previous, now)
+            print(f"No changes since snapshot {previous['version']}, extended to {now:.0f}")
+            return {"status": "unchanged", "version": previous["version"]}
+
+    try:
+        manifest = build_snapshot(conn)
+        upload_snapshot(manifest)
+    finally:
+        shutil.rmtree(SNAPSHOT_DIR, ignore_errors=True)
+
+    emit_metric("SearchSnapshotCreators", manifest["count"])
+    print(f"Published search snapshot {manifest['version']} ({manifest['count']} creators)")
+    return {"status": "published", "version": manifest["version"], "count": manifest["count"]}
@@ -0,0 +1,105 @@
+"""Analysis result cache keyed by frame content, prompt and model.
+
+Step Functions retries (and re-runs after an embedding or aggregation failure)
+call video_analyzer again with exactly the same frames. The cache stores the
+raw model text and the parsed analysis under
+    (sha256 of all frame bytes, sha256 of the prompt + analysis rules, model id)
+so a repeat analysis of identical frames costs one indexed SELECT instead of a
+Bedrock / Groq call. Changing the prompt, the tool schema, the label synonyms /
+normalization rules or the model naturally misses.
+"""
+
+import hashlib
+import json
+import os
+from shared.db import get_db_connection
+from shared.metrics import emit_metric
+
+ANALYSIS_CACHE_ENABLED = os.environ.get("ANALYSIS_CACHE_ENABLED", "true").lower() == "true"
+
+
+def frames_hash(frame_data_list):
+    """sha256 over every frame's bytes (length-prefixed so boundaries count)."""
+    digest = hashlib.sha256()
+    for frame_bytes in frame_data_list:
+        digest.update(f"{len(frame_bytes)}:".encode("utf-8"))
+        digest.update(frame_bytes)
+    return digest.hexdigest()
+
+
+def prompt_hash(prompt, rules=""):
+    """sha256 of the prompt plus the analysis rules fingerprint (schema, synonyms)."""
+    digest = hashlib.sha256()
+    digest.update(f"{len(prompt)}:".encode("utf-8"))
+    digest.update(prompt.encode("utf-8"))
+    digest.update(rules.encode("utf-8"))
+    return digest.hexdigest()
+
+
+def get_cached_analysis(frame_hash, prompt_digest, model_ids):
+    """Return (analysis, model_id) for the first model in `model_ids` with a cached
+    result, or None. Never raises — a cache failure just means calling the model.
+    """
+    if not ANALYSIS_CACHE_ENABLED or not model_ids:
+        return None
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT analysis, model_id
+            FROM analysis_cache
+            WHERE frame_hash = %s AND prompt_hash = %s AND model_id = ANY(%s)
+            ORDER BY array_position(%s::text[], model_id::text)
+            LIMIT 1
+            """,
+            (frame_hash, prompt_digest, list(model_ids), list(model_ids)),
+        )
+        row = cur.fetchone()
+        if not row:
+            emit_metric("AnalysisCacheMiss")
+            return None
+
+        cur.execute(
+            """
+            UPDATE analysis_cache
+            SET hit_count = hit_count + 1, last_hit_at = NOW()
+            WHERE frame_hash = %s AND prompt_hash = %s AND model_id = %s
+            """,
+            (frame_hash, prompt_digest, row[1]),
+        )
+        conn.commit()
+
+        analysis = row[0]
+        if isinstance(analysis, str):
+            analysis = json.loads(analysis)
+        emit_metric("AnalysisCacheHit")
+        return analysis, row[1]
+    except Exception as e:
+        print(f"Analysis cache lookup failed: {e}")
+        get_db_connection().rollback()
+        return None
+
+
+def put_cached_analysis(frame_hash, prompt_digest, model_id, raw_text, analysis):
+    """Store a model result. Never raises."""
+    if not ANALYSIS_CACHE_ENABLED:
+        return
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        cur.execute(
+            """
+            INSERT INTO analysis_cache (frame_hash, prompt_hash, model_id, raw_text, analysis)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (frame_hash, prompt_hash, model_id) DO UPDATE SET
+                raw_text = EXCLUDED.raw_text,
+                analysis = EXCLUDED.analysis,
+                created_at = NOW()
+            """,
+            (frame_hash, prompt_digest, model_id, raw_text, json.dumps(analysis)),
+        )
+        conn.commit()
+    except Exception as e:
+        print(f"Analysis cache write failed: {e}")
+        get_db_connection().rollback()
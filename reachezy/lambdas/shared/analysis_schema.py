@@ -0,0 +1,154 @@
+"""JSON schema and strict validator for video analyses.
+
+The schema is sent to Bedrock as the input schema of a forced tool call (and
+Groq runs in JSON mode), so the model returns a JSON object directly instead of
+prose to be regex-scraped. validate_analysis() then normalizes free-form labels
+onto the controlled vocabulary in shared.models and reports anything it can't
+fix, so the analyzer can run one text-only repair call or fail loudly — never
+store a default template that would be embedded and pollute search.
+"""
+
+import json
+from shared.models import (
+    AESTHETICS,
+    ENERGY_LEVELS,
+    LABEL_SYNONYMS,
+    PRODUCTION_QUALITIES,
+    SETTINGS,
+    VIDEO_CONTENT_TYPES,
+)
+
+ANALYSIS_TOOL_NAME = "record_video_analysis"
+
+# Label fields and their allowed values
+VOCABULARY = {
+    "energy_level": ENERGY_LEVELS,
+    "aesthetic": AESTHETICS,
+    "setting": SETTINGS,
+    "production_quality": PRODUCTION_QUALITIES,
+    "content_type": VIDEO_CONTENT_TYPES,
+}
+
+ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        **{field: {"type": "string", "enum": values} for field, values in VOCABULARY.items()},
+        "topics": {"type": "array", "items": {"type": "string"}, "minItems": 1, "maxItems": 5},
+        "dominant_colors": {"type": "array", "items": {"type": "string"}, "maxItems": 3},
+        "text_on_screen": {"type": "boolean"},
+        "face_visible": {"type": "boolean"},
+        "summary": {"type": "string"},
+    },
+    "required": [
+        "energy_level", "aesthetic", "setting", "production_quality", "content_type",
+        "topics", "dominant_colors", "text_on_screen", "face_visible", "summary",
+    ],
+}
+
+
+class AnalysisValidationError(Exception):
+    """Model output could not be turned into a valid analysis.
+
+    Raised out of the analyzer Lambda under this class name so the state
+    machine can skip its retries for it (re-running won't fix the output).
+    """
+
+    def __init__(self, errors, raw_text=""):
+        super().__init__("Invalid analysis: " + "; ".join(errors))
+        self.errors = errors
+        self.raw_text = raw_text
+
+
+# Bump when normalize_label() / validate_analysis() change how model output
+# becomes a stored analysis, so cached analyses from the old rules miss
+ANALYSIS_RULES_VERSION = 1
+
+
+def analysis_rules_fingerprint():
+    """Everything besides the prompt text that shapes a stored analysis: the tool
+    schema, the synonym table and the normalization rules version.
+    """
+    return json.dumps(
+        {
+            "schema": ANALYSIS_SCHEMA,
+            "synonyms": LABEL_SYNONYMS,
+            "rules_version": ANALYSIS_RULES_VERSION,
+        },
+        sort_keys=True,
+    )
+
+
+def normalize_label(field, value):
+    """Map a free-form label onto the vocabulary for `field`, or return None."""
+    if not isinstance(value, str):
+        return None
+    label = value.strip().lower().replace("_", " ")
+    allowed = VOCABULARY[field]
+    if label in allowed:
+        return label
+    synonyms = LABEL_SYNONYMS.get(field, {})
+    if label in synonyms:
+        return synonyms[label]
+    # Multi-word labels ("high energy", "clean minimal look"): first recognised word wins
+    for word in label.replace("/", " ").replace("-", " ").split():
+        if word in allowed:
+            return word
+        if word in synonyms:
+            return synonyms[word]
+    return None
+
+
+def _string_list(value, limit):
+    if not isinstance(value, list):
+        return None
+    items = [str(item).strip().lower() for item in value if isinstance(item, (str, int, float)) and str(item).strip()]
+    return items[:limit]
+
+
+def _as_bool(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in ("true", "yes", "false", "no"):
+        return value.strip().lower() in ("true", "yes")
+    return None
+
+
+def validate_analysis(data):
+    """Validate and normalize a parsed analysis object.
+
+    Returns (analysis, errors); analysis is only usable when errors is empty.
+    """
+    if not isinstance(data, dict):
+        return None, ["analysis must be a JSON object"]
+
+    errors = []
+    analysis = {}
+
+    for field, allowed in VOCABULARY.items():
+        label = normalize_label(field, data.get(field))
+        if label is None:
+            errors.append(f"{field}={data.get(field)!r} is not one of {allowed}")
+        analysis[field] = label
+
+    topics = _string_list(data.get("topics"), 5)
+    if not topics:
+        errors.append("topics must be a non-empty list of strings")
+    analysis["topics"] = topics or []
+
+    colors = _string_list(data.get("dominant_colors"), 3)
+    if colors is None:
+        errors.append("dominant_colors must be a list of strings")
+    analysis["dominant_colors"] = colors or []
+
+    for field in ("text_on_screen", "face_visible"):
+        value = _as_bool(data.get(field))
+        if value is None:
+            errors.append(f"{field} must be true or false")
+        analysis[field] = bool(value)
+
+    summary = data.get("summary")
+    if not isinstance(summary, str) or not summary.strip():
+        errors.append("summary must be a non-empty string")
+    analysis["summary"] = summary.strip() if isinstance(summary, str) else ""
+
+    return analysis, errors
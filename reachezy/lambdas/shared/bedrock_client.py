@@ -1,44 +1,440 @@
-"""Shared Bedrock client helper — assumes cross-account role if BEDROCK_ROLE_ARN is set."""
+"""Shared Bedrock client helper — assumes cross-account role if BEDROCK_ROLE_ARN is set.
+
+invoke_bedrock() adds client-side rate limiting, backoff on throttling,
+per-model circuit breakers and optional cross-region failover on top of the
+pooled clients.
+"""
 
 import os
+import random
+import threading
+import time
 import boto3
+from botocore.config import Config
+from botocore.credentials import CredentialProvider, CredentialResolver, RefreshableCredentials
+from botocore.exceptions import (
+    ClientError,
+    ConnectionClosedError,
+    ConnectTimeoutError,
+    EndpointConnectionError,
+    ReadTimeoutError,
+)
+from botocore.session import get_session as get_botocore_session
+from shared.db import connect
+from shared.metrics import emit_metric
 
-_cached_client = None
-_cached_region = None
+# Connection tuning — Bedrock calls are long-lived HTTPS requests, keep them warm
+BEDROCK_MAX_POOL_CONNECTIONS = int(os.environ.get("BEDROCK_MAX_POOL_CONNECTIONS", "20"))
+BEDROCK_READ_TIMEOUT = int(os.environ.get("BEDROCK_READ_TIMEOUT", "120"))
+# invoke_bedrock does its own backoff, so botocore makes one retry at most.
+# Those SDK retries run inside each invoke_bedrock attempt, without taking a
+# rate-limiter token: one attempt can be up to this many HTTP requests.
+BEDROCK_SDK_MAX_ATTEMPTS = int(os.environ.get("BEDROCK_SDK_MAX_ATTEMPTS", "2"))
+# Seconds before the temporary credentials expire at which botocore re-assumes
+# the role: from the advisory point one caller refreshes while the others keep
+# using the current credentials; only inside the mandatory window do all block
+CREDENTIAL_ADVISORY_REFRESH = 900
+CREDENTIAL_MANDATORY_REFRESH = 300
 
+_clients = {}  # (region, role_arn) -> bedrock-runtime client
+_clients_lock = threading.Lock()
 
-def get_bedrock_client(region="us-east-1"):
-    """Return a bedrock-runtime client, assuming cross-account role if configured.
 
-    If BEDROCK_ROLE_ARN env var is set, uses STS to assume that role and
-    creates the client with temporary credentials. Otherwise falls back to
-    the Lambda's default credentials.
+def _client_config():
+    return Config(
+        max_pool_connections=BEDROCK_MAX_POOL_CONNECTIONS,
+        tcp_keepalive=True,
+        connect_timeout=5,
+        read_timeout=BEDROCK_READ_TIMEOUT,
+        retries={"mode": "standard", "total_max_attempts": BEDROCK_SDK_MAX_ATTEMPTS},
+    )
 
-    The client is cached for the lifetime of the Lambda container (credentials
-    last 1 hour, Lambda containers rarely live that long).
-    """
-    global _cached_client, _cached_region
 
-    if _cached_client and _cached_region == region:
-        return _cached_client
+class _AssumedRoleProvider(CredentialProvider):
+    """Credential provider that hands botocore ready RefreshableCredentials."""
+
+    METHOD = "sts-assume-role"
+    CANONICAL_NAME = "reachezy-assume-role"
 
-    role_arn = os.environ.get("BEDROCK_ROLE_ARN")
-    if role_arn:
+    def __init__(self, credentials):
+        super().__init__()
+        self._credentials = credentials
+
+    def load(self):
+        return self._credentials
+
+
+def _assumed_role_session(role_arn):
+    """boto3 Session whose credentials re-assume `role_arn` before they expire.
+
+    Warm containers outlive the 1h STS session. Once the credentials are within
+    CREDENTIAL_ADVISORY_REFRESH of expiry, the next Bedrock request re-assumes
+    the role synchronously (one STS call on that request), while concurrent
+    requests keep signing with the current credentials; only within
+    CREDENTIAL_MANDATORY_REFRESH do all callers wait for the refresh.
+    """
+    sts = boto3.client("sts")
+
+    def _refresh():
         print(f"Assuming cross-account role: {role_arn}")
-        sts = boto3.client("sts")
         creds = sts.assume_role(
             RoleArn=role_arn,
             RoleSessionName="reachezy-bedrock",
         )["Credentials"]
-        _cached_client = boto3.client(
-            "bedrock-runtime",
-            region_name=region,
-            aws_access_key_id=creds["AccessKeyId"],
-            aws_secret_access_key=creds["SecretAccessKey"],
-            aws_session_token=creds["SessionToken"],
-        )
+        return {
+            "access_key": creds["AccessKeyId"],
+            "secret_key": creds["SecretAccessKey"],
+            "token": creds["SessionToken"],
+            "expiry_time": creds["Expiration"].isoformat(),
+        }
+
+    credentials = RefreshableCredentials.create_from_metadata(
+        metadata=_refresh(),
+        refresh_using=_refresh,
+        method=_AssumedRoleProvider.METHOD,
+        advisory_timeout=CREDENTIAL_ADVISORY_REFRESH,
+        mandatory_timeout=CREDENTIAL_MANDATORY_REFRESH,
+    )
+    botocore_session = get_botocore_session()
+    botocore_session.register_component(
+        "credential_provider", CredentialResolver(providers=[_AssumedRoleProvider(credentials)]),
+    )
+    return boto3.Session(botocore_session=botocore_session)
+
+
+def get_bedrock_client(region="us-east-1"):
+    """Return a bedrock-runtime client, assuming cross-account role if configured.
+
+    If BEDROCK_ROLE_ARN env var is set, the client uses refreshable credentials
+    for that role (see _assumed_role_session). Otherwise it uses the Lambda's
+    default credentials.
+
+    Clients are pooled per (region, role) for the lifetime of the container, so
+    calling different regions doesn't evict each other's connections.
+    """
+    role_arn = (os.environ.get("BEDROCK_ROLE_ARN") or "").strip()
+    key = (region, role_arn)
+
+    client = _clients.get(key)
+    if client:
+        return client
+
+    with _clients_lock:
+        if key not in _clients:
+            session = _assumed_role_session(role_arn) if role_arn else boto3.Session()
+            _clients[key] = session.client("bedrock-runtime", region_name=region, config=_client_config())
+        return _clients[key]
+
+
+# =============================================================================
+# Rate-limited, breaker-protected invocation
+# =============================================================================
+#
+# invoke_bedrock() wraps a bedrock-runtime call with:
+#   - a per-region token bucket (adaptive: halves its rate on throttling,
+#     creeps back up on success)
+#   - exponential backoff with full jitter on ThrottlingException
+#   - a per-(model, region) circuit breaker whose state lives in Postgres
+#     (bedrock_circuit_breakers) so every container sees a tripped model
+#   - failover to BEDROCK_FAILOVER_REGIONS while a region's breaker is open,
+#     with geographic inference profile IDs (us., eu., apac.) mapped to the
+#     target region
+#   - EMF metrics: BedrockThrottle, BedrockBreakerOpen, BedrockCircuitRejected,
+#     BedrockRegionFailover
+
+BEDROCK_RATE_PER_SEC = float(os.environ.get("BEDROCK_RATE_PER_SEC", "2"))
+BEDROCK_BURST = int(os.environ.get("BEDROCK_BURST", "4"))
+BEDROCK_MAX_RETRIES = int(os.environ.get("BEDROCK_MAX_RETRIES", "3"))
+BEDROCK_BACKOFF_BASE = float(os.environ.get("BEDROCK_BACKOFF_BASE", "0.5"))
+BEDROCK_BACKOFF_CAP = float(os.environ.get("BEDROCK_BACKOFF_CAP", "8"))
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_COOLDOWN_SECONDS = int(os.environ.get("BREAKER_COOLDOWN_SECONDS", "30"))
+# Failures trip the breaker only if BREAKER_FAILURE_THRESHOLD of them fall in this window
+BREAKER_FAILURE_WINDOW_SECONDS = int(os.environ.get("BREAKER_FAILURE_WINDOW_SECONDS", "60"))
+# How long a container trusts its last read of a breaker row
+BREAKER_CACHE_SECONDS = 5
+# Regions to try, in order, when a model's breaker is open in the requested region
+BEDROCK_FAILOVER_REGIONS = [
+    r.strip() for r in os.environ.get("BEDROCK_FAILOVER_REGIONS", "").split(",") if r.strip()
+]
+
+# Error codes that mean "back off", not "this request is wrong"
+THROTTLE_CODES = {"ThrottlingException", "TooManyRequestsException", "ServiceQuotaExceededException"}
+TRANSIENT_CODES = {"ServiceUnavailableException", "ModelNotReadyException", "InternalServerException"}
+# Network failures reaching the endpoint: transient, retried with backoff
+CONNECTION_ERRORS = (EndpointConnectionError, ConnectTimeoutError, ConnectionClosedError)
+# The model stopped responding: already cost BEDROCK_READ_TIMEOUT per SDK
+# attempt, so it counts against the breaker without another attempt here
+TIMEOUT_ERRORS = (ReadTimeoutError,)
+
+
+# Geographic cross-region inference profile prefix per region prefix
+INFERENCE_PROFILE_GEOS = {"us-gov": "us-gov", "us": "us", "eu": "eu", "ap": "apac", "ca": "ca"}
+
+
+class CircuitOpenError(RuntimeError):
+    """The model's circuit breaker is open in every region; the call was not attempted."""
+
+
+class InvocationCancelled(RuntimeError):
+    """The caller set `cancel`; no further attempt was made."""
+
+
+class _TokenBucket:
+    """Thread-safe token bucket with additive-increase / multiplicative-decrease rate."""
+
+    def __init__(self, rate, burst):
+        self.max_rate = rate
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def on_throttle(self):
+        with self.lock:
+            self.rate = max(self.max_rate / 16, self.rate / 2)
+
+    def on_success(self):
+        with self.lock:
+            self.rate = min(self.max_rate, self.rate + self.max_rate / 10)
+
+
+_buckets = {}  # region -> _TokenBucket (Bedrock quotas are per region)
+_breaker_cache = {}  # (model_id, region) -> (checked_at, state, opened_at, failure_count)
+_breaker_conn = None  # autocommit connection used only for breaker state
+_breaker_lock = threading.Lock()
+
+
+def _bucket_for(region):
+    bucket = _buckets.get(region)
+    if bucket is None:
+        bucket = _buckets.setdefault(region, _TokenBucket(BEDROCK_RATE_PER_SEC, BEDROCK_BURST))
+    return bucket
+
+
+def model_for_region(model_id, region):
+    """`model_id` as it resolves in `region`.
+
+    Geographic inference profile IDs only exist in their own geography
+    ("us.amazon.nova-..." is unknown in eu-west-1), so failover swaps the
+    prefix for the target region's ("eu.amazon.nova-..."). Global profiles
+    and plain model IDs are returned unchanged.
+    """
+    prefix, dot, base = model_id.partition(".")
+    if not dot or prefix not in INFERENCE_PROFILE_GEOS.values():
+        return model_id
+    region_prefix = "us-gov" if region.startswith("us-gov-") else region.split("-", 1)[0]
+    geo = INFERENCE_PROFILE_GEOS.get(region_prefix)
+    return f"{geo}.{base}" if geo else base
+
+
+def _error_code(error):
+    if isinstance(error, ClientError):
+        return error.response.get("Error", {}).get("Code", "")
+    if isinstance(error, CONNECTION_ERRORS + TIMEOUT_ERRORS):
+        return type(error).__name__
+    return ""
+
+
+def _breaker_execute(sql, params):
+    """Run one breaker statement and return its first row (or None).
+
+    Breakers use their own autocommit connection, never get_db_connection():
+    invoke_bedrock runs in the middle of callers' transactions and on worker
+    threads (embedding pool, async providers), so it must not commit, roll
+    back or share the caller's connection. The lock serializes threads.
+    """
+    global _breaker_conn
+    with _breaker_lock:
+        try:
+            if _breaker_conn is None or _breaker_conn.closed:
+                _breaker_conn = connect(autocommit=True)
+            with _breaker_conn.cursor() as cur:
+                cur.execute(sql, params)
+                return cur.fetchone() if cur.description else None
+        except Exception:
+            if _breaker_conn is not None:
+                _breaker_conn.close()
+            _breaker_conn = None
+            raise
+
+
+def _breaker_allows(model_id, region):
+    """True unless the model's breaker in `region` is open and still cooling down.
+
+    Fails open: if the breaker table can't be read, the call goes ahead.
+    """
+    key = (model_id, region)
+    cached = _breaker_cache.get(key)
+    if cached and time.monotonic() - cached[0] < BREAKER_CACHE_SECONDS:
+        _, state, opened_at, _ = cached
     else:
-        _cached_client = boto3.client("bedrock-runtime", region_name=region)
+        try:
+            row = _breaker_execute(
+                """
+                SELECT state, EXTRACT(EPOCH FROM opened_at), failure_count
+                FROM bedrock_circuit_breakers
+                WHERE model_id = %s AND region = %s
+                """,
+                (model_id, region),
+            )
+            state, opened_at, failure_count = (row[0], float(row[1] or 0), row[2]) if row else ("closed", 0.0, 0)
+        except Exception as e:
+            print(f"Circuit breaker read failed for {model_id} in {region}: {e}")
+            state, opened_at, failure_count = "closed", 0.0, 0
+        _breaker_cache[key] = (time.monotonic(), state, opened_at, failure_count)
+
+    # Open breakers let a trial call through once the cooldown has passed (half-open)
+    return state != "open" or time.time() - opened_at >= BREAKER_COOLDOWN_SECONDS
+
+
+def _record_breaker(model_id, region, success):
+    """Reset the breaker on success; count the failure (and maybe trip) otherwise.
+
+    Failures count within a BREAKER_FAILURE_WINDOW_SECONDS window that starts
+    at the first failure, so sparse failures over hours never add up to a trip.
+    A failure while open restarts the cooldown.
+    """
+    key = (model_id, region)
+    try:
+        if success:
+            _breaker_execute(
+                """
+                UPDATE bedrock_circuit_breakers
+                SET state = 'closed', failure_count = 0, window_started_at = NULL, updated_at = NOW()
+                WHERE model_id = %s AND region = %s
+                  AND (state <> 'closed' OR failure_count > 0)
+                """,
+                (model_id, region),
+            )
+            _breaker_cache[key] = (time.monotonic(), "closed", 0.0, 0)
+            return
+
+        in_window = "b.window_started_at >= NOW() - make_interval(secs => %(window)s)"
+        new_count = f"CASE WHEN {in_window} THEN b.failure_count + 1 ELSE 1 END"
+        trips = f"(b.state = 'open' OR {new_count} >= %(threshold)s)"
+        state, failure_count = _breaker_execute(
+            f"""
+            INSERT INTO bedrock_circuit_breakers AS b
+                (model_id, region, state, failure_count, window_started_at, updated_at)
+            VALUES (%(model_id)s, %(region)s, 'closed', 1, NOW(), NOW())
+            ON CONFLICT (model_id, region) DO UPDATE SET
+                failure_count = {new_count},
+                window_started_at = CASE WHEN {in_window} THEN b.window_started_at ELSE NOW() END,
+                state = CASE WHEN {trips} THEN 'open' ELSE 'closed' END,
+                opened_at = CASE WHEN {trips} THEN NOW() ELSE b.opened_at END,
+                updated_at = NOW()
+            RETURNING state, failure_count
+            """,
+            {
+                "model_id": model_id,
+                "region": region,
+                "window": BREAKER_FAILURE_WINDOW_SECONDS,
+                "threshold": BREAKER_FAILURE_THRESHOLD,
+            },
+        )
+        _breaker_cache.pop(key, None)
+        if state == "open" and failure_count == BREAKER_FAILURE_THRESHOLD:
+            print(f"Circuit breaker OPEN for {model_id} in {region} after {failure_count} failures")
+            emit_metric("BedrockBreakerOpen", dimensions={"ModelId": model_id})
+    except Exception as e:
+        print(f"Circuit breaker update failed for {model_id} in {region}: {e}")
+
+
+def _invoke_in_region(operation, model_id, region, max_retries, cancel, kwargs):
+    client = get_bedrock_client(region=region)
+    call = getattr(client, operation)
+    bucket = _bucket_for(region)
+    key = (model_id, region)
+    region_model_id = model_for_region(model_id, region)
+
+    for attempt in range(max_retries + 1):
+        if cancel is not None and cancel.is_set():
+            raise InvocationCancelled(f"Bedrock call to {model_id} cancelled")
+        bucket.acquire()
+        try:
+            response = call(modelId=region_model_id, **kwargs)
+        except TIMEOUT_ERRORS as e:
+            print(f"Bedrock {_error_code(e)} on {model_id} in {region}, not retrying in place")
+            _record_breaker(model_id, region, success=False)
+            raise
+        except (ClientError, *CONNECTION_ERRORS) as e:
+            code = _error_code(e)
+            if isinstance(e, ClientError) and code not in THROTTLE_CODES and code not in TRANSIENT_CODES:
+                raise
+            if code in THROTTLE_CODES:
+                bucket.on_throttle()
+                emit_metric("BedrockThrottle", dimensions={"ModelId": model_id})
+            if attempt == max_retries:
+                _record_breaker(model_id, region, success=False)
+                raise
+            delay = random.uniform(0, min(BEDROCK_BACKOFF_CAP, BEDROCK_BACKOFF_BASE * (2 ** attempt)))
+            print(f"Bedrock {code} on {model_id} in {region} (attempt {attempt + 1}), backing off {delay:.2f}s")
+            if cancel is not None:
+                cancel.wait(delay)
+            else:
+                time.sleep(delay)
+            continue
+
+        bucket.on_success()
+        # Only write on recovery (whichever container recorded the failures);
+        # the row was read by _breaker_allows within BREAKER_CACHE_SECONDS
+        _, state, _, failure_count = _breaker_cache.get(key, (0, "closed", 0.0, 0))
+        if state != "closed" or failure_count:
+            _record_breaker(model_id, region, success=True)
+        return response
+
+
+def invoke_bedrock(operation, model_id, region="us-east-1", max_retries=None, cancel=None, **kwargs):
+    """Call bedrock-runtime `operation` ("converse", "invoke_model", ...) for model_id.
+
+    Throttling, transient errors and connection failures are retried with
+    backoff; once retries are exhausted they count against the model's
+    circuit breaker. A read timeout (a hung model) counts against it at
+    once and is raised without another attempt, so a brownout trips the
+    breaker and fails over instead of holding callers for several
+    BEDROCK_READ_TIMEOUTs. Other errors (validation, guardrail, access) are
+    raised straight away and don't trip it.
+
+    Each attempt is a botocore call with its own "standard" retries (up to
+    BEDROCK_SDK_MAX_ATTEMPTS requests, which also cover connection errors and
+    timeouts). Those run under this loop and bypass the rate limiter's
+    token bucket.
+
+    When the model's breaker is open in `region`, the call fails over to the
+    next region in BEDROCK_FAILOVER_REGIONS. If every region is open it raises
+    CircuitOpenError without calling Bedrock, so callers can move on to their
+    next model immediately. Latency-sensitive API handlers should pass a small
+    max_retries.
+
+    cancel is an optional threading.Event for calls run on worker threads:
+    once set, no further attempt is started and a backoff ends early
+    (InvocationCancelled); a request already sent still runs to completion.
+    """
+    if max_retries is None:
+        max_retries = BEDROCK_MAX_RETRIES
+
+    regions = [region] + [r for r in BEDROCK_FAILOVER_REGIONS if r != region]
+    for target_region in regions:
+        if not _breaker_allows(model_id, target_region):
+            emit_metric("BedrockCircuitRejected", dimensions={"ModelId": model_id})
+            continue
+        if target_region != region:
+            print(f"Breaker open for {model_id} in {region}, failing over to {target_region}")
+            emit_metric("BedrockRegionFailover", dimensions={"ModelId": model_id})
+        return _invoke_in_region(operation, model_id, target_region, max_retries, cancel, kwargs)
 
-    _cached_region = region
-    return _cached_client
+    raise CircuitOpenError(f"Circuit breaker open for {model_id} in {', '.join(regions)}")
@@ -18,6 +18,16 @@ def get_db_connection():
         except Exception:
             _conn = None
 
+    _conn = connect()
+    return _conn
+
+
+def connect(autocommit=False):
+    """Open a new DB connection, with 1 retry for transient RDS issues.
+
+    For state that must stay out of the shared connection's transaction
+    (see the circuit breakers in shared/bedrock_client.py).
+    """
     sm = boto3.client("secretsmanager")
     secret = json.loads(
         sm.get_secret_value(SecretId=os.environ["DB_SECRET_ARN"])["SecretString"]
@@ -26,15 +36,15 @@ def get_db_connection():
     last_error = None
     for attempt in range(2):
         try:
-            _conn = psycopg2.connect(
+            conn = psycopg2.connect(
                 host=os.environ["DB_HOST"],
                 dbname=os.environ["DB_NAME"],
                 user=secret["username"],
                 password=secret["password"],
                 connect_timeout=5,
             )
-            _conn.autocommit = False
-            return _conn
+            conn.autocommit = autocommit
+            return conn
         except Exception as e:
             last_error = e
             if attempt == 0:
@@ -0,0 +1,291 @@
+"""Content-hash dedup for re-uploaded videos.
+
+Two fingerprints are stored on video_uploads:
+  - content_fingerprint : sha256 over the object size plus sampled byte ranges
+                          (head / middle / tail), computed with ranged GETs
+                          before the video is downloaded
+  - frame_phash         : concatenated dHash of the extracted frames (optional,
+                          DEDUP_PHASH=true), catches re-encoded copies
+
+On a match against an already-analyzed video the pipeline copies the existing
+video_analyses / video_embeddings rows (and frames) instead of running
+extraction, Bedrock analysis and Titan embedding again.
+"""
+
+import hashlib
+import json
+import os
+from shared.db import get_db_connection
+from shared.frames import FRAME_POSITIONS, frame_dhash, frame_key
+from shared.metrics import emit_metric
+
+DEDUP_ENABLED = os.environ.get("DEDUP_ENABLED", "true").lower() == "true"
+DEDUP_PHASH = os.environ.get("DEDUP_PHASH", "false").lower() == "true"
+
+# Bytes read from each sampled region of the object
+SAMPLE_BYTES = 64 * 1024
+
+
+def compute_fingerprint(s3, bucket, key):
+    """Fingerprint an S3 object without downloading it.
+
+    Returns (etag, size, fingerprint).
+    """
+    head = s3.head_object(Bucket=bucket, Key=key)
+    etag = head.get("ETag", "").strip('"')
+    size = int(head["ContentLength"])
+
+    if size <= SAMPLE_BYTES * 3:
+        ranges = [(0, size - 1)] if size > 0 else []
+    else:
+        middle = size // 2 - SAMPLE_BYTES // 2
+        ranges = [
+            (0, SAMPLE_BYTES - 1),
+            (middle, middle + SAMPLE_BYTES - 1),
+            (size - SAMPLE_BYTES, size - 1),
+        ]
+
+    digest = hashlib.sha256(f"{size}:".encode("utf-8"))
+    for start, end in ranges:
+        resp = s3.get_object(Bucket=bucket, Key=key, Range=f"bytes={start}-{end}")
+        digest.update(resp["Body"].read())
+
+    return etag, size, digest.hexdigest()
+
+
+def compute_frame_phash(frame_data_list):
+    """Concatenated dHash of all frames (16 hex chars per frame)."""
+    return "".join(frame_dhash(frame_bytes) for frame_bytes in frame_data_list)
+
+
+def record_fingerprint(video_id, etag=None, size=None, fingerprint=None, phash=None):
+    """Store fingerprints on the video_uploads row (NULL arguments are left unchanged)."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        UPDATE video_uploads
+        SET content_etag = COALESCE(%s, content_etag),
+            file_size_bytes = COALESCE(%s, file_size_bytes),
+            content_fingerprint = COALESCE(%s, content_fingerprint),
+            frame_phash = COALESCE(%s, frame_phash)
+        WHERE id = %s
+        """,
+        (etag, size, fingerprint, phash, video_id),
+    )
+    conn.commit()
+
+
+def find_duplicate(video_id, creator_id, etag=None, size=None, fingerprint=None, phash=None):
+    """Find an already-analyzed video with the same content.
+
+    Only videos that have both an analysis and a per-video embedding qualify.
+    Same-creator matches are preferred. Returns (source_video_id, source_creator_id,
+    match_type) or None.
+    """
+    conditions = []
+    params = []
+    if etag and size:
+        conditions.append("(vu.content_etag = %s AND vu.file_size_bytes = %s)")
+        params.extend([etag, size])
+    if fingerprint:
+        conditions.append("vu.content_fingerprint = %s")
+        params.append(fingerprint)
+    if phash:
+        conditions.append("vu.frame_phash = %s")
+        params.append(phash)
+    if not conditions:
+        return None
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute(
+        f"""
+        SELECT vu.id, vu.creator_id,
+               CASE WHEN vu.content_fingerprint = %s OR vu.content_etag = %s
+                    THEN 'fingerprint' ELSE 'phash' END
+        FROM video_uploads vu
+        JOIN video_analyses va ON va.video_id = vu.id
+        WHERE vu.id <> %s
+          AND ({' OR '.join(conditions)})
+          AND EXISTS (
+              SELECT 1 FROM video_embeddings ve
+              WHERE ve.video_id = vu.id AND ve.is_creator_aggregate = FALSE
+          )
+        ORDER BY (vu.creator_id = %s) DESC, va.analyzed_at DESC
+        LIMIT 1
+        """,
+        [fingerprint, etag, video_id, *params, creator_id],
+    )
+    row = cur.fetchone()
+    if not row:
+        return None
+    return str(row[0]), str(row[1]), row[2]
+
+
+def copy_from_duplicate(s3, frames_bucket, source_video_id, source_creator_id,
+                        video_id, creator_id, match_type, copy_frames=True):
+    """Copy analysis, embedding and (optionally) frames from a duplicate video.
+
+    Returns { analysis, frame_keys, duration_seconds } for the pipeline result.
+    """
+    frame_keys = [frame_key(creator_id, video_id, i) for i in range(len(FRAME_POSITIONS))]
+    if copy_frames:
+        # Server-side copies: no bytes flow through the Lambda
+        for i, key in enumerate(frame_keys):
+            try:
+                s3.copy_object(
+                    Bucket=frames_bucket,
+                    Key=key,
+                    CopySource={"Bucket": frames_bucket, "Key": frame_key(source_creator_id, source_video_id, i)},
+                    ContentType="image/jpeg",
+                    MetadataDirective="REPLACE",
+                )
+            except Exception as e:
+                print(f"Could not copy frame {i} from duplicate {source_video_id}: {e}")
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        INSERT INTO video_analyses (
+            video_id, creator_id, energy_level, aesthetic, setting,
+            production_quality, content_type, topics, dominant_colors,
+            has_text_overlay, face_visible, summary, raw_llm_response
+        )
+        SELECT %s, %s, energy_level, aesthetic, setting,
+               production_quality, content_type, topics, dominant_colors,
+               has_text_overlay, face_visible, summary, raw_llm_response
+        FROM video_analyses
+        WHERE video_id = %s
+        ON CONFLICT (video_id) DO UPDATE SET
+            energy_level = EXCLUDED.energy_level,
+            aesthetic = EXCLUDED.aesthetic,
+            setting = EXCLUDED.setting,
+            production_quality = EXCLUDED.production_quality,
+            content_type = EXCLUDED.content_type,
+            topics = EXCLUDED.topics,
+            dominant_colors = EXCLUDED.dominant_colors,
+            has_text_overlay = EXCLUDED.has_text_overlay,
+            face_visible = EXCLUDED.face_visible,
+            summary = EXCLUDED.summary,
+            raw_llm_response = EXCLUDED.raw_llm_response,
+            analyzed_at = NOW()
+        RETURNING energy_level, aesthetic, setting, production_quality, content_type,
+                  topics, dominant_colors, has_text_overlay, face_visible, summary
+        """,
+        (video_id, creator_id, source_video_id),
+    )
+    row = cur.fetchone()
+
+    cur.execute(
+        "DELETE FROM video_embeddings WHERE video_id = %s AND is_creator_aggregate = FALSE",
+        (video_id,),
+    )
+    cur.execute(
+        """
+        INSERT INTO video_embeddings (video_id, creator_id, embedding, embedding_input,
+                                      embedding_input_hash, embedding_model, is_creator_aggregate)
+        SELECT %s, %s, embedding, embedding_input, embedding_input_hash, embedding_model, FALSE
+        FROM video_embeddings
+        WHERE video_id = %s AND is_creator_aggregate = FALSE
+        LIMIT 1
+        """,
+        (video_id, creator_id, source_video_id),
+    )
+
+    cur.execute(
+        """
+        UPDATE video_uploads
+        SET status = 'processing',
+            dedup_source_video_id = %s,
+            dedup_match = %s,
+            duration_seconds = COALESCE(duration_seconds,
+                (SELECT duration_seconds FROM video_uploads WHERE id = %s))
+        WHERE id = %s
+        RETURNING duration_seconds
+        """,
+        (source_video_id, match_type, source_video_id, video_id),
+    )
+    duration_row = cur.fetchone()
+    conn.commit()
+
+    topics = row[5]
+    if isinstance(topics, str):
+        topics = json.loads(topics)
+    colors = row[6]
+    if isinstance(colors, str):
+        colors = json.loads(colors)
+
+    analysis = {
+        "energy_level": row[0],
+        "aesthetic": row[1],
+        "setting": row[2],
+        "production_quality": row[3],
+        "content_type": row[4],
+        "topics": topics or [],
+        "dominant_colors": colors or [],
+        "text_on_screen": row[7],
+        "face_visible": row[8],
+        "summary": row[9],
+    }
+
+    print(f"Dedup hit ({match_type}): video {video_id} reuses analysis of {source_video_id}")
+    emit_metric("DedupHit")
+
+    return {
+        "analysis": analysis,
+        "frame_keys": frame_keys,
+        "duration_seconds": float(duration_row[0]) if duration_row and duration_row[0] is not None else None,
+    }
+
+
+def dedup_before_extract(s3, source_bucket, s3_key, video_id, creator_id, frames_bucket):
+    """Fingerprint the uploaded object and short-circuit if it was analyzed before.
+
+    Returns the copied result dict on a hit, otherwise None. Never raises —
+    dedup is an optimization and must not fail the pipeline.
+    """
+    if not DEDUP_ENABLED:
+        return None
+    try:
+        etag, size, fingerprint = compute_fingerprint(s3, source_bucket, s3_key)
+        record_fingerprint(video_id, etag=etag, size=size, fingerprint=fingerprint)
+        match = find_duplicate(video_id, creator_id, etag=etag, size=size, fingerprint=fingerprint)
+        if match:
+            source_video_id, source_creator_id, match_type = match
+            return copy_from_duplicate(
+                s3, frames_bucket, source_video_id, source_creator_id,
+                video_id, creator_id, match_type,
+            )
+        if not DEDUP_PHASH:
+            emit_metric("DedupMiss")
+    except Exception as e:
+        print(f"Dedup fingerprint check failed for video {video_id}: {e}")
+        get_db_connection().rollback()
+    return None
+
+
+def dedup_after_extract(s3, frame_data_list, video_id, creator_id, frames_bucket):
+    """Perceptual-hash check on extracted frames (only when DEDUP_PHASH=true).
+
+    Frames for this video are already being stored, so only rows are copied.
+    Returns the copied result dict on a hit, otherwise None.
+    """
+    if not (DEDUP_ENABLED and DEDUP_PHASH):
+        return None
+    try:
+        phash = compute_frame_phash(frame_data_list)
+        record_fingerprint(video_id, phash=phash)
+        match = find_duplicate(video_id, creator_id, phash=phash)
+        if match:
+            source_video_id, source_creator_id, match_type = match
+            return copy_from_duplicate(
+                s3, frames_bucket, source_video_id, source_creator_id,
+                video_id, creator_id, match_type, copy_frames=False,
+            )
+        emit_metric("DedupMiss")
+    except Exception as e:
+        print(f"Dedup perceptual-hash check failed for video {video_id}: {e}")
+        get_db_connection().rollback()
+    return None
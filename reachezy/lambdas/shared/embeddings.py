@@ -0,0 +1,185 @@
+"""Shared Titan embedding service with batching and an embedding store.
+
+Titan Text Embeddings V2 takes one input per invoke_model call, so batches are
+embedded with a bounded thread pool of concurrent calls (each still goes
+through invoke_bedrock's rate limiter and breakers). Pool threads never touch
+the shared DB connection: the embedding-store lookup runs on the calling
+thread first, and breaker state has its own connection. Before calling Titan:
+
+  - identical texts in a batch are embedded once (keyed by content hash)
+  - texts already embedded with the same model are read back from
+    video_embeddings (embedding_input / embedding_input_hash / embedding_model)
+
+so unchanged analyses are never re-embedded.
+"""
+
+import hashlib
+import json
+import math
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from shared.bedrock_client import invoke_bedrock
+from shared.db import get_db_connection
+from shared.metrics import emit_metric
+
+try:
+    import numpy as np
+except ImportError:  # pure-Python fallback below gives identical vectors
+    np = None
+
+EMBEDDING_DIM = 1024
+EMBEDDING_MODEL_ID = "amazon.titan-embed-text-v2:0"
+# Recorded in video_embeddings.embedding_model for vectors from the hash fallback
+HASH_EMBEDDING_MODEL = "hash-sha512"
+
+EMBEDDING_MAX_WORKERS = int(os.environ.get("EMBEDDING_MAX_WORKERS", "8"))
+
+_embed_pool = ThreadPoolExecutor(max_workers=EMBEDDING_MAX_WORKERS)
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def to_pgvector(embedding):
+    """Format a vector as a pgvector literal: "[0.1,0.2,...]"."""
+    return "[" + ",".join(str(v) for v in embedding) + "]"
+
+
+def _hash_digests(text, count):
+    """`count` chained SHA-512 digests: h1 = sha512(text), h(n+1) = sha512(h(n))."""
+    digests = []
+    seed = text.encode("utf-8")
+    for _ in range(count):
+        seed = hashlib.sha512(seed).digest()
+        digests.append(seed)
+    return b"".join(digests)
+
+
+def hash_embedding(text, dim=EMBEDDING_DIM):
+    """Deterministic hash-based embedding fallback (used when Titan is unavailable).
+
+    Each 4-byte big-endian word of the chained SHA-512 digests becomes
+    word / 2**31 - 1, and the vector is L2-normalized. Vectorized with numpy,
+    except the norm: it is summed with Python's sum() like the original loop,
+    because sum() rounds differently across versions (compensated since 3.12)
+    and vectors already stored came from the Lambda runtime's sum().
+    """
+    buf = _hash_digests(text, math.ceil(dim / 16))
+    if np is None:
+        values = [
+            (int.from_bytes(buf[j:j + 4], "big") / 2147483648.0) - 1.0
+            for j in range(0, dim * 4, 4)
+        ]
+        norm = math.sqrt(sum(v * v for v in values))
+        return [v / norm for v in values] if norm > 0 else values
+
+    values = np.frombuffer(buf, dtype=">u4", count=dim).astype(np.float64) / 2147483648.0 - 1.0
+    norm = math.sqrt(sum((values * values).tolist()))
+    if norm > 0:
+        values = values / norm
+    return values.tolist()
+
+
+def titan_embedding(text, region="us-east-1", dim=EMBEDDING_DIM, max_retries=None, cancel=None):
+    """One Titan Text Embeddings V2 call."""
+    response = invoke_bedrock(
+        "invoke_model",
+        EMBEDDING_MODEL_ID,
+        region=region,
+        max_retries=max_retries,
+        cancel=cancel,
+        contentType="application/json",
+        accept="application/json",
+        body=json.dumps({
+            "inputText": text,
+            "dimensions": dim,
+            "normalize": True,
+        }),
+    )
+    return json.loads(response["body"].read())["embedding"]
+
+
+def lookup_stored_embeddings(hashes, model_id=EMBEDDING_MODEL_ID):
+    """Return {input_hash: embedding} for inputs already embedded with model_id.
+
+    Never raises — a failed lookup just means embedding again.
+    """
+    if not hashes:
+        return {}
+    try:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT DISTINCT ON (embedding_input_hash) embedding_input_hash, embedding::text
+            FROM video_embeddings
+            WHERE embedding_input_hash = ANY(%s)
+              AND embedding_model = %s
+              AND is_creator_aggregate = FALSE
+            """,
+            (list(hashes), model_id),
+        )
+        rows = cur.fetchall()
+        conn.commit()
+        return {row[0]: json.loads(row[1]) for row in rows}
+    except Exception as e:
+        print(f"Embedding store lookup failed: {e}")
+        get_db_connection().rollback()
+        return {}
+
+
+def embed_texts(texts, region="us-east-1", fallback=None, use_store=True, max_retries=None):
+    """Embed many texts with Titan, in input order.
+
+    Returns a list of (embedding, model_id) — model_id is HASH_EMBEDDING_MODEL
+    for texts where Titan failed and `fallback(text)` was used instead. Without
+    a fallback, a Titan failure is raised.
+    """
+    hashes = [content_hash(text) for text in texts]
+    unique = {}
+    for text, digest in zip(texts, hashes):
+        unique.setdefault(digest, text)
+
+    results = {}
+    if use_store:
+        for digest, embedding in lookup_stored_embeddings(unique.keys()).items():
+            results[digest] = (embedding, EMBEDDING_MODEL_ID)
+
+    pending = [(digest, text) for digest, text in unique.items() if digest not in results]
+    if len(texts) > len(pending):
+        emit_metric("EmbeddingReused", len(texts) - len(pending))
+
+    # Set when the batch has failed, so the other workers stop retrying
+    cancel = threading.Event()
+
+    def _embed(item):
+        digest, text = item
+        try:
+            embedding = titan_embedding(text, region=region, max_retries=max_retries, cancel=cancel)
+            return digest, (embedding, EMBEDDING_MODEL_ID)
+        except Exception as e:
+            if fallback is None:
+                raise
+            print(f"Titan embedding failed ({e}), falling back to hash-based")
+            return digest, (fallback(text), HASH_EMBEDDING_MODEL)
+
+    if len(pending) == 1:
+        results.update([_embed(pending[0])])
+    elif pending:
+        futures = [_embed_pool.submit(_embed, item) for item in pending]
+        try:
+            results.update(future.result() for future in futures)
+        except Exception:
+            cancel.set()
+            raise
+    if pending:
+        emit_metric("EmbeddingGenerated", len(pending))
+
+    return [results[digest] for digest in hashes]
+
+
+def embed_text(text, region="us-east-1", fallback=None, use_store=True, max_retries=None):
+    """Single-text convenience wrapper around embed_texts()."""
+    return embed_texts([text], region=region, fallback=fallback, use_store=use_store, max_retries=max_retries)[0]
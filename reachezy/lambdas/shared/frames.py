@@ -0,0 +1,174 @@
+"""Shared FFmpeg helpers for frame extraction.
+
+Used by frame_extractor (frames -> S3) and by the fused extract+analyze stage in
+video_analyzer (frames kept in memory, thumbnails persisted in the background).
+"""
+
+import re
+import subprocess
+import urllib.parse
+from shared.db import get_db_connection
+
+FFMPEG_PATH = "/opt/bin/ffmpeg"
+
+# Frames are sampled at 0%, 25%, 50%, 75% of the video duration
+FRAME_POSITIONS = [0.0, 0.25, 0.50, 0.75]
+
+
+def parse_duration(ffmpeg_stderr):
+    """Extract Duration: HH:MM:SS.ms from FFmpeg stderr output.
+
+    Returns duration in seconds as a float, or None if not found.
+    """
+    match = re.search(r"Duration:\s*(\d{2}):(\d{2}):(\d{2})\.(\d+)", ffmpeg_stderr)
+    if not match:
+        return None
+    hours = int(match.group(1))
+    minutes = int(match.group(2))
+    seconds = int(match.group(3))
+    fraction = match.group(4)
+    frac_seconds = int(fraction) / (10 ** len(fraction))
+    return hours * 3600 + minutes * 60 + seconds + frac_seconds
+
+
+def probe_duration(local_video):
+    """Probe video duration in seconds using FFmpeg. Raises ValueError if unknown."""
+    probe_result = subprocess.run(
+        [FFMPEG_PATH, "-i", local_video],
+        capture_output=True,
+        text=True,
+    )
+    duration_seconds = parse_duration(probe_result.stderr)
+    if duration_seconds is None or duration_seconds <= 0:
+        raise ValueError(f"Could not determine video duration from FFmpeg output: {probe_result.stderr[:500]}")
+    return duration_seconds
+
+
+def extract_frame_bytes(local_video, timestamp):
+    """Extract a single JPEG frame at `timestamp` seconds and return its bytes.
+
+    FFmpeg writes the frame to stdout, so nothing touches /tmp.
+    """
+    result = subprocess.run(
+        [
+            FFMPEG_PATH,
+            "-ss", str(timestamp),
+            "-i", local_video,
+            "-frames:v", "1",
+            "-q:v", "2",
+            "-f", "image2pipe",
+            "-vcodec", "mjpeg",
+            "pipe:1",
+        ],
+        capture_output=True,
+        check=True,
+    )
+    return result.stdout
+
+
+def extract_frames(local_video, duration_seconds):
+    """Extract one JPEG frame per FRAME_POSITIONS entry. Returns a list of bytes."""
+    return [
+        extract_frame_bytes(local_video, duration_seconds * pct)
+        for pct in FRAME_POSITIONS
+    ]
+
+
+def frame_dhash(frame_bytes):
+    """Compute a 64-bit difference hash (dHash) of a JPEG frame as 16 hex chars.
+
+    FFmpeg downscales the frame to 9x8 grayscale; each bit records whether a
+    pixel is brighter than its right-hand neighbour. Re-encoded or resized
+    copies of the same clip produce the same hash.
+    """
+    result = subprocess.run(
+        [
+            FFMPEG_PATH,
+            "-f", "image2pipe",
+            "-i", "pipe:0",
+            "-vf", "scale=9:8,format=gray",
+            "-f", "rawvideo",
+            "pipe:1",
+        ],
+        input=frame_bytes,
+        capture_output=True,
+        check=True,
+    )
+    pixels = result.stdout[:72]
+    if len(pixels) < 72:
+        raise ValueError(f"Unexpected dHash pixel buffer size: {len(pixels)}")
+
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (1 if left > right else 0)
+    return f"{bits:016x}"
+
+
+def frame_key(creator_id, video_id, index):
+    """S3 key for a stored frame (frame_0 doubles as the media-kit thumbnail)."""
+    return f"{creator_id}/{video_id}/frame_{index}.jpg"
+
+
+def resolve_video_source(event):
+    """Normalize a pipeline input event into (source_bucket, s3_key, video_id, creator_id).
+
+    Accepts EITHER format:
+      EventBridge: { bucket, key, size, region, time }
+      Direct:      { source_bucket, s3_key, video_id, creator_id }
+
+    Looks up video_id / creator_id in video_uploads when they are not provided.
+    """
+    if "source_bucket" in event:
+        # Direct invocation (e.g., from tests or manual trigger)
+        source_bucket = event["source_bucket"]
+        s3_key = event["s3_key"]
+        video_id = event.get("video_id")
+        creator_id = event.get("creator_id")
+    else:
+        # EventBridge trigger: { bucket, key, ... }
+        # EventBridge URL-encodes the S3 key — decode it before use
+        source_bucket = event["bucket"]
+        s3_key = urllib.parse.unquote_plus(event["key"])
+        video_id = None
+        creator_id = None
+
+    if not video_id or not creator_id:
+        conn = get_db_connection()
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT id, creator_id FROM video_uploads WHERE s3_key = %s LIMIT 1",
+            (s3_key,),
+        )
+        row = cur.fetchone()
+        if row:
+            video_id = str(row[0])
+            creator_id = str(row[1])
+            print(f"Found in DB: video_id={video_id}, creator_id={creator_id}")
+        else:
+            # Fallback: extract creator_id from S3 key path (uploads/{creator_id}/...)
+            parts = s3_key.split("/")
+            if len(parts) >= 2:
+                creator_id = parts[1]  # uploads/{creator_id}/{filename}
+            # Generate a video_id from the key
+            video_id = s3_key.replace("/", "_").replace(".", "_")
+            print(f"Not found in DB, using fallback: video_id={video_id}, creator_id={creator_id}")
+
+    return source_bucket, s3_key, video_id, creator_id
+
+
+def mark_processing(video_id, s3_key, duration_seconds):
+    """Set video_uploads.status='processing' and record the probed duration."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        UPDATE video_uploads
+        SET status = 'processing', duration_seconds = %s
+        WHERE id = %s OR s3_key = %s
+        """,
+        (round(duration_seconds, 2), video_id, s3_key),
+    )
+    conn.commit()
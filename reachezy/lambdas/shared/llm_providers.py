@@ -0,0 +1,379 @@
+"""Async LLM provider layer shared by video_analyzer and brand_search.
+
+A request is a list of neutral content parts — {"text": str} or {"image": ...} —
+plus generation settings. Each provider serves ONE model and turns the parts
+into its own wire format:
+
+  - BedrockProvider : Bedrock Converse via invoke_bedrock (rate limiting,
+                      breakers, region failover), run in a worker thread that
+                      stops retrying once its attempt is cancelled
+  - GroqProvider    : Groq's OpenAI-compatible API over a pooled httpx.AsyncClient
+  - StubProvider    : fixed / computed text, for offline runs (AI_PROVIDER=stub)
+
+Providers return (text, stop_reason, guardrail_path). apply_output_guardrail()
+checks only the generated text, for callers that skip input guardrails.
+
+complete_sync() runs a fallback chain of providers on a persistent event loop:
+providers are tried in order, an optional hedge starts the next provider when
+the current one is slow, and a deadline bounds the whole call.
+"""
+
+import asyncio
+import base64
+import json
+import os
+import threading
+import time
+import boto3
+import httpx
+from shared.bedrock_client import invoke_bedrock
+
+GROQ_ENDPOINT = "https://api.groq.com/openai/v1/chat/completions"
+
+_loop = None
+_groq_client = None
+_guardrail_clients = {}  # region -> bedrock-runtime client in the local account
+
+
+class LLMChainError(RuntimeError):
+    """Every provider in the chain failed (or the deadline passed)."""
+
+    def __init__(self, message, errors):
+        super().__init__(message)
+        self.errors = errors
+
+
+class LLMRequest:
+    """Provider-neutral completion request."""
+
+    def __init__(self, parts, max_tokens=1024, temperature=0.1, guardrail_config=None,
+                 bypass_guardrail_on_intervention=False, max_retries=None, json_schema=None,
+                 tool_name="structured_output"):
+        self.parts = parts
+        self.max_tokens = max_tokens
+        self.temperature = temperature
+        # Bedrock only: {"guardrailIdentifier": ..., "guardrailVersion": ...}
+        self.guardrail_config = guardrail_config
+        # Re-ask without the guardrail when it intervenes (analysis of creator videos)
+        self.bypass_guardrail_on_intervention = bypass_guardrail_on_intervention
+        # Bedrock only: throttling retries inside invoke_bedrock
+        self.max_retries = max_retries
+        # Structured output: Bedrock forces a tool call with this input schema,
+        # Groq switches to JSON mode. Result text is then a JSON object.
+        self.json_schema = json_schema
+        self.tool_name = tool_name
+
+
+class LLMResult:
+    def __init__(self, text, provider, model_id, stop_reason=None, latency_ms=0, guardrail_path=None):
+        self.text = text
+        self.provider = provider
+        self.model_id = model_id
+        self.stop_reason = stop_reason
+        self.latency_ms = latency_ms
+        # "input", "input_bypassed", "input_error_bypassed", or None when no guardrail ran
+        self.guardrail_path = guardrail_path
+        self.parsed = None
+
+
+def bedrock_tool_config(json_schema, tool_name):
+    """Converse toolConfig that forces a single tool call with `json_schema` as input."""
+    return {
+        "tools": [{
+            "toolSpec": {
+                "name": tool_name,
+                "description": "Record the result as structured data.",
+                "inputSchema": {"json": json_schema},
+            }
+        }],
+        # With a single tool, "any" forces the model to call it
+        "toolChoice": {"any": {}},
+    }
+
+
+def bedrock_content(parts):
+    """Convert neutral parts to Converse content blocks.
+
+    Image parts may hold raw JPEG bytes or a ready Converse image source
+    (e.g. {"s3Location": {"uri": ...}} for batch inference).
+    """
+    blocks = []
+    for part in parts:
+        if "text" in part:
+            blocks.append({"text": part["text"]})
+        else:
+            image = part["image"]
+            source = {"bytes": image} if isinstance(image, (bytes, bytearray)) else image
+            blocks.append({"image": {"format": "jpeg", "source": source}})
+    return blocks
+
+
+def converse_text(response):
+    """Text of a Converse response; a tool call's input is returned as JSON text."""
+    blocks = response["output"]["message"]["content"]
+    for block in blocks:
+        if "toolUse" in block:
+            return json.dumps(block["toolUse"]["input"])
+    return "".join(block.get("text", "") for block in blocks)
+
+
+def openai_content(parts):
+    """Convert neutral parts to OpenAI-style chat content (images as data URLs)."""
+    blocks = []
+    for part in parts:
+        if "text" in part:
+            blocks.append({"type": "text", "text": part["text"]})
+        else:
+            b64_data = base64.b64encode(part["image"]).decode("utf-8")
+            blocks.append({
+                "type": "image_url",
+                "image_url": {"url": f"data:image/jpeg;base64,{b64_data}"},
+            })
+    return blocks
+
+
+class BedrockProvider:
+    name = "bedrock"
+
+    def __init__(self, model_id, region="us-east-1"):
+        self.model_id = model_id
+        self.region = region
+
+    def _converse(self, request, with_guardrail, cancel):
+        kwargs = {}
+        if with_guardrail and request.guardrail_config:
+            kwargs["guardrailConfig"] = request.guardrail_config
+        if request.json_schema:
+            kwargs["toolConfig"] = bedrock_tool_config(request.json_schema, request.tool_name)
+        response = invoke_bedrock(
+            "converse",
+            self.model_id,
+            region=self.region,
+            max_retries=request.max_retries,
+            cancel=cancel,
+            messages=[{"role": "user", "content": bedrock_content(request.parts)}],
+            inferenceConfig={"maxTokens": request.max_tokens, "temperature": request.temperature},
+            **kwargs,
+        )
+        return converse_text(response), response.get("stopReason")
+
+    def _complete_blocking(self, request, cancel):
+        try:
+            text, stop_reason = self._converse(request, with_guardrail=True, cancel=cancel)
+        except Exception as e:
+            # If the guardrail itself is the problem, retry without it
+            if "guardrail" in str(e).lower() and request.guardrail_config and not cancel.is_set():
+                print(f"Guardrail error with {self.model_id}, retrying without guardrail: {e}")
+                return (*self._converse(request, with_guardrail=False, cancel=cancel), "input_error_bypassed")
+            raise
+
+        if not request.guardrail_config:
+            return text, stop_reason, None
+        if (stop_reason == "guardrail_intervened" and request.bypass_guardrail_on_intervention
+                and not cancel.is_set()):
+            # Costly: the whole multimodal request is sent a second time
+            print(f"Guardrail intercepted response from {self.model_id}, retrying without it.")
+            return (*self._converse(request, with_guardrail=False, cancel=cancel), "input_bypassed")
+        return text, stop_reason, "input"
+
+    async def complete(self, request):
+        # A worker thread can't be interrupted: when this attempt is cancelled
+        # (hedge lost, deadline passed) the event stops it before any further
+        # retry, backoff or guardrail re-ask; the call in flight still finishes.
+        # The thread touches no shared DB connection (breakers use their own).
+        cancel = threading.Event()
+        try:
+            return await asyncio.to_thread(self._complete_blocking, request, cancel)
+        except asyncio.CancelledError:
+            cancel.set()
+            raise
+
+
+class GroqProvider:
+    name = "groq"
+
+    def __init__(self, model_id, api_key, timeout=60):
+        self.model_id = model_id
+        self.api_key = api_key
+        self.timeout = timeout
+
+    async def complete(self, request):
+        resp = await _get_groq_client().post(
+            GROQ_ENDPOINT,
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            json={
+                "model": self.model_id,
+                "max_tokens": request.max_tokens,
+                "temperature": request.temperature,
+                "messages": [{"role": "user", "content": self._content(request.parts)}],
+                **({"response_format": {"type": "json_object"}} if request.json_schema else {}),
+            },
+            timeout=self.timeout,
+        )
+        if resp.status_code >= 400:
+            raise RuntimeError(f"Groq API error: {resp.status_code} {resp.text[:500]}")
+        choice = resp.json()["choices"][0]
+        return choice["message"]["content"], choice.get("finish_reason"), None
+
+    @staticmethod
+    def _content(parts):
+        # Text-only prompts go as a plain string (required by non-vision models)
+        if all("text" in part for part in parts):
+            return "".join(part["text"] for part in parts)
+        return openai_content(parts)
+
+
+class StubProvider:
+    """Offline provider: returns `text` (or text(request)) without any network call."""
+
+    name = "stub"
+
+    def __init__(self, text, model_id="stub"):
+        self.text = text
+        self.model_id = model_id
+
+    async def complete(self, request):
+        text = self.text(request) if callable(self.text) else self.text
+        return text, "end_turn", None
+
+
+def build_chain(ai_provider, bedrock_models=(), bedrock_region="us-east-1",
+                groq_model=None, groq_api_key="", groq_timeout=60, stub_text=None):
+    """Standard chain: Bedrock models in order (unless AI_PROVIDER=groq), then Groq
+    if a key is configured. AI_PROVIDER=stub returns only the offline stub.
+    """
+    if ai_provider == "stub":
+        return [StubProvider(stub_text or "{}")]
+    chain = []
+    if ai_provider != "groq":
+        chain.extend(BedrockProvider(model_id, bedrock_region) for model_id in bedrock_models)
+    if groq_api_key and groq_model:
+        chain.append(GroqProvider(groq_model, groq_api_key, timeout=groq_timeout))
+    return chain
+
+
+async def _attempt(provider, request, parse):
+    start = time.monotonic()
+    text, stop_reason, guardrail_path = await provider.complete(request)
+    result = LLMResult(
+        text, provider.name, provider.model_id, stop_reason,
+        latency_ms=int((time.monotonic() - start) * 1000),
+        guardrail_path=guardrail_path,
+    )
+    if parse:
+        # A response the caller can't use counts as a provider failure
+        result.parsed = parse(text)
+    print(f"LLM success: {provider.name}/{provider.model_id} in {result.latency_ms}ms, stop reason: {stop_reason}")
+    return result
+
+
+async def _run_chain(request, chain, parse, hedge_after):
+    errors = []
+    pending = {}
+    next_index = 0
+
+    def launch():
+        nonlocal next_index
+        provider = chain[next_index]
+        next_index += 1
+        print(f"LLM attempt: {provider.name}/{provider.model_id}")
+        pending[asyncio.ensure_future(_attempt(provider, request, parse))] = provider
+
+    launch()
+    try:
+        while pending:
+            can_hedge = hedge_after is not None and next_index < len(chain)
+            done, _ = await asyncio.wait(
+                set(pending),
+                timeout=hedge_after if can_hedge else None,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not done:
+                print(f"Hedging: no answer after {hedge_after}s, starting next provider")
+                launch()
+                continue
+
+            for task in done:
+                provider = pending.pop(task)
+                error = task.exception()
+                if error is None:
+                    return task.result()
+                errors.append(f"{provider.name}/{provider.model_id}: {error}")
+                print(f"LLM provider {provider.name}/{provider.model_id} failed: {error}")
+
+            if not pending and next_index < len(chain):
+                launch()
+    finally:
+        # Losers of a hedge are cancelled (a Bedrock worker thread still finishes
+        # the call in flight, then stops)
+        for task in pending:
+            task.cancel()
+
+    raise LLMChainError(f"All LLM providers failed: {'; '.join(errors)}", errors)
+
+
+async def complete(request, chain, parse=None, deadline=None, hedge_after=None):
+    """Run `request` through `chain` and return the first successful LLMResult.
+
+    parse       : optional fn(text) -> parsed; raising moves on to the next provider
+    deadline    : seconds for the whole chain (LLMChainError when exceeded)
+    hedge_after : seconds to wait on a provider before also starting the next one
+    """
+    if not chain:
+        raise LLMChainError("No LLM provider configured", [])
+    try:
+        return await asyncio.wait_for(_run_chain(request, chain, parse, hedge_after), timeout=deadline)
+    except asyncio.TimeoutError:
+        raise LLMChainError(f"LLM deadline of {deadline}s exceeded", ["deadline"])
+
+
+def apply_output_guardrail(text, guardrail_config, region="us-east-1"):
+    """Run ApplyGuardrail on model output text only — no images, no second model call.
+
+    Uses the Lambda's own credentials (the guardrail lives in this account even
+    when models are invoked cross-account). Returns (action, output_text) where
+    action is "NONE" or "GUARDRAIL_INTERVENED".
+    """
+    client = _guardrail_clients.get(region)
+    if client is None:
+        client = _guardrail_clients.setdefault(region, boto3.client("bedrock-runtime", region_name=region))
+    response = client.apply_guardrail(
+        guardrailIdentifier=guardrail_config["guardrailIdentifier"],
+        guardrailVersion=guardrail_config["guardrailVersion"],
+        source="OUTPUT",
+        content=[{"text": {"text": text}}],
+    )
+    outputs = response.get("outputs") or []
+    return response.get("action", "NONE"), (outputs[0].get("text", text) if outputs else text)
+
+
+def _get_loop():
+    """One event loop per container, reused across invocations (keeps pooled sessions alive)."""
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    return _loop
+
+
+def _get_groq_client():
+    global _groq_client
+    if _groq_client is None:
+        _groq_client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+            headers={"Content-Type": "application/json"},
+        )
+    return _groq_client
+
+
+def complete_sync(request, chain, parse=None, deadline=None, hedge_after=None):
+    """Blocking wrapper around complete() for Lambda handlers."""
+    return _get_loop().run_until_complete(
+        complete(request, chain, parse=parse, deadline=deadline, hedge_after=hedge_after)
+    )
+
+
+def env_float(name, default=None):
+    """Read an optional float setting (empty string means unset)."""
+    value = os.environ.get(name, "")
+    return float(value) if value else default
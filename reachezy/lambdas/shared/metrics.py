@@ -0,0 +1,29 @@
+"""Shared CloudWatch metrics helper using the Embedded Metric Format (EMF).
+
+Lambda ships stdout to CloudWatch Logs, which turns EMF lines into metrics —
+no PutMetricData call and no extra latency on the request path.
+"""
+
+import json
+import os
+import time
+
+METRICS_NAMESPACE = os.environ.get("METRICS_NAMESPACE", "ReachEzy/Pipeline")
+
+
+def emit_metric(name, value=1, unit="Count", dimensions=None, namespace=None):
+    """Emit a single metric value as an EMF log line."""
+    dimensions = dimensions or {}
+    record = {
+        "_aws": {
+            "Timestamp": int(time.time() * 1000),
+            "CloudWatchMetrics": [{
+                "Namespace": namespace or METRICS_NAMESPACE,
+                "Dimensions": [list(dimensions.keys())],
+                "Metrics": [{"Name": name, "Unit": unit}],
+            }],
+        },
+        name: value,
+        **{k: str(v) for k, v in dimensions.items()},
+    }
+    print(json.dumps(record))
@@ -22,3 +22,57 @@ def get_follower_bucket(count):
 
 def is_valid_niche(niche):
     return niche in NICHES
+
+# --- Controlled vocabulary for video analysis labels (see shared/analysis_schema.py) ---
+ENERGY_LEVELS = ["calm", "moderate", "high", "chaotic", "intense"]
+
+AESTHETICS = [
+    "minimal", "vibrant", "dark", "pastel", "natural",
+    "luxury", "streetwear", "corporate", "cozy", "editorial",
+]
+
+SETTINGS = ["indoor", "outdoor", "studio", "mixed"]
+
+PRODUCTION_QUALITIES = ["low", "medium", "high", "professional"]
+
+VIDEO_CONTENT_TYPES = [
+    "tutorial", "vlog", "review", "comedy", "trend", "lifestyle",
+    "grwm", "unboxing", "haul", "recipe", "fitness", "general",
+]
+
+# Free-form labels models commonly return, mapped onto the vocabulary above
+LABEL_SYNONYMS = {
+    "energy_level": {
+        "chill": "calm", "relaxed": "calm", "soothing": "calm", "low": "calm", "slow": "calm",
+        "medium": "moderate", "balanced": "moderate", "steady": "moderate",
+        "upbeat": "high", "energetic": "high", "fast-paced": "high", "lively": "high", "fast": "high",
+        "hype": "chaotic", "frantic": "chaotic",
+        "dramatic": "intense", "extreme": "intense",
+    },
+    "aesthetic": {
+        "clean": "minimal", "minimalist": "minimal", "simple": "minimal",
+        "bold": "vibrant", "colorful": "vibrant", "bright": "vibrant",
+        "moody": "dark", "cinematic": "dark",
+        "soft": "pastel", "organic": "natural", "earthy": "natural", "candid": "natural",
+        "premium": "luxury", "glam": "luxury", "elegant": "luxury",
+        "urban": "streetwear", "street": "streetwear",
+        "professional": "corporate", "business": "corporate",
+        "warm": "cozy", "homey": "cozy",
+        "fashion": "editorial", "polished": "editorial",
+    },
+    "setting": {
+        "inside": "indoor", "home": "indoor", "outside": "outdoor", "street": "outdoor",
+        "both": "mixed", "various": "mixed",
+    },
+    "production_quality": {
+        "amateur": "low", "basic": "low", "average": "medium", "good": "high",
+        "polished": "professional", "studio": "professional",
+    },
+    "content_type": {
+        "get ready with me": "grwm", "how-to": "tutorial", "howto": "tutorial",
+        "vlogging": "vlog", "daily vlog": "vlog", "product review": "review",
+        "skit": "comedy", "funny": "comedy", "dance": "trend", "challenge": "trend",
+        "cooking": "recipe", "food": "recipe", "workout": "fitness", "exercise": "fitness",
+        "shopping haul": "haul", "unbox": "unboxing",
+    },
+}
@@ -0,0 +1,157 @@
+"""Precomputed "more like this" neighbors between creators.
+
+creator_neighbors holds, per creator, the NEIGHBORS_K creators whose
+aggregate embedding is closest (cosine), so GET /creator/{id}/similar is one
+indexed read instead of an LLM parse plus a Titan call. Lists are kept fresh
+two ways:
+
+  - incrementally, from the change outbox (shared/outbox.py): when a
+    creator's aggregate changes, its own list is recomputed with one pgvector
+    search, and the creator is merged into (or re-scored in) the lists of its
+    new neighbors and of every creator that already listed it (only lists
+    that have been computed in full; see creator_neighbor_state)
+  - in full, by the nightly refresh job (creator_similar.refresh_handler),
+    which recomputes every list older than NEIGHBORS_MAX_AGE_HOURS
+
+The incremental merge is approximate: a creator that moves away from Y stays
+in Y's list (re-scored) until Y's next full recompute, rather than being
+replaced by Y's true K+1-th neighbor, which isn't stored.
+"""
+
+import json
+import os
+
+from shared.search_backends import PgvectorBackend
+
+NEIGHBORS_K = int(os.environ.get("CREATOR_NEIGHBORS_K", "20"))
+NEIGHBORS_MAX_AGE_HOURS = int(os.environ.get("CREATOR_NEIGHBORS_MAX_AGE_HOURS", "20"))
+
+
+def _aggregate_vector(cur, creator_id):
+    cur.execute(
+        """
+        SELECT embedding::text FROM video_embeddings
+        WHERE creator_id = %s AND is_creator_aggregate = TRUE AND embedding IS NOT NULL
+        LIMIT 1
+        """,
+        (str(creator_id),),
+    )
+    row = cur.fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def compute_neighbors(cur, creator_id, k=NEIGHBORS_K):
+    """[(neighbor_id, similarity)] best first, or None if the creator has no aggregate."""
+    vector = _aggregate_vector(cur, creator_id)
+    if vector is None:
+        return None
+    return PgvectorBackend(cur.connection).search(vector, {"exclude_ids": [str(creator_id)]}, k)
+
+
+def store_neighbors(cur, creator_id, neighbors):
+    """Replace a creator's neighbor list and mark it refreshed."""
+    creator_id = str(creator_id)
+    cur.execute("DELETE FROM creator_neighbors WHERE creator_id = %s", (creator_id,))
+    if neighbors:
+        cur.execute(
+            """
+            INSERT INTO creator_neighbors (creator_id, neighbor_id, similarity)
+            SELECT %s, UNNEST(%s::uuid[]), UNNEST(%s::real[])
+            """,
+            (creator_id, [n for n, _ in neighbors], [s for _, s in neighbors]),
+        )
+    cur.execute(
+        """
+        INSERT INTO creator_neighbor_state (creator_id) VALUES (%s)
+        ON CONFLICT (creator_id) DO UPDATE SET refreshed_at = NOW()
+        """,
+        (creator_id,),
+    )
+
+
+def remove_creator(cur, creator_id):
+    """Drop a creator without an aggregate from every list (including its own)."""
+    creator_id = str(creator_id)
+    cur.execute(
+        "DELETE FROM creator_neighbors WHERE creator_id = %s OR neighbor_id = %s",
+        (creator_id, creator_id),
+    )
+    cur.execute("DELETE FROM creator_neighbor_state WHERE creator_id = %s", (creator_id,))
+
+
+def _merge_reverse(cur, creator_id, neighbors, k):
+    """Upsert `creator_id` into the lists of its neighbors and of creators already
+    listing it, with fresh similarities, then trim those lists back to k.
+
+    Only lists that exist (creator_neighbor_state) are touched: merging into
+    a creator that has none would leave a partial list that looks complete.
+    """
+    cur.execute("SELECT creator_id FROM creator_neighbors WHERE neighbor_id = %s", (creator_id,))
+    affected = sorted({str(row[0]) for row in cur.fetchall()} | {n for n, _ in neighbors})
+    if not affected:
+        return
+    cur.execute(
+        """
+        INSERT INTO creator_neighbors (creator_id, neighbor_id, similarity)
+        SELECT ve.creator_id, x.creator_id, 1 - (ve.embedding <=> x.embedding)
+        FROM video_embeddings ve
+        JOIN creator_neighbor_state s ON s.creator_id = ve.creator_id,
+             (SELECT creator_id, embedding FROM video_embeddings
+              WHERE creator_id = %s AND is_creator_aggregate = TRUE) x
+        WHERE ve.is_creator_aggregate = TRUE AND ve.embedding IS NOT NULL
+          AND ve.creator_id = ANY(%s::uuid[])
+        ON CONFLICT (creator_id, neighbor_id) DO UPDATE SET
+            similarity = EXCLUDED.similarity,
+            computed_at = NOW()
+        """,
+        (creator_id, affected),
+    )
+    cur.execute(
+        """
+        DELETE FROM creator_neighbors n
+        USING (
+            SELECT creator_id, neighbor_id,
+                   ROW_NUMBER() OVER (PARTITION BY creator_id ORDER BY similarity DESC) AS rank
+            FROM creator_neighbors
+            WHERE creator_id = ANY(%s::uuid[])
+        ) ranked
+        WHERE n.creator_id = ranked.creator_id AND n.neighbor_id = ranked.neighbor_id
+          AND ranked.rank > %s
+        """,
+        (affected, k),
+    )
+
+
+def refresh_creator(cur, creator_id, k=NEIGHBORS_K, reverse=True):
+    """Recompute a creator's neighbor list, in the caller's transaction.
+
+    With reverse, also merge the creator into other creators' lists (the
+    incremental path; the full refresh recomputes every list anyway).
+    Returns the neighbors, or None if the creator has no aggregate.
+    """
+    creator_id = str(creator_id)
+    neighbors = compute_neighbors(cur, creator_id, k)
+    if neighbors is None:
+        remove_creator(cur, creator_id)
+        return None
+    store_neighbors(cur, creator_id, neighbors)
+    if reverse:
+        _merge_reverse(cur, creator_id, neighbors, k)
+    return neighbors
+
+
+def stale_creators(cur, limit, max_age_hours=NEIGHBORS_MAX_AGE_HOURS):
+    """Creators with an aggregate whose list is missing or older than max_age_hours, oldest first."""
+    cur.execute(
+        """
+        SELECT ve.creator_id
+        FROM video_embeddings ve
+        LEFT JOIN creator_neighbor_state s ON s.creator_id = ve.creator_id
+        WHERE ve.is_creator_aggregate = TRUE AND ve.embedding IS NOT NULL
+          AND (s.refreshed_at IS NULL OR s.refreshed_at < NOW() - make_interval(hours => %s))
+        ORDER BY s.refreshed_at NULLS FIRST
+        LIMIT %s
+        """,
+        (max_age_hours, limit),
+    )
+    return [str(row[0]) for row in cur.fetchall()]
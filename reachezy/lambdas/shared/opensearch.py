@@ -0,0 +1,192 @@
+"""OpenSearch HTTP session shared by opensearch_sync and the search backends.
+
+One requests.Session per container, SigV4-signed for OpenSearch Serverless
+("aoss") with the Lambda role's auto-refreshing credentials. OPENSEARCH_AUTH=none
+skips signing, for a local container, e.g.:
+
+    docker run -p 9200:9200 -e discovery.type=single-node \\
+        -e DISABLE_SECURITY_PLUGIN=true opensearchproject/opensearch:2.13.0
+    OPENSEARCH_ENDPOINT=http://localhost:9200 OPENSEARCH_AUTH=none ...
+"""
+
+import os
+import boto3
+import requests as http_requests
+from requests_aws4auth import AWS4Auth
+
+OPENSEARCH_ENDPOINT = os.environ.get("OPENSEARCH_ENDPOINT", "")
+OPENSEARCH_INDEX = os.environ.get("OPENSEARCH_INDEX", "creator-profiles")
+OPENSEARCH_AUTH = os.environ.get("OPENSEARCH_AUTH", "sigv4")  # "sigv4" or "none"
+OPENSEARCH_SERVICE = os.environ.get("OPENSEARCH_SERVICE", "aoss")
+REGION = os.environ.get("AWS_REGION", "us-east-1")
+
+_session = None
+
+
+def get_session():
+    """requests.Session for OPENSEARCH_ENDPOINT (signed unless OPENSEARCH_AUTH=none)."""
+    global _session
+    if _session is None:
+        _session = http_requests.Session()
+        if OPENSEARCH_AUTH != "none":
+            _session.auth = AWS4Auth(
+                region=REGION,
+                service=OPENSEARCH_SERVICE,
+                refreshable_credentials=boto3.Session().get_credentials(),
+            )
+        _session.headers["Content-Type"] = "application/json"
+    return _session
+
+
+# =============================================================================
+# Versioned creator index
+# =============================================================================
+#
+# OPENSEARCH_INDEX is an alias. The documents live in "<alias>-v<N>", with N
+# = CREATOR_INDEX_VERSION for the current mapping. A mapping change bumps the
+# version and is rolled out blue/green by the opensearch_sync reindex
+# ({"action": "reindex"} or scripts/opensearch_reindex.py):
+#   1. create <alias>-v<N> and add it to the "<alias>-pending" alias, so the
+#      sync worker writes every change to both indexes
+#   2. stream all creators from Postgres into the new index
+#   3. in one _aliases call, point the alias at the new index and drop the
+#      pending alias (and a concrete pre-alias index of the same name)
+# Searches keep reading the old index until step 3.
+
+CREATOR_INDEX_VERSION = 2
+PENDING_SUFFIX = "-pending"
+
+# HNSW on faiss: filters run inside the graph search (efficient filtering),
+# which nmslib (v1) cannot do. m / ef_construction are sized for 1024-dim
+# Titan vectors; raising ef_search trades latency for recall.
+HNSW_M = int(os.environ.get("OPENSEARCH_HNSW_M", "24"))
+HNSW_EF_CONSTRUCTION = int(os.environ.get("OPENSEARCH_HNSW_EF_CONSTRUCTION", "256"))
+HNSW_EF_SEARCH = int(os.environ.get("OPENSEARCH_HNSW_EF_SEARCH", "128"))
+
+
+def creator_index_body():
+    """Settings + mappings for CREATOR_INDEX_VERSION.
+
+    The vector is excluded from _source: search only needs ids and scores,
+    and reindexing reads from Postgres, never from the index itself.
+    """
+    return {
+        "settings": {"index": {"knn": True}},
+        "mappings": {
+            "_source": {"excludes": ["embedding"]},
+            "properties": {
+                "creator_id": {"type": "keyword"},
+                "username": {"type": "keyword"},
+                "display_name": {"type": "text"},
+                "niche": {"type": "keyword"},
+                "city": {"type": "keyword"},
+                "followers_count": {"type": "integer"},
+                "dominant_energy": {"type": "keyword"},
+                "dominant_aesthetic": {"type": "keyword"},
+                "primary_content_type": {"type": "keyword"},
+                "topics": {"type": "keyword"},
+                "style_summary": {"type": "text"},
+                "consistency_score": {"type": "float"},
+                "reel_rate": {"type": "integer"},
+                "story_rate": {"type": "integer"},
+                "post_rate": {"type": "integer"},
+                "accepts_barter": {"type": "boolean"},
+                "embedding": {
+                    "type": "knn_vector",
+                    "dimension": 1024,
+                    "method": {
+                        "name": "hnsw",
+                        "space_type": "cosinesimil",
+                        "engine": "faiss",
+                        "parameters": {
+                            "m": HNSW_M,
+                            "ef_construction": HNSW_EF_CONSTRUCTION,
+                            "ef_search": HNSW_EF_SEARCH,
+                        },
+                    },
+                },
+            },
+        },
+    }
+
+
+def versioned_index(version=None, alias=None):
+    return f"{alias or OPENSEARCH_INDEX}-v{version or CREATOR_INDEX_VERSION}"
+
+
+def alias_targets(alias):
+    """Indexes `alias` points to ([] if it doesn't exist)."""
+    resp = get_session().get(f"{OPENSEARCH_ENDPOINT}/_alias/{alias}", timeout=10)
+    if resp.status_code == 404:
+        return []
+    resp.raise_for_status()
+    return sorted(resp.json().keys())
+
+
+def index_exists(index):
+    return get_session().head(f"{OPENSEARCH_ENDPOINT}/{index}", timeout=10).status_code == 200
+
+
+def create_index(index, body=None):
+    """Create `index` with the current mapping (no-op if it already exists)."""
+    resp = get_session().put(f"{OPENSEARCH_ENDPOINT}/{index}", json=body or creator_index_body(), timeout=30)
+    print(f"Create index {index}: {resp.status_code} {resp.text[:200]}")
+    if resp.status_code >= 300 and "resource_already_exists" not in resp.text:
+        resp.raise_for_status()
+
+
+def update_aliases(actions):
+    resp = get_session().post(f"{OPENSEARCH_ENDPOINT}/_aliases", json={"actions": actions}, timeout=30)
+    resp.raise_for_status()
+
+
+def write_targets(alias=None):
+    """Indexes the sync worker must write to: the live index plus any pending one.
+
+    On a fresh collection, creates the current versioned index and points the
+    alias at it.
+    """
+    alias = alias or OPENSEARCH_INDEX
+    live = alias_targets(alias)
+    if not live:
+        if index_exists(alias):
+            live = [alias]  # pre-alias (v1) index, replaced by the next reindex
+        else:
+            index = versioned_index(alias=alias)
+            create_index(index)
+            update_aliases([{"add": {"index": index, "alias": alias}}])
+            live = [index]
+    return sorted(set(live) | set(alias_targets(alias + PENDING_SUFFIX)))
+
+
+def start_blue_green(index, alias=None):
+    """Create `index` and register it as pending, so the sync worker also writes to it."""
+    alias = alias or OPENSEARCH_INDEX
+    create_index(index)
+    update_aliases([{"add": {"index": index, "alias": alias + PENDING_SUFFIX}}])
+
+
+def flip_alias(index, alias=None, delete_old=False):
+    """Atomically point `alias` at `index` only. Returns the indexes it replaced.
+
+    Old versioned indexes are kept (for rollback) unless delete_old is set.
+    """
+    alias = alias or OPENSEARCH_INDEX
+    live = alias_targets(alias)
+    old = [i for i in live if i != index]
+    actions = [{"add": {"index": index, "alias": alias}}]
+    actions += [{"remove": {"index": i, "alias": alias}} for i in old]
+    if index in alias_targets(alias + PENDING_SUFFIX):
+        actions.append({"remove": {"index": index, "alias": alias + PENDING_SUFFIX}})
+    replaced = list(old)
+    if not live and index_exists(alias):
+        # A concrete (pre-alias, v1) index holds the alias name; drop it in the same call
+        actions.append({"remove_index": {"index": alias}})
+        replaced.append(alias)
+    update_aliases(actions)
+    print(f"Alias {alias} -> {index} (replaced: {', '.join(replaced) or 'none'})")
+
+    if delete_old:
+        for i in old:
+            get_session().delete(f"{OPENSEARCH_ENDPOINT}/{i}", timeout=30)
+    return replaced
@@ -0,0 +1,140 @@
+"""Change outbox consumer: fans creator changes out to search and caches.
+
+Triggers write one change_outbox row per change to creators, rate_cards and
+creator aggregate embeddings, in the same transaction as the change (see
+"Change outbox" in seed/schema.sql), so no writer can forget to notify search.
+process_outbox() claims a batch of unprocessed rows with FOR UPDATE SKIP LOCKED
+and runs every handler in OUTBOX_HANDLERS inside that transaction, each under
+a savepoint. When a handler fails on the batch it is re-run row by row, so
+only the rows it can't handle are held back (attempts + 1, retried on a later
+run); the rest are marked processed. Delivery is at-least-once and each
+handler must be idempotent.
+"""
+
+from shared.metrics import emit_metric
+from shared.neighbors import refresh_creator
+from shared.search_sync import enqueue_search_sync
+from shared.wishlist import refresh_for_creators
+
+OUTBOX_BATCH_SIZE = 500
+OUTBOX_MAX_ATTEMPTS = 5
+OUTBOX_RETENTION_DAYS = 3
+
+
+def _sync_search_index(cur, changes):
+    """Queue changed creators for OpenSearch (_bulk worker in opensearch_sync)."""
+    enqueue_search_sync(cur, {c["creator_id"] for c in changes}, reason="outbox")
+
+
+def _refresh_neighbors(cur, changes):
+    """Recompute creator_neighbors around every creator whose aggregate changed."""
+    for creator_id in sorted({c["creator_id"] for c in changes if c["entity"] == "creator_embedding"}):
+        refresh_creator(cur, creator_id)
+
+
+def _refresh_wishlist_centroids(cur, changes):
+    """Rebuild brand wishlist centroids that contain a creator whose aggregate changed."""
+    creator_ids = sorted({c["creator_id"] for c in changes if c["entity"] == "creator_embedding"})
+    if creator_ids:
+        refresh_for_creators(cur, creator_ids)
+
+
+def _bump_wishlist_versions(cur, changes):
+    """Move the wishlist version of every brand that saved a changed creator
+    (their wishlist listing ETag covers the creators' profiles and rates)."""
+    creator_ids = sorted({c["creator_id"] for c in changes if c["entity"] in ("creator", "rate_card")})
+    if creator_ids:
+        cur.execute(
+            """
+            UPDATE brand_wishlist_state SET version = version + 1, updated_at = NOW()
+            WHERE user_id IN (SELECT user_id FROM brand_wishlists WHERE creator_id = ANY(%s::uuid[]))
+            """,
+            (creator_ids,),
+        )
+
+
+OUTBOX_HANDLERS = [
+    ("search_index", _sync_search_index),
+    ("neighbors", _refresh_neighbors),
+    ("wishlist_centroids", _refresh_wishlist_centroids),
+    ("wishlist_versions", _bump_wishlist_versions),
+]
+
+
+def _run_handler(cur, handle, changes):
+    """Run one handler under a savepoint; on failure undo just its writes and re-raise."""
+    cur.execute("SAVEPOINT outbox_handler")
+    try:
+        handle(cur, changes)
+    except Exception:
+        cur.execute("ROLLBACK TO SAVEPOINT outbox_handler")
+        raise
+    cur.execute("RELEASE SAVEPOINT outbox_handler")
+
+
+def process_outbox(conn, batch_size=OUTBOX_BATCH_SIZE):
+    """Claim and deliver one batch. Returns the number of rows claimed (0 = idle)."""
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT id, entity, creator_id, op, changed_fields
+        FROM change_outbox
+        WHERE processed_at IS NULL AND attempts < %s
+        ORDER BY id
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+        """,
+        (OUTBOX_MAX_ATTEMPTS, batch_size),
+    )
+    rows = cur.fetchall()
+    if not rows:
+        conn.commit()
+        return 0
+
+    ids = [row[0] for row in rows]
+    changes = [
+        {"id": row[0], "entity": row[1], "creator_id": str(row[2]), "op": row[3], "changed_fields": row[4]}
+        for row in rows
+    ]
+
+    failed = {}  # id -> error, for rows some handler couldn't deliver
+    for name, handle in OUTBOX_HANDLERS:
+        batch = [c for c in changes if c["id"] not in failed]
+        if not batch:
+            break
+        try:
+            _run_handler(cur, handle, batch)
+        except Exception as e:
+            print(f"Outbox handler {name} failed for {len(batch)} changes, retrying one by one: {e}")
+            for change in batch:
+                try:
+                    _run_handler(cur, handle, [change])
+                except Exception as row_error:
+                    failed[change["id"]] = f"{name}: {row_error}"[:1000]
+
+    delivered = [i for i in ids if i not in failed]
+    cur.execute("UPDATE change_outbox SET processed_at = NOW() WHERE id = ANY(%s)", (delivered,))
+    for change_id, error in failed.items():
+        cur.execute(
+            "UPDATE change_outbox SET attempts = attempts + 1, last_error = %s WHERE id = %s",
+            (error, change_id),
+        )
+    conn.commit()
+
+    if failed:
+        print(f"Outbox: {len(failed)} of {len(ids)} changes failed and will be retried")
+        emit_metric("OutboxDeliveryFailed", len(failed))
+    emit_metric("OutboxDelivered", len(delivered))
+    return len(ids)
+
+
+def purge_processed(conn, days=OUTBOX_RETENTION_DAYS):
+    """Delete delivered rows older than `days`."""
+    cur = conn.cursor()
+    cur.execute(
+        "DELETE FROM change_outbox WHERE processed_at < NOW() - make_interval(days => %s)",
+        (days,),
+    )
+    deleted = cur.rowcount
+    conn.commit()
+    return deleted
@@ -0,0 +1,500 @@
+"""Vector search backends over creator aggregate embeddings.
+
+Every backend answers the same question: the `limit` creators whose aggregate
+embedding is closest (cosine) to a query vector, subject to hard filters.
+search() returns [(creator_id, similarity)] best first, where similarity is
+cosine similarity. Callers load the creator rows from Postgres themselves, so
+results from different backends can be compared directly (brand_search's
+shadow mode).
+
+    pgvector    HNSW over video_embeddings; SEARCH_INDEX_MODE picks the index
+                (see "Quantized search indexes" in seed/schema.sql)
+    opensearch  k-NN query with the filters applied while the graph is
+                searched ("efficient filtering", needs a faiss or lucene index);
+                OPENSEARCH_FILTER_MODE=post filters an over-fetched k instead
+    memory      brute-force cosine in the container, over a float16 snapshot
+                memory-mapped from S3 (SEARCH_SNAPSHOT_BUCKET, see
+                shared/vector_snapshot.py) or a matrix loaded from Postgres
+
+Filters (all optional):
+    city              case-insensitive substring (as c.city ILIKE '%city%')
+    min_followers     followers_count >= value
+    max_followers     followers_count <= value
+    niche             exact match
+    exclude_ids       creator ids to leave out
+"""
+
+import json
+import os
+import time
+
+import numpy as np
+
+from shared import vector_snapshot
+from shared.db import get_db_connection
+from shared.opensearch import OPENSEARCH_ENDPOINT, OPENSEARCH_INDEX, get_session
+
+# ANN index used by the pgvector backend:
+#   "exact"   : HNSW over the full-precision vector(1024) column
+#   "halfvec" : candidates from the float16 expression index, re-ranked exactly
+#   "binary"  : candidates by Hamming distance over binary_quantize(), re-ranked exactly
+SEARCH_INDEX_MODE = os.environ.get("SEARCH_INDEX_MODE", "exact")
+SEARCH_CANDIDATES = int(os.environ.get("SEARCH_CANDIDATES", "200"))
+# Hard filters are applied after re-ranking, so widen the candidate pool when present
+SEARCH_FILTERED_CANDIDATE_FACTOR = 4
+HNSW_DEFAULT_EF_SEARCH = 40
+HNSW_MAX_EF_SEARCH = 1000
+
+COARSE_DISTANCE = {
+    "halfvec": "ve.embedding::halfvec(1024) <=> %s::halfvec(1024)",
+    "binary": "binary_quantize(ve.embedding)::bit(1024) <~> binary_quantize(%s::vector)",
+}
+
+# "efficient": filter inside the k-NN query (faiss / lucene engines)
+# "post"     : k-NN for limit * SEARCH_FILTERED_CANDIDATE_FACTOR, then filter
+OPENSEARCH_FILTER_MODE = os.environ.get("OPENSEARCH_FILTER_MODE", "efficient")
+OPENSEARCH_TIMEOUT = float(os.environ.get("OPENSEARCH_TIMEOUT_SECONDS", "5"))
+
+# Memory backend without a snapshot bucket: reload from Postgres after this long
+MEMORY_INDEX_TTL = int(os.environ.get("MEMORY_INDEX_TTL_SECONDS", "300"))
+# Memory backend with SEARCH_SNAPSHOT_BUCKET: poll LATEST this often, and refuse
+# (so brand_search falls back to pgvector) once the snapshot is older than the bound
+SNAPSHOT_CHECK_SECONDS = int(os.environ.get("SEARCH_SNAPSHOT_CHECK_SECONDS", "60"))
+SNAPSHOT_MAX_AGE = int(os.environ.get("SEARCH_SNAPSHOT_MAX_AGE_SECONDS", "3600"))
+# Widen snapshot vectors to float32 in memory on load (see InMemoryBackend.from_snapshot)
+SNAPSHOT_EXPAND = os.environ.get("SEARCH_SNAPSHOT_EXPAND", "true").lower() == "true"
+
+_memory_backend = None
+_snapshot_checked_at = 0.0
+
+
+def _vector_literal(vector):
+    return "[" + ",".join(str(v) for v in vector) + "]"
+
+
+def _has_filters(filters):
+    return any(filters.get(key) for key in ("city", "min_followers", "max_followers", "niche", "exclude_ids"))
+
+
+# =============================================================================
+# pgvector
+# =============================================================================
+
+def hard_filter_sql(filters):
+    """WHERE conditions + params for `filters` (creators c, video_embeddings ve)."""
+    conditions = ["ve.embedding IS NOT NULL"]
+    params = []
+    if filters.get("city"):
+        conditions.append("c.city ILIKE %s")
+        params.append(f"%{filters['city']}%")
+    if filters.get("min_followers"):
+        conditions.append("c.followers_count >= %s")
+        params.append(filters["min_followers"])
+    if filters.get("max_followers"):
+        conditions.append("c.followers_count <= %s")
+        params.append(filters["max_followers"])
+    if filters.get("niche"):
+        conditions.append("c.niche = %s")
+        params.append(filters["niche"])
+    if filters.get("exclude_ids"):
+        conditions.append("c.id <> ALL(%s::uuid[])")
+        params.append([str(c) for c in filters["exclude_ids"]])
+    return conditions, params
+
+
+def candidate_count(filters, limit, mode=None):
+    """Coarse candidates to fetch before exact re-ranking (0 for exact mode).
+
+    Excluded ids are added on top: they are among the candidates but never returned.
+    """
+    mode = mode or SEARCH_INDEX_MODE
+    if mode not in COARSE_DISTANCE:
+        return 0
+    factor = SEARCH_FILTERED_CANDIDATE_FACTOR if _has_filters(filters) else 1
+    excluded = len(filters.get("exclude_ids") or [])
+    return min(max(SEARCH_CANDIDATES * factor, limit) + excluded, HNSW_MAX_EF_SEARCH)
+
+
+def build_semantic_query(filters, query_embedding, limit, mode=None, candidates=None):
+    """pgvector query returning (creator_id, similarity) rows, best first.
+
+    Uses the <=> operator (cosine distance) against creator aggregate embeddings,
+    with the hard filters as WHERE clauses.
+
+    In "halfvec" / "binary" mode the query is two-stage: the compact HNSW index
+    returns candidate_count() aggregate rows, which are then re-ranked by exact
+    cosine distance on the stored vector(1024) and filtered.
+    """
+    mode = mode or SEARCH_INDEX_MODE
+    if mode != "exact" and mode not in COARSE_DISTANCE:
+        print(f"Unknown SEARCH_INDEX_MODE '{mode}', using exact")
+        mode = "exact"
+
+    embedding_str = _vector_literal(query_embedding)
+    hard_conditions, filter_params = hard_filter_sql(filters)
+    where_clause = " AND ".join(hard_conditions)
+
+    if mode == "exact":
+        params = [embedding_str, *filter_params, embedding_str, limit]  # SELECT, WHERE, ORDER BY
+        sql = f"""
+            SELECT c.id, 1 - (ve.embedding <=> %s::vector) AS similarity
+            FROM creators c
+            JOIN video_embeddings ve ON ve.creator_id = c.id
+                 AND ve.is_creator_aggregate = TRUE
+            WHERE {where_clause}
+            ORDER BY ve.embedding <=> %s::vector ASC
+            LIMIT %s
+        """
+        return sql, params
+
+    params = [
+        embedding_str, candidates or candidate_count(filters, limit, mode),
+        embedding_str, *filter_params, limit,
+    ]
+    sql = f"""
+        WITH candidates AS (
+            SELECT ve.creator_id, ve.embedding
+            FROM video_embeddings ve
+            WHERE ve.is_creator_aggregate = TRUE
+            ORDER BY {COARSE_DISTANCE[mode]} ASC
+            LIMIT %s
+        )
+        SELECT c.id, 1 - (ve.embedding <=> %s::vector) AS similarity
+        FROM candidates ve
+        JOIN creators c ON c.id = ve.creator_id
+        WHERE {where_clause}
+        ORDER BY similarity DESC
+        LIMIT %s
+    """
+    return sql, params
+
+
+class PgvectorBackend:
+    """HNSW search in Postgres (the default backend)."""
+
+    name = "pgvector"
+
+    def __init__(self, conn=None, mode=None):
+        self.conn = conn
+        self.mode = mode or SEARCH_INDEX_MODE
+
+    def search(self, query_embedding, filters, limit):
+        cur = (self.conn or get_db_connection()).cursor()
+        sql, params = build_semantic_query(filters, query_embedding, limit, mode=self.mode)
+        candidates = candidate_count(filters, limit, self.mode)
+        excluded = len(filters.get("exclude_ids") or [])
+        if not candidates and excluded + limit > HNSW_DEFAULT_EF_SEARCH:
+            # Exact mode: excluded rows still use up the index scan's results
+            candidates = min(excluded + limit, HNSW_MAX_EF_SEARCH)
+        if candidates:
+            # HNSW returns at most ef_search rows (default 40)
+            cur.execute("SET LOCAL hnsw.ef_search = %s", (candidates,))
+        cur.execute(sql, params)
+        return [(str(row[0]), float(row[1])) for row in cur.fetchall()]
+
+
+# =============================================================================
+# OpenSearch
+# =============================================================================
+
+def opensearch_filter(filters):
+    """Bool query for `filters`, or None when there are none."""
+    clauses, excluded = [], []
+    if filters.get("city"):
+        city = str(filters["city"]).replace("\\", "\\\\").replace("*", "\\*").replace("?", "\\?")
+        clauses.append({"wildcard": {"city": {"value": f"*{city}*", "case_insensitive": True}}})
+    followers = {}
+    if filters.get("min_followers"):
+        followers["gte"] = filters["min_followers"]
+    if filters.get("max_followers"):
+        followers["lte"] = filters["max_followers"]
+    if followers:
+        clauses.append({"range": {"followers_count": followers}})
+    if filters.get("niche"):
+        clauses.append({"term": {"niche": filters["niche"]}})
+    if filters.get("exclude_ids"):
+        excluded.append({"ids": {"values": [str(c) for c in filters["exclude_ids"]]}})
+
+    if not clauses and not excluded:
+        return None
+    query = {"bool": {}}
+    if clauses:
+        query["bool"]["filter"] = clauses
+    if excluded:
+        query["bool"]["must_not"] = excluded
+    return query
+
+
+class OpenSearchBackend:
+    """k-NN query against the creator index kept in sync by opensearch_sync."""
+
+    name = "opensearch"
+
+    def __init__(self, endpoint=None, index=None, filter_mode=None):
+        self.endpoint = endpoint or OPENSEARCH_ENDPOINT
+        self.index = index or OPENSEARCH_INDEX
+        self.filter_mode = filter_mode or OPENSEARCH_FILTER_MODE
+        if not self.endpoint:
+            raise RuntimeError("OPENSEARCH_ENDPOINT is not set")
+
+    def build_query(self, query_embedding, filters, limit):
+        knn = {"vector": [float(v) for v in query_embedding], "k": limit}
+        query_filter = opensearch_filter(filters)
+
+        if query_filter is None:
+            query = {"knn": {"embedding": knn}}
+        elif self.filter_mode == "post":
+            knn["k"] = limit * SEARCH_FILTERED_CANDIDATE_FACTOR
+            query = {"bool": {"must": [{"knn": {"embedding": knn}}], "filter": [query_filter]}}
+        else:
+            knn["filter"] = query_filter
+            query = {"knn": {"embedding": knn}}
+
+        return {"size": limit, "_source": False, "query": query}
+
+    def search(self, query_embedding, filters, limit):
+        resp = get_session().post(
+            f"{self.endpoint}/{self.index}/_search",
+            data=json.dumps(self.build_query(query_embedding, filters, limit)),
+            timeout=OPENSEARCH_TIMEOUT,
+        )
+        resp.raise_for_status()
+        # cosinesimil score is (1 + cos) / 2
+        return [(hit["_id"], 2 * hit["_score"] - 1) for hit in resp.json()["hits"]["hits"]]
+
+
+# =============================================================================
+# In-memory (NumPy)
+# =============================================================================
+
+def _encode(values):
+    """Dictionary-encode strings: (int32 codes, vocab), -1 for empty values."""
+    vocab = {}
+    codes = np.fromiter(
+        (vocab.setdefault(v, len(vocab)) if v else -1 for v in values), dtype=np.int32, count=len(values),
+    )
+    return codes, sorted(vocab, key=vocab.get)
+
+
+class InMemoryBackend:
+    """Exact cosine search over every creator aggregate held in the container.
+
+    Columns follow the snapshot layout (shared/vector_snapshot.py): unit
+    vectors (float32, or a memory-mapped float16 snapshot), follower counts,
+    and niche / city as codes into a vocabulary, so text filters are checked
+    once per distinct value. Vectors are scored in chunks, so a float16
+    snapshot is never expanded in full. Also the reference ("ground truth")
+    backend for comparing the ANN backends.
+    """
+
+    name = "memory"
+    SCORE_CHUNK_ROWS = 16384
+    DENSE_FILTER_FRACTION = 0.2
+
+    def __init__(self, ids, vectors, followers, niche, city, vocab, version=None, valid_at=None, has_vector=None):
+        self.ids = ids                # S36 creator ids
+        self.vectors = vectors        # (n, dim) unit vectors
+        # Rows with a vector (snapshots include creators without one); None = all
+        self.has_vector = None if has_vector is None or has_vector.all() else np.asarray(has_vector, dtype=bool)
+        self.followers = followers    # -1 = unknown, which no follower filter matches (as NULL in SQL)
+        self.codes = {"niche": niche, "city": city}
+        self.vocab = vocab
+        self.version = version
+        self.loaded_at = time.time()
+        # Data is current as of valid_at (moved forward by unchanged snapshot checks)
+        self.valid_at = valid_at or self.loaded_at
+
+    @classmethod
+    def from_columns(cls, ids, vectors, niches, cities, followers):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim != 2:
+            vectors = vectors.reshape(len(ids), -1)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        niche_codes, niche_vocab = _encode(list(niches))
+        city_codes, city_vocab = _encode(list(cities))
+        return cls(
+            ids=np.asarray([str(c) for c in ids], dtype="S36"),
+            vectors=vectors / np.where(norms == 0, 1, norms),
+            followers=np.asarray([-1 if f is None else f for f in followers], dtype=np.int64),
+            niche=niche_codes,
+            city=city_codes,
+            vocab={"niche": niche_vocab, "city": city_vocab},
+        )
+
+    @classmethod
+    def from_rows(cls, rows):
+        """Build from (creator_id, niche, city, followers_count, embedding) rows.
+
+        Rows without an embedding (SNAPSHOT_SQL includes every creator) are skipped.
+        """
+        rows = [row for row in rows if row[4] is not None]
+        return cls.from_columns(
+            ids=[row[0] for row in rows],
+            vectors=[json.loads(row[4]) if isinstance(row[4], str) else row[4] for row in rows]
+            or np.zeros((0, vector_snapshot.DIM), dtype=np.float32),
+            niches=[row[1] for row in rows],
+            cities=[row[2] for row in rows],
+            followers=[row[3] for row in rows],
+        )
+
+    @classmethod
+    def load(cls, cur):
+        cur.execute(vector_snapshot.SNAPSHOT_SQL)
+        return cls.from_rows(cur.fetchall())
+
+    @classmethod
+    def from_snapshot(cls, directory, expand=None):
+        """Memory-map a local snapshot directory (see shared/vector_snapshot.py).
+
+        With expand (SEARCH_SNAPSHOT_EXPAND, the default) the float16 vectors
+        are widened to float32 in memory once per snapshot: NumPy converts
+        float16 without SIMD, which would otherwise cost more than the matrix
+        product on every search. Without it they stay memory-mapped (half the
+        memory, several times slower per search).
+        """
+        manifest, columns = vector_snapshot.open_snapshot(directory)
+        n = manifest["count"]
+        vectors = columns["vectors"][:n]
+        if SNAPSHOT_EXPAND if expand is None else expand:
+            expanded = np.empty(vectors.shape, dtype=np.float32)
+            for start in range(0, n, cls.SCORE_CHUNK_ROWS):
+                expanded[start:start + cls.SCORE_CHUNK_ROWS] = vectors[start:start + cls.SCORE_CHUNK_ROWS]
+            vectors = expanded
+        return cls(
+            ids=columns["ids"][:n],
+            vectors=vectors,
+            followers=columns["followers"][:n],
+            niche=columns["niche"][:n],
+            city=columns["city"][:n],
+            vocab=manifest["vocab"],
+            version=manifest["version"],
+            valid_at=manifest.get("valid_at", manifest["built_at"]),
+            has_vector=columns["has_vector"][:n] if "has_vector" in columns else None,
+        )
+
+    def _vocab_mask(self, name, predicate):
+        matching = [code for code, value in enumerate(self.vocab[name]) if predicate(value)]
+        return np.isin(self.codes[name], matching)
+
+    def _mask(self, filters):
+        mask = np.ones(len(self.ids), dtype=bool) if self.has_vector is None else self.has_vector.copy()
+        if filters.get("city"):
+            needle = str(filters["city"]).lower()
+            mask &= self._vocab_mask("city", lambda value: needle in value.lower())
+        if filters.get("min_followers"):
+            mask &= self.followers >= filters["min_followers"]
+        if filters.get("max_followers"):
+            mask &= (self.followers >= 0) & (self.followers <= filters["max_followers"])
+        if filters.get("niche"):
+            mask &= self._vocab_mask("niche", lambda value: value == filters["niche"])
+        if filters.get("exclude_ids"):
+            mask &= ~np.isin(self.ids, np.asarray([str(c) for c in filters["exclude_ids"]], dtype="S36"))
+        return mask
+
+    def _scores(self, rows, query):
+        """Cosine scores for `rows` (None = every creator), in chunks."""
+        count = len(self.ids) if rows is None else len(rows)
+        scores = np.empty(count, dtype=np.float32)
+        for start in range(0, count, self.SCORE_CHUNK_ROWS):
+            stop = min(start + self.SCORE_CHUNK_ROWS, count)
+            block = self.vectors[start:stop] if rows is None else self.vectors[rows[start:stop]]
+            scores[start:stop] = np.asarray(block, dtype=np.float32) @ query
+        return scores
+
+    def search(self, query_embedding, filters, limit):
+        query = np.asarray(query_embedding, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+
+        mask = self._mask(filters) if _has_filters(filters) or self.has_vector is not None else None
+        if mask is None or mask.mean() > self.DENSE_FILTER_FRACTION:
+            # Gathering most rows costs more than scoring all of them contiguously
+            rows = None
+            scores = self._scores(None, query)
+            if mask is not None:
+                scores[~mask] = -np.inf
+        else:
+            rows = np.flatnonzero(mask)
+            if not len(rows):
+                return []
+            scores = self._scores(rows, query)
+
+        if len(scores) > limit:
+            top = np.argpartition(-scores, limit - 1)[:limit]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        index = top if rows is None else rows[top]
+        return [
+            (creator_id.decode(), float(score))
+            for creator_id, score in zip(self.ids[index], scores[top])
+            if score != -np.inf
+        ]
+
+
+def _load_snapshot_backend():
+    """InMemoryBackend over the latest S3 snapshot, re-checked every SNAPSHOT_CHECK_SECONDS.
+
+    A new version is downloaded to /tmp once and memory-mapped. If S3 can't be
+    reached the loaded version keeps serving, within SNAPSHOT_MAX_AGE.
+    """
+    global _memory_backend, _snapshot_checked_at
+    now = time.time()
+    if _memory_backend is None or now - _snapshot_checked_at > SNAPSHOT_CHECK_SECONDS:
+        try:
+            manifest = vector_snapshot.latest_manifest()
+            _snapshot_checked_at = now
+            if _memory_backend is None or manifest["version"] != _memory_backend.version:
+                start = time.perf_counter()
+                _memory_backend = InMemoryBackend.from_snapshot(vector_snapshot.fetch_snapshot(manifest))
+                print(f"Loaded search snapshot {manifest['version']} ({manifest['count']} creators) "
+                      f"in {(time.perf_counter() - start) * 1000:.0f}ms")
+            _memory_backend.valid_at = manifest.get("valid_at", manifest["built_at"])
+        except Exception as e:
+            if _memory_backend is None:
+                raise
+            print(f"Search snapshot check failed ({e}), keeping {_memory_backend.version}")
+
+    age = now - _memory_backend.valid_at
+    if age > SNAPSHOT_MAX_AGE:
+        raise RuntimeError(f"Search snapshot {_memory_backend.version} is {age:.0f}s old (max {SNAPSHOT_MAX_AGE}s)")
+    return _memory_backend
+
+
+def _get_memory_backend():
+    """Container-cached InMemoryBackend: from the S3 snapshot when
+    SEARCH_SNAPSHOT_BUCKET is set, else loaded from Postgres and reloaded after
+    MEMORY_INDEX_TTL seconds."""
+    global _memory_backend
+    if vector_snapshot.SNAPSHOT_BUCKET:
+        return _load_snapshot_backend()
+    if _memory_backend is None or time.time() - _memory_backend.loaded_at > MEMORY_INDEX_TTL:
+        conn = get_db_connection()
+        _memory_backend = InMemoryBackend.load(conn.cursor())
+        conn.rollback()
+        print(f"Loaded {len(_memory_backend.ids)} creator vectors into memory")
+    return _memory_backend
+
+
+def get_backend(name):
+    """Backend by name: "pgvector", "opensearch" or "memory"."""
+    if name == "pgvector":
+        return PgvectorBackend()
+    if name == "opensearch":
+        return OpenSearchBackend()
+    if name == "memory":
+        return _get_memory_backend()
+    raise ValueError(f"Unknown search backend '{name}'")
+
+
+def compare_hits(primary, shadow):
+    """Overlap (of the primary's ids) and mean rank shift between two hit lists."""
+    primary_ids = [creator_id for creator_id, _ in primary]
+    shadow_rank = {creator_id: rank for rank, (creator_id, _) in enumerate(shadow)}
+    common = [creator_id for creator_id in primary_ids if creator_id in shadow_rank]
+    return {
+        "overlap": len(common) / len(primary_ids) if primary_ids else 1.0,
+        "rank_shift": (
+            sum(abs(primary_ids.index(c) - shadow_rank[c]) for c in common) / len(common)
+            if common else 0.0
+        ),
+    }
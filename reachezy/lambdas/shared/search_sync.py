@@ -0,0 +1,26 @@
+"""Search index sync queue.
+
+The change-outbox consumer (shared/outbox.py) upserts creators whose indexed
+data changed into search_sync_queue (one row per creator, so repeated changes
+coalesce). The opensearch_sync worker drains the queue in batches and writes
+them with the _bulk API.
+"""
+
+
+def enqueue_search_sync(cur, creator_ids, reason=None):
+    """Queue creators for (re)indexing, in the caller's transaction."""
+    creator_ids = [str(c) for c in creator_ids if c]
+    if not creator_ids:
+        return
+    cur.execute(
+        """
+        INSERT INTO search_sync_queue (creator_id, reason)
+        SELECT UNNEST(%s::uuid[]), %s
+        ON CONFLICT (creator_id) DO UPDATE SET
+            enqueued_at = NOW(),
+            reason = EXCLUDED.reason,
+            run_after = NOW(),
+            attempts = 0
+        """,
+        (creator_ids, reason),
+    )
@@ -0,0 +1,184 @@
+"""Per-creator style counters and the style_profile derived from them.
+
+creator_style_counts holds one row per (creator, field, value) with the number
+of the creator's analyzed videos having that value:
+
+    _videos          ''            every analyzed video
+    energy_level     'high'        ... aesthetic, setting, production_quality,
+                                   content_type likewise
+    topic            'skincare'    videos mentioning the topic
+    face_visible     'true'        videos with a face on screen
+    has_text_overlay 'true'        videos with text overlays
+
+A trigger on video_analyses applies +1 / -1 deltas on insert, replace (upsert)
+and delete (see "Incremental style profile" in seed/schema.sql), so the
+profile is derived from a handful of counter rows rather than every analysis.
+last_video_at breaks count ties in favour of the most recently uploaded video,
+matching the old Counter-over-newest-first behaviour.
+"""
+
+from collections import defaultdict
+
+STYLE_FIELDS = ["energy_level", "aesthetic", "setting", "production_quality", "content_type"]
+
+# high/chaotic=80-90, medium/moderate=50-60, low/calm=20-30
+ENERGY_SCORES = {"high": 80, "chaotic": 90, "medium": 55, "moderate": 55, "low": 30, "calm": 25}
+
+# Counter rows for every analysis of a creator; style_count_rows() is the same
+# SQL function the trigger uses, so a recount matches the maintained state.
+_SCRATCH_COUNTS_SQL = """
+    SELECT f.field, f.value, COUNT(*), MAX(vu.created_at)
+    FROM video_analyses va
+    JOIN video_uploads vu ON va.video_id = vu.id
+    CROSS JOIN LATERAL style_count_rows(va) f
+    WHERE va.creator_id = %s
+    GROUP BY f.field, f.value
+"""
+
+
+def _group(rows):
+    """[(field, value, count, last_video_at)] -> {field: [(value, count), ...]} in rank order."""
+    grouped = defaultdict(list)
+    for field, value, count, last_video_at in rows:
+        if count > 0:
+            grouped[field].append((value, count, last_video_at))
+    return {
+        field: [
+            (value, count)
+            for value, count, _ in sorted(
+                entries, key=lambda e: (-e[1], -(e[2].timestamp() if e[2] else 0), e[0])
+            )
+        ]
+        for field, entries in grouped.items()
+    }
+
+
+def load_style_counts(cur, creator_id):
+    """Maintained counters for a creator ({} if none)."""
+    cur.execute(
+        """
+        SELECT field, value, count, last_video_at
+        FROM creator_style_counts
+        WHERE creator_id = %s AND count > 0
+        """,
+        (creator_id,),
+    )
+    return _group(cur.fetchall())
+
+
+def compute_style_counts(cur, creator_id):
+    """Counters recomputed from every video_analyses row (no writes)."""
+    cur.execute(_SCRATCH_COUNTS_SQL, (creator_id,))
+    return _group(cur.fetchall())
+
+
+def rebuild_style_counts(cur, creator_id):
+    """Replace a creator's counters with a from-scratch recount."""
+    cur.execute("DELETE FROM creator_style_counts WHERE creator_id = %s", (creator_id,))
+    cur.execute(
+        f"""
+        INSERT INTO creator_style_counts (creator_id, field, value, count, last_video_at)
+        SELECT %s, field, value, count, last_video_at
+        FROM ({_SCRATCH_COUNTS_SQL}) AS scratch(field, value, count, last_video_at)
+        """,
+        (creator_id, creator_id),
+    )
+
+
+def diff_style_counts(maintained, scratch):
+    """Human-readable differences between two counter sets ([] if identical)."""
+    diffs = []
+    for field in sorted(set(maintained) | set(scratch)):
+        have = dict(maintained.get(field, []))
+        want = dict(scratch.get(field, []))
+        for value in sorted(set(have) | set(want)):
+            if have.get(value, 0) != want.get(value, 0):
+                diffs.append(f"{field}={value!r}: maintained {have.get(value, 0)}, actual {want.get(value, 0)}")
+    return diffs
+
+
+def _top(counts, field):
+    entries = counts.get(field)
+    return entries[0][0] if entries else None
+
+
+def _count(counts, field, value="true"):
+    return dict(counts.get(field, [])).get(value, 0)
+
+
+def _compute_consistency_score(counts, total):
+    """Consistency score (0-100): average share of the most common value per field.
+
+    Higher score = more consistent style across videos.
+    """
+    if total <= 1:
+        return 100
+
+    field_scores = []
+    for field in STYLE_FIELDS:
+        entries = counts.get(field)
+        if not entries:
+            continue
+        field_scores.append(entries[0][1] / sum(count for _, count in entries))
+
+    if not field_scores:
+        return 50
+
+    return round((sum(field_scores) / len(field_scores)) * 100)
+
+
+def _build_composite_summary(total, dominant_energy, dominant_aesthetic,
+                             primary_content_type, all_topics):
+    """Build a creator-level summary reflecting all analyzed videos."""
+    parts = []
+    if primary_content_type:
+        parts.append(primary_content_type)
+    if dominant_aesthetic:
+        parts.append(dominant_aesthetic)
+    if dominant_energy:
+        parts.append(dominant_energy)
+
+    style_desc = ", ".join(parts) if parts else "mixed-style"
+    topic_str = ", ".join(all_topics[:5]) if all_topics else "various subjects"
+
+    if total == 1:
+        return f"Creator produces {style_desc} content focused on {topic_str}."
+
+    return (
+        f"Across {total} videos: Creator produces {style_desc} content "
+        f"focused on {topic_str}."
+    )
+
+
+def derive_style_profile(counts):
+    """style_profile JSON from counters, or None if the creator has no analyses.
+
+    Topics are ordered by how many videos mention them.
+    """
+    total = _count(counts, "_videos", "")
+    if total == 0:
+        return None
+
+    dominant_energy = _top(counts, "energy_level") or "medium"
+    dominant_aesthetic = _top(counts, "aesthetic")
+    primary_content_type = _top(counts, "content_type")
+    all_topics = [value for value, _ in counts.get("topic", [])]
+
+    return {
+        "dominant_energy": dominant_energy,
+        "energy_score": ENERGY_SCORES.get(dominant_energy, 50),
+        "dominant_aesthetic": dominant_aesthetic,
+        "primary_content_type": primary_content_type,
+        "topics": all_topics,
+        "face_visible_pct": round((_count(counts, "face_visible") / total) * 100, 1),
+        "text_overlay_pct": round((_count(counts, "has_text_overlay") / total) * 100, 1),
+        "settings": [
+            {"name": name, "pct": round((count / total) * 100)}
+            for name, count in counts.get("setting", [])
+        ],
+        "style_summary": _build_composite_summary(
+            total, dominant_energy, dominant_aesthetic, primary_content_type, all_topics
+        ),
+        "video_count": total,
+        "consistency_score": _compute_consistency_score(counts, total),
+    }
@@ -0,0 +1,326 @@
+"""Creator snapshots in S3: columnar .npy exports of creators, their aggregate
+vectors and rate cards.
+
+Written by the search_snapshot Lambda. Read by brand_search with
+SEARCH_BACKEND=memory (search columns only), and offline by
+scripts/creator_snapshot.py for ranking experiments and analytics that would
+otherwise run against the production database:
+
+    <prefix>/<version>/manifest.json   count, column schema, vocabularies
+    <prefix>/<version>/<column>.npy    one file per column in FIELDS
+    <prefix>/<version>/<column>.offsets.npy
+                                       row offsets of a text column
+    <prefix>/LATEST                    copy of the newest complete manifest
+
+Every creator is included. Those without an aggregate embedding have a zero
+vector and has_vector False. Unknown values are -1 in integer and code
+columns, NaN in float columns and empty in text columns. Code columns index
+into manifest["vocab"][column]. Text columns are variable length: UTF-8
+bytes in <column>.npy, row i at [offsets[i]:offsets[i + 1]] (TextColumn).
+LATEST is written after every column, so readers never see a partial
+snapshot. Readers download a version once and memory-map it.
+"""
+
+import json
+import os
+import shutil
+import time
+
+import boto3
+import numpy as np
+
+SNAPSHOT_BUCKET = os.environ.get("SEARCH_SNAPSHOT_BUCKET", "")
+SNAPSHOT_PREFIX = os.environ.get("SEARCH_SNAPSHOT_PREFIX", "search-snapshots")
+SNAPSHOT_DIR = os.environ.get("SEARCH_SNAPSHOT_DIR", "/tmp/search-snapshots")
+# Versions kept in S3 (older ones are deleted by the builder)
+SNAPSHOT_KEEP = 3
+
+FORMAT_VERSION = 3
+DIM = 1024
+STREAM_BATCH = 1000
+# Version directory names (UTC build time); fetch_snapshot only prunes these
+VERSION_FORMAT = "%Y%m%dT%H%M%SZ"
+
+# (column, dtype, kind) in SNAPSHOT_SQL select order. kind: id | vector |
+# int | float | code (dictionary-encoded string) | text (variable length) |
+# mask. Mask columns come last and are derived while writing, not selected.
+FIELDS = (
+    ("ids", "S36", "id"),
+    ("niche", "int32", "code"),
+    ("city", "int32", "code"),
+    ("followers", "int64", "int"),
+    ("vectors", "float16", "vector"),
+    ("username", "uint8", "text"),
+    ("media_count", "int64", "int"),
+    ("reel_rate", "int32", "int"),
+    ("story_rate", "int32", "int"),
+    ("post_rate", "int32", "int"),
+    ("accepts_barter", "int8", "int"),
+    ("dominant_energy", "int32", "code"),
+    ("dominant_aesthetic", "int32", "code"),
+    ("primary_content_type", "int32", "code"),
+    ("consistency_score", "float32", "float"),
+    ("updated_at", "float64", "float"),
+    ("has_vector", "bool", "mask"),  # False: no aggregate embedding (zero vector)
+)
+COLUMNS = tuple(name for name, _, _ in FIELDS)
+# What the memory search backend downloads
+SEARCH_COLUMNS = ("ids", "vectors", "has_vector", "followers", "niche", "city")
+
+SNAPSHOT_SQL = """
+    SELECT c.id, c.niche, c.city, c.followers_count, ve.embedding::text,
+           c.username, c.media_count,
+           r.reel_rate, r.story_rate, r.post_rate, r.accepts_barter::int,
+           c.style_profile->>'dominant_energy',
+           c.style_profile->>'dominant_aesthetic',
+           c.style_profile->>'primary_content_type',
+           (c.style_profile->>'consistency_score')::float,
+           EXTRACT(EPOCH FROM GREATEST(c.updated_at, r.updated_at))
+    FROM creators c
+    LEFT JOIN video_embeddings ve ON ve.creator_id = c.id AND ve.is_creator_aggregate = TRUE
+    LEFT JOIN rate_cards r ON r.creator_id = c.id
+"""
+
+_s3 = None
+
+
+def _get_s3():
+    global _s3
+    if _s3 is None:
+        _s3 = boto3.client("s3")
+    return _s3
+
+
+# =============================================================================
+# Build
+# =============================================================================
+
+def _vector(embedding):
+    if isinstance(embedding, str):
+        vector = np.fromstring(embedding.strip("[]"), sep=",", dtype=np.float32)
+    else:
+        vector = np.asarray(embedding, dtype=np.float32)
+    return vector / (np.linalg.norm(vector) or 1.0)
+
+
+def write_snapshot(rows, count, snapshot_at, root=SNAPSHOT_DIR, xact_snapshot=None):
+    """Write a local snapshot from `count` rows in SNAPSHOT_SQL column order.
+
+    Columns are preallocated as memory-mapped .npy files and filled row by
+    row, so memory stays flat however many creators there are (text bytes
+    are streamed to a side file first). Rows may stop after any column (the
+    rest are unknown); `embedding` is pgvector text, a sequence of floats or
+    None. `xact_snapshot` is the pg_snapshot the rows were
+    read under, if any. Returns the manifest.
+    """
+    version = time.strftime(VERSION_FORMAT, time.gmtime(snapshot_at))
+    directory = os.path.join(root, version)
+    os.makedirs(directory, exist_ok=True)
+
+    arrays, vocab, text = {}, {}, {}
+    for name, dtype, kind in FIELDS:
+        if kind == "text":
+            arrays[name] = np.lib.format.open_memmap(
+                os.path.join(directory, f"{name}.offsets.npy"), mode="w+", dtype=np.int64, shape=(count + 1,),
+            )
+            text[name] = open(os.path.join(directory, f"{name}.bytes"), "wb")
+            continue
+        shape = (count, DIM) if kind == "vector" else (count,)
+        arrays[name] = np.lib.format.open_memmap(
+            os.path.join(directory, f"{name}.npy"), mode="w+", dtype=dtype, shape=shape,
+        )
+        if kind == "code":
+            vocab[name] = {}
+
+    i = 0
+    for row in rows:
+        if i == count:
+            break
+        for (name, _, kind), value in zip(FIELDS, row):
+            if kind == "vector":
+                arrays[name][i] = 0 if value is None else _vector(value)
+                arrays["has_vector"][i] = value is not None
+            elif kind == "id":
+                arrays[name][i] = str(value or "").encode()
+            elif kind == "text":
+                arrays[name][i + 1] = arrays[name][i] + text[name].write(str(value or "").encode())
+            elif kind == "code":
+                arrays[name][i] = -1 if not value else vocab[name].setdefault(value, len(vocab[name]))
+            elif kind == "int":
+                arrays[name][i] = -1 if value is None else value
+            else:
+                arrays[name][i] = np.nan if value is None else value
+        for name, _, kind in FIELDS[len(row):]:
+            if kind == "text":
+                arrays[name][i + 1] = arrays[name][i]
+            elif kind != "mask":
+                arrays[name][i] = {"code": -1, "int": -1, "float": np.nan}[kind]
+        i += 1
+
+    for array in arrays.values():
+        array.flush()
+    for name, f in text.items():
+        f.close()
+        raw = os.path.join(directory, f"{name}.bytes")
+        np.save(os.path.join(directory, f"{name}.npy"), np.fromfile(raw, dtype=np.uint8))
+        os.remove(raw)
+    manifest = {
+        "format": FORMAT_VERSION,
+        "version": version,
+        # Time the data is current as of; valid_at moves forward when the
+        # builder confirms nothing changed since (touch_latest)
+        "built_at": float(snapshot_at),
+        "valid_at": float(snapshot_at),
+        # Which transactions the data includes, for the builder's change check
+        "xact_snapshot": xact_snapshot,
+        "count": i,
+        "dim": DIM,
+        "columns": [
+            {"name": name, "dtype": dtype, "kind": kind, "shape": list(arrays[name].shape[1:])}
+            for name, dtype, kind in FIELDS
+        ],
+        "vocab": {name: sorted(values, key=values.get) for name, values in vocab.items()},
+    }
+    with open(os.path.join(directory, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+    return manifest
+
+
+def build_snapshot(conn, root=SNAPSHOT_DIR):
+    """Stream creators, aggregates and rate cards from Postgres into a new local snapshot.
+
+    The count and the rows (server-side cursor) come from one REPEATABLE READ
+    transaction; built_at is its database start time and xact_snapshot its
+    pg_snapshot (which commits it sees). Returns the manifest.
+    """
+    conn.rollback()
+    cur = conn.cursor()
+    cur.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+    cur.execute(
+        f"SELECT EXTRACT(EPOCH FROM transaction_timestamp()), pg_current_snapshot()::text, COUNT(*) "
+        f"FROM ({SNAPSHOT_SQL}) s"
+    )
+    snapshot_at, xact_snapshot, count = cur.fetchone()
+
+    stream = conn.cursor(name="vector_snapshot")
+    stream.itersize = STREAM_BATCH
+    stream.execute(SNAPSHOT_SQL + " ORDER BY c.id")
+    manifest = write_snapshot(stream, count, float(snapshot_at), root, xact_snapshot=xact_snapshot)
+    stream.close()
+    conn.commit()
+    return manifest
+
+
+def upload_snapshot(manifest, bucket=None, prefix=SNAPSHOT_PREFIX, root=SNAPSHOT_DIR):
+    """Upload a local snapshot, then point LATEST at it and prune old versions."""
+    bucket = bucket or SNAPSHOT_BUCKET
+    s3 = _get_s3()
+    directory = os.path.join(root, manifest["version"])
+    for name, _, kind in FIELDS:
+        for stem in _column_files(name, kind):
+            s3.upload_file(os.path.join(directory, f"{stem}.npy"), bucket, f"{prefix}/{manifest['version']}/{stem}.npy")
+    body = json.dumps(manifest).encode()
+    s3.put_object(Bucket=bucket, Key=f"{prefix}/{manifest['version']}/manifest.json", Body=body)
+    s3.put_object(Bucket=bucket, Key=f"{prefix}/LATEST", Body=body)
+
+    resp = s3.list_objects_v2(Bucket=bucket, Prefix=f"{prefix}/", Delimiter="/")
+    versions = sorted(p["Prefix"] for p in resp.get("CommonPrefixes", []))
+    for old in versions[:-SNAPSHOT_KEEP]:
+        objects = s3.list_objects_v2(Bucket=bucket, Prefix=old).get("Contents", [])
+        if objects:
+            s3.delete_objects(Bucket=bucket, Delete={"Objects": [{"Key": o["Key"]} for o in objects]})
+
+
+def touch_latest(manifest, valid_at, bucket=None, prefix=SNAPSHOT_PREFIX):
+    """Re-publish LATEST with a newer valid_at (data unchanged since built_at)."""
+    manifest = {**manifest, "valid_at": valid_at}
+    _get_s3().put_object(Bucket=bucket or SNAPSHOT_BUCKET, Key=f"{prefix}/LATEST", Body=json.dumps(manifest).encode())
+    return manifest
+
+
+# =============================================================================
+# Read
+# =============================================================================
+
+def latest_manifest(bucket=None, prefix=SNAPSHOT_PREFIX):
+    obj = _get_s3().get_object(Bucket=bucket or SNAPSHOT_BUCKET, Key=f"{prefix}/LATEST")
+    return json.loads(obj["Body"].read())
+
+
+class TextColumn:
+    """A variable-length text column: row i is data[offsets[i]:offsets[i + 1]] as UTF-8."""
+
+    def __init__(self, data, offsets):
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return bytes(self.data[self.offsets[i]:self.offsets[i + 1]]).decode()
+
+
+def _column_files(name, kind):
+    """The .npy files (without extension) holding one column."""
+    return [name, f"{name}.offsets"] if kind == "text" else [name]
+
+
+def _manifest_columns(manifest):
+    """{column: kind} for the columns in `manifest`."""
+    return (
+        {c["name"]: c["kind"] for c in manifest.get("columns", [])}
+        or {name: kind for name, _, kind in FIELDS if name in SEARCH_COLUMNS}
+    )
+
+
+def _is_version(name):
+    try:
+        time.strptime(name, VERSION_FORMAT)
+        return True
+    except ValueError:
+        return False
+
+
+def fetch_snapshot(manifest, columns=SEARCH_COLUMNS, bucket=None, prefix=SNAPSHOT_PREFIX, root=SNAPSHOT_DIR):
+    """Download `columns` (None = all) of `manifest`'s version into root, once.
+
+    Columns the manifest doesn't have (older formats) are skipped. Other
+    snapshot versions in root are removed; nothing else there is touched.
+    Returns the local directory.
+    """
+    version = manifest["version"]
+    directory = os.path.join(root, version)
+    os.makedirs(directory, exist_ok=True)
+    kinds = _manifest_columns(manifest)
+    for name in columns or kinds:
+        if name not in kinds:
+            continue
+        for stem in _column_files(name, kinds[name]):
+            path = os.path.join(directory, f"{stem}.npy")
+            if not os.path.exists(path):
+                _get_s3().download_file(bucket or SNAPSHOT_BUCKET, f"{prefix}/{version}/{stem}.npy", path + ".part")
+                os.rename(path + ".part", path)
+    with open(os.path.join(directory, "manifest.json"), "w") as f:
+        json.dump(manifest, f)
+
+    for other in os.listdir(root):
+        if other != version and _is_version(other) and os.path.isdir(os.path.join(root, other)):
+            shutil.rmtree(os.path.join(root, other), ignore_errors=True)
+    return directory
+
+
+def open_snapshot(directory):
+    """(manifest, {column: read-only memory-mapped array}) for the columns present locally.
+
+    Text columns are TextColumns over their memory-mapped bytes and offsets.
+    """
+    with open(os.path.join(directory, "manifest.json")) as f:
+        manifest = json.load(f)
+    columns = {}
+    for name, kind in _manifest_columns(manifest).items():
+        paths = [os.path.join(directory, f"{stem}.npy") for stem in _column_files(name, kind)]
+        if all(os.path.exists(path) for path in paths):
+            arrays = [np.load(path, mmap_mode="r") for path in paths]
+            columns[name] = TextColumn(*arrays) if kind == "text" else arrays[0]
+    return manifest, columns
@@ -0,0 +1,343 @@
+"""Wishlist centroids and wishlist-driven recommendations.
+
+A brand's saved creators are grouped into up to WISHLIST_MAX_CENTROIDS
+clusters (brand_wishlists.cluster), each summarized by the running sum of its
+members' aggregate embeddings in brand_wishlist_centroids. Triggers keep the
+sums in step with every save / unsave ("Wishlist centroids" in
+seed/brand_users_schema.sql): a new save joins its nearest centroid and
+records the vector it added (brand_wishlists.contribution), which is what an
+unsave subtracts, so nothing is recomputed per request. The save / unsave
+that brings the changes since the last fit to WISHLIST_REFIT_CHANGES (or a
+quarter of the list, if more) calls refit_if_needed(), which re-runs
+spherical k-means over the members, choosing the number of clusters, so a
+diverse wishlist gets one centroid per theme instead of a blurred average.
+When a saved creator's aggregate changes, the change outbox calls
+refresh_for_creators() to update its contributions and the affected sums.
+
+recommend() searches the vector backend around each centroid, excluding
+saved creators, and splits the result between clusters by size. Results
+are cached in brand_recommendation_cache, keyed by the brand's wishlist
+version and centroid version, for up to RECOMMENDATION_TTL seconds (so new
+creators still show up).
+"""
+
+import json
+import math
+import os
+import zlib
+
+import numpy as np
+
+from shared.search_backends import get_backend
+
+WISHLIST_MAX_CENTROIDS = int(os.environ.get("WISHLIST_MAX_CENTROIDS", "3"))
+# A fit with one more cluster is kept only if it raises the mean
+# member-to-centroid cosine similarity by at least this much
+WISHLIST_SPLIT_GAIN = float(os.environ.get("WISHLIST_SPLIT_GAIN", "0.05"))
+WISHLIST_REFIT_CHANGES = int(os.environ.get("WISHLIST_REFIT_CHANGES", "5"))
+WISHLIST_SEARCH_BACKEND = os.environ.get("WISHLIST_SEARCH_BACKEND", "pgvector")
+RECOMMENDATION_TTL = int(os.environ.get("WISHLIST_RECOMMENDATION_TTL_SECONDS", "3600"))
+# Results computed (and cached) per request; callers slice
+RECOMMENDATION_MAX = 50
+KMEANS_ITERATIONS = 25
+
+
+def _unit(vectors):
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def get_state(cur, user_id):
+    """{version, centroid_version, saved_count, changes_since_fit} (zeros for a new brand)."""
+    cur.execute(
+        """
+        SELECT version, centroid_version, saved_count, changes_since_fit
+        FROM brand_wishlist_state WHERE user_id = %s
+        """,
+        (str(user_id),),
+    )
+    row = cur.fetchone() or (0, 0, 0, 0)
+    return dict(zip(("version", "centroid_version", "saved_count", "changes_since_fit"), row))
+
+
+def get_centroids(cur, user_id):
+    """[(cluster, unit centroid, member_count)], largest cluster first."""
+    cur.execute(
+        """
+        SELECT cluster, embedding_sum::text, member_count
+        FROM brand_wishlist_centroids
+        WHERE user_id = %s AND member_count > 0
+        ORDER BY member_count DESC, cluster
+        """,
+        (str(user_id),),
+    )
+    return [
+        (cluster, _unit(np.asarray(json.loads(embedding_sum), dtype=np.float32)), count)
+        for cluster, embedding_sum, count in cur.fetchall()
+    ]
+
+
+# =============================================================================
+# Fitting
+# =============================================================================
+
+def kmeans(vectors, k, iterations=KMEANS_ITERATIONS, seed=0):
+    """Spherical k-means (cosine) with k-means++ seeding. Returns (labels, unit centers)."""
+    rng = np.random.default_rng(seed)
+    centers = [vectors[rng.integers(len(vectors))]]
+    for _ in range(1, k):
+        distance = np.clip(1 - np.max(vectors @ np.asarray(centers).T, axis=1), 0, None)
+        if not distance.sum():
+            break
+        centers.append(vectors[rng.choice(len(vectors), p=distance / distance.sum())])
+    centers = np.asarray(centers)
+
+    labels = None
+    for _ in range(iterations):
+        new_labels = np.argmax(vectors @ centers.T, axis=1)
+        if labels is not None and np.array_equal(new_labels, labels):
+            break
+        labels = new_labels
+        centers = _unit(np.asarray([
+            vectors[labels == c].sum(axis=0) if np.any(labels == c) else centers[c]
+            for c in range(len(centers))
+        ]))
+    return labels, centers
+
+
+def _fit_quality(vectors, labels, centers):
+    return float(np.mean(np.sum(vectors * centers[labels], axis=1)))
+
+
+def choose_clusters(vectors, max_clusters=WISHLIST_MAX_CENTROIDS, seed=0):
+    """Labels for the smallest k (up to max_clusters) past which another
+    cluster gains less than WISHLIST_SPLIT_GAIN mean similarity.
+    Cluster 0 is the largest."""
+    labels = np.zeros(len(vectors), dtype=int)
+    quality = _fit_quality(vectors, labels, _unit(vectors.sum(axis=0, keepdims=True)))
+    for k in range(2, min(max_clusters, len(vectors) // 2) + 1):
+        candidate, centers = kmeans(vectors, k, seed=seed)
+        candidate_quality = _fit_quality(vectors, candidate, centers)
+        if candidate_quality - quality < WISHLIST_SPLIT_GAIN:
+            break
+        labels, quality = candidate, candidate_quality
+
+    by_size = np.argsort(-np.bincount(labels), kind="stable")
+    return np.argsort(by_size)[labels]
+
+
+def needs_fit(state):
+    return state["changes_since_fit"] >= max(WISHLIST_REFIT_CHANGES, state["saved_count"] // 4)
+
+
+def refit_if_needed(cur, user_id):
+    """Re-fit after a save / unsave, once enough changed since the last fit.
+
+    Called from the wishlist write path, so reading recommendations never
+    has to. Returns whether it re-fit.
+    """
+    if not needs_fit(get_state(cur, user_id)):
+        return False
+    fit_centroids(cur, user_id)
+    return True
+
+
+def fit_centroids(cur, user_id):
+    """Re-cluster a brand's saved creators from scratch, in the caller's transaction.
+
+    Clearing and re-setting brand_wishlists.cluster lets the trigger rebuild
+    every centroid sum from the current aggregates. Returns the cluster count.
+    """
+    user_id = str(user_id)
+    cur.execute(
+        """
+        SELECT bw.creator_id, ve.embedding::text
+        FROM brand_wishlists bw
+        JOIN video_embeddings ve
+          ON ve.creator_id = bw.creator_id AND ve.is_creator_aggregate = TRUE
+        WHERE bw.user_id = %s AND ve.embedding IS NOT NULL
+        ORDER BY bw.creator_id
+        """,
+        (user_id,),
+    )
+    rows = cur.fetchall()
+
+    cur.execute("UPDATE brand_wishlists SET cluster = NULL WHERE user_id = %s AND cluster IS NOT NULL", (user_id,))
+    cur.execute("DELETE FROM brand_wishlist_centroids WHERE user_id = %s", (user_id,))
+    clusters = 0
+    if rows:
+        vectors = _unit(np.asarray([json.loads(embedding) for _, embedding in rows], dtype=np.float32))
+        labels = choose_clusters(vectors, seed=zlib.crc32(user_id.encode()))
+        cur.execute(
+            """
+            UPDATE brand_wishlists bw SET cluster = fitted.cluster
+            FROM (SELECT UNNEST(%s::uuid[]) AS creator_id, UNNEST(%s::smallint[]) AS cluster) fitted
+            WHERE bw.user_id = %s AND bw.creator_id = fitted.creator_id
+            """,
+            ([str(row[0]) for row in rows], [int(label) for label in labels], user_id),
+        )
+        clusters = int(labels.max()) + 1
+    cur.execute(
+        "UPDATE brand_wishlist_state SET changes_since_fit = 0, fitted_at = NOW() WHERE user_id = %s",
+        (user_id,),
+    )
+    print(f"Fitted {clusters} wishlist centroid(s) over {len(rows)} saved creators for {user_id}")
+    return clusters
+
+
+def refresh_for_creators(cur, creator_ids):
+    """Bring centroids in line after these creators' aggregates changed (outbox).
+
+    Assigns saves that now have an aggregate, unassigns saves that lost it,
+    sets the remaining saves' contributions to the new aggregate, and
+    rebuilds the sums of every cluster containing one of the creators from
+    its members' contributions.
+    """
+    creator_ids = [str(c) for c in creator_ids]
+    cur.execute(
+        """
+        UPDATE brand_wishlists bw SET cluster = COALESCE((
+            SELECT c.cluster FROM brand_wishlist_centroids c
+            WHERE c.user_id = bw.user_id
+            ORDER BY c.embedding_sum <=> ve.embedding
+            LIMIT 1
+        ), 0)
+        FROM video_embeddings ve
+        WHERE ve.creator_id = bw.creator_id AND ve.is_creator_aggregate = TRUE
+          AND ve.embedding IS NOT NULL
+          AND bw.cluster IS NULL AND bw.creator_id = ANY(%s::uuid[])
+        """,
+        (creator_ids,),
+    )
+    cur.execute(
+        """
+        UPDATE brand_wishlists bw SET cluster = NULL
+        WHERE bw.creator_id = ANY(%s::uuid[]) AND bw.cluster IS NOT NULL
+          AND NOT EXISTS (
+              SELECT 1 FROM video_embeddings ve
+              WHERE ve.creator_id = bw.creator_id AND ve.is_creator_aggregate = TRUE
+                AND ve.embedding IS NOT NULL)
+        """,
+        (creator_ids,),
+    )
+    cur.execute(
+        """
+        UPDATE brand_wishlists bw SET contribution = ve.embedding
+        FROM video_embeddings ve
+        WHERE ve.creator_id = bw.creator_id AND ve.is_creator_aggregate = TRUE
+          AND ve.embedding IS NOT NULL
+          AND bw.cluster IS NOT NULL AND bw.creator_id = ANY(%s::uuid[])
+        """,
+        (creator_ids,),
+    )
+    cur.execute(
+        """
+        WITH affected AS (
+            SELECT DISTINCT user_id, cluster FROM brand_wishlists
+            WHERE creator_id = ANY(%s::uuid[]) AND cluster IS NOT NULL
+        ), sums AS (
+            SELECT bw.user_id, bw.cluster, SUM(bw.contribution) AS embedding_sum, COUNT(*) AS member_count
+            FROM brand_wishlists bw
+            JOIN affected a ON a.user_id = bw.user_id AND a.cluster = bw.cluster
+            WHERE bw.contribution IS NOT NULL
+            GROUP BY bw.user_id, bw.cluster
+        )
+        UPDATE brand_wishlist_centroids c
+        SET embedding_sum = sums.embedding_sum, member_count = sums.member_count, updated_at = NOW()
+        FROM sums
+        WHERE c.user_id = sums.user_id AND c.cluster = sums.cluster
+        RETURNING c.user_id
+        """,
+        (creator_ids,),
+    )
+    users = sorted({str(row[0]) for row in cur.fetchall()})
+    if users:
+        cur.execute(
+            "UPDATE brand_wishlist_state SET centroid_version = centroid_version + 1 WHERE user_id = ANY(%s::uuid[])",
+            (users,),
+        )
+
+
+# =============================================================================
+# Recommendations
+# =============================================================================
+
+def _search_centroids(centroids, saved_ids, limit):
+    """[(creator_id, similarity, cluster)], each cluster's share by size, best first."""
+    filters = {"exclude_ids": saved_ids}
+    total = sum(count for _, _, count in centroids)
+    results = []
+    for cluster, vector, count in centroids:
+        for name in [WISHLIST_SEARCH_BACKEND] + (["pgvector"] if WISHLIST_SEARCH_BACKEND != "pgvector" else []):
+            try:
+                hits = get_backend(name).search(vector, filters, limit)
+                break
+            except Exception as e:
+                print(f"Wishlist search ({name}) failed: {e}")
+        else:
+            raise RuntimeError("No search backend available")
+        results.append((cluster, max(1, math.ceil(limit * count / total)), hits))
+
+    picked = {}
+    for cluster, share, hits in results:
+        for creator_id, similarity in [h for h in hits if h[0] not in picked][:share]:
+            picked[creator_id] = (similarity, cluster)
+    leftovers = sorted(
+        ((similarity, creator_id, cluster) for cluster, _, hits in results
+         for creator_id, similarity in hits if creator_id not in picked),
+        reverse=True,
+    )
+    for similarity, creator_id, cluster in leftovers:
+        if len(picked) >= limit:
+            break
+        picked.setdefault(creator_id, (similarity, cluster))
+
+    ranked = sorted(picked.items(), key=lambda item: -item[1][0])[:limit]
+    return [(creator_id, similarity, cluster) for creator_id, (similarity, cluster) in ranked]
+
+
+def recommend(cur, user_id):
+    """(hits, cached) — up to RECOMMENDATION_MAX [(creator_id, similarity, cluster)].
+
+    Reads the centroids as they are (re-fits happen on save / unsave). Writes
+    only the result cache, in the caller's transaction (the caller commits).
+    """
+    user_id = str(user_id)
+    state = get_state(cur, user_id)
+
+    cur.execute(
+        """
+        SELECT creator_ids::text[], similarities, clusters FROM brand_recommendation_cache
+        WHERE user_id = %s AND version = %s AND centroid_version = %s
+          AND computed_at > NOW() - make_interval(secs => %s)
+        """,
+        (user_id, state["version"], state["centroid_version"], RECOMMENDATION_TTL),
+    )
+    row = cur.fetchone()
+    if row:
+        return [(str(c), float(s), int(k)) for c, s, k in zip(*row)], True
+
+    centroids = get_centroids(cur, user_id)
+    if not centroids:
+        return [], False
+    cur.execute("SELECT creator_id FROM brand_wishlists WHERE user_id = %s", (user_id,))
+    saved_ids = [str(r[0]) for r in cur.fetchall()]
+    hits = _search_centroids(centroids, saved_ids, RECOMMENDATION_MAX)
+
+    cur.execute(
+        """
+        INSERT INTO brand_recommendation_cache
+            (user_id, version, centroid_version, creator_ids, similarities, clusters, computed_at)
+        VALUES (%s, %s, %s, %s::uuid[], %s::real[], %s::smallint[], NOW())
+        ON CONFLICT (user_id) DO UPDATE SET
+            version = EXCLUDED.version,
+            centroid_version = EXCLUDED.centroid_version,
+            creator_ids = EXCLUDED.creator_ids,
+            similarities = EXCLUDED.similarities,
+            clusters = EXCLUDED.clusters,
+            computed_at = NOW()
+        """,
+        (user_id, state["version"], state["centroid_version"],
+         [h[0] for h in hits], [h[1] for h in hits], [h[2] for h in hits]),
+    )
+    return hits, False
@@ -1,20 +1,44 @@
 """Video Analyzer Lambda — AI-powered video frame analysis.
 
-Supports two AI providers with automatic fallback:
+Supports two AI providers with automatic fallback (via shared.llm_providers):
   - "bedrock" : Amazon Bedrock Nova 2 Lite / Nova Lite (default)
   - "groq"    : Groq inference API with Llama 4 Scout vision (fallback)
+  - "stub"    : offline stub, no network calls
 
 Fallback chain: Bedrock (Nova 2 → Nova v1) → Groq
+
+Entry points:
+  - handler       : analyze frames already extracted to S3 by frame_extractor
+  - fused_handler : extract frames in memory and analyze them in one invocation
 """
 
 import os
 import json
-import base64
 import re
+from concurrent.futures import ThreadPoolExecutor
 import boto3
-import requests as http_requests
 from shared.db import get_db_connection
-from shared.bedrock_client import get_bedrock_client
+from shared.analysis_schema import (
+    ANALYSIS_SCHEMA,
+    ANALYSIS_TOOL_NAME,
+    VOCABULARY,
+    AnalysisValidationError,
+    analysis_rules_fingerprint,
+    validate_analysis,
+)
+from shared.analysis_cache import frames_hash, get_cached_analysis, prompt_hash, put_cached_analysis
+from shared.llm_providers import (
+    LLMChainError,
+    LLMRequest,
+    apply_output_guardrail,
+    bedrock_content,
+    build_chain,
+    complete_sync,
+    env_float,
+)
+from shared.metrics import emit_metric
+from shared.dedup import dedup_after_extract, dedup_before_extract
+from shared.frames import extract_frames, frame_key, mark_processing, probe_duration, resolve_video_source
 
 # --- Provider config ---
 AI_PROVIDER = os.environ.get("AI_PROVIDER", "bedrock")  # "bedrock" or "groq"
@@ -30,38 +54,84 @@ BEDROCK_MODEL_FALLBACKS = [
 # Groq config (OpenAI-compatible API)
 GROQ_API_KEY = os.environ.get("GROQ_API_KEY", "")
 GROQ_VISION_MODEL = os.environ.get("GROQ_VISION_MODEL", "meta-llama/llama-4-scout-17b-16e-instruct")
-GROQ_ENDPOINT = "https://api.groq.com/openai/v1/chat/completions"
 
-ANALYSIS_PROMPT = """You are an expert content analyst for social media creators. Analyze these 4 frames extracted from a single video (taken at 0%, 25%, 50%, and 75% through the video).
+# Guardrail strategy:
+#   "output" : ApplyGuardrail on the generated text only (default — one model call)
+#   "input"  : guardrailConfig on the multimodal converse call; an intervention
+#              re-sends every frame without it
+#   "off"    : no guardrail
+GUARDRAIL_MODE = os.environ.get("GUARDRAIL_MODE", "output")
+
+# Whole-chain deadline, and optional hedge delay before also trying the next provider
+ANALYSIS_DEADLINE = env_float("ANALYSIS_DEADLINE_SECONDS", 150)
+ANALYSIS_HEDGE_AFTER = env_float("ANALYSIS_HEDGE_AFTER_SECONDS")
+ANALYSIS_REPAIR_DEADLINE = env_float("ANALYSIS_REPAIR_DEADLINE_SECONDS", 30)
+
+# Background uploader for frames in fused extract+analyze mode
+_frame_upload_pool = ThreadPoolExecutor(max_workers=4)
+
+def _one_of(field, separator=", "):
+    return separator.join(f'"{value}"' for value in VOCABULARY[field])
+
+
+# Allowed labels come from VOCABULARY (the forced tool's enums), so the prompt
+# can't drift from the schema
+ANALYSIS_PROMPT = f"""You are an expert content analyst for social media creators. Analyze these 4 frames extracted from a single video (taken at 0%, 25%, 50%, and 75% through the video).
 
 Provide your analysis as a JSON object with exactly these fields:
 
-{
-  "energy_level": "<short label>",
-  "aesthetic": "<short label>",
-  "setting": "indoor" | "outdoor" | "studio" | "mixed",
-  "production_quality": "low" | "medium" | "high" | "professional",
-  "content_type": "<short label>",
+{{
+  "energy_level": {_one_of("energy_level", " | ")},
+  "aesthetic": "<one of the aesthetics below>",
+  "setting": {_one_of("setting", " | ")},
+  "production_quality": {_one_of("production_quality", " | ")},
+  "content_type": "<one of the content types below>",
   "topics": ["topic1", "topic2", ...],
   "dominant_colors": ["color1", "color2", "color3"],
   "text_on_screen": true | false,
   "face_visible": true | false,
   "summary": "A 1-2 sentence summary of the video content and style."
-}
+}}
 
 Rules:
-- energy_level: A short label describing the energy and pace of the video. Use your best judgement — e.g. "calm", "moderate", "high", "chaotic", "intense", "chill", "upbeat". Pick whatever single word or short phrase fits best.
-- aesthetic: A short label for the dominant visual style across all frames — e.g. "minimal", "vibrant", "dark", "pastel", "natural", "luxury", "streetwear", "corporate", "cozy", "editorial". Pick whatever fits best.
-- setting: Where the content was filmed — must be one of: "indoor", "outdoor", "studio", "mixed".
-- production_quality: Based on lighting, framing, and overall polish — must be one of: "low", "medium", "high", "professional".
-- content_type: A short label for what kind of content this is — e.g. "tutorial", "vlog", "review", "comedy", "trend", "lifestyle", "GRWM", "unboxing", "haul", "recipe", "fitness". Pick whatever fits best.
+- energy_level: The energy and pace of the video — must be one of: {_one_of("energy_level")}.
+- aesthetic: The dominant visual style across all frames — must be one of: {_one_of("aesthetic")}.
+- setting: Where the content was filmed — must be one of: {_one_of("setting")}.
+- production_quality: Based on lighting, framing, and overall polish — must be one of: {_one_of("production_quality")}.
+- content_type: What kind of content this is — must be one of: {_one_of("content_type")}.
 - topics: 2-5 relevant topic tags (e.g., "skincare", "travel", "cooking", "fashion haul").
 - dominant_colors: Top 3 colors visible across the frames.
 - text_on_screen: Whether any text overlays or captions are visible.
 - face_visible: Whether a human face is clearly visible in any frame.
-- summary: Brief, descriptive summary of the content and creator's style.
+- summary: Brief, descriptive summary of the content and creator's style."""
+
+# Canned answer for AI_PROVIDER=stub (offline runs)
+STUB_ANALYSIS_TEXT = json.dumps({
+    "energy_level": "moderate",
+    "aesthetic": "natural",
+    "setting": "indoor",
+    "production_quality": "medium",
+    "content_type": "vlog",
+    "topics": ["lifestyle"],
+    "dominant_colors": ["white", "beige", "black"],
+    "text_on_screen": False,
+    "face_visible": True,
+    "summary": "Offline stub analysis.",
+})
+
+# Text-only follow-up when the first answer fails validation (frames are not re-sent)
+REPAIR_PROMPT = """Your previous answer for a video analysis was not valid.
 
-Return ONLY the JSON object. No additional text, no markdown formatting, no code fences."""
+Previous answer:
+{previous}
+
+Problems:
+{problems}
+
+Return the corrected analysis as a JSON object with the same fields, fixing only the problems listed. Allowed values:
+{vocabulary}
+
+Return ONLY the JSON object."""
 
 
 def _clean_json_response(text):
@@ -72,195 +142,111 @@ def _clean_json_response(text):
     return text.strip()
 
 def _parse_analysis(raw_text):
-    """Parse JSON from model response with fallback extraction."""
-    analysis_template = {
-        "energy_level": "moderate",
-        "aesthetic": "natural",
-        "setting": "mixed",
-        "production_quality": "medium",
-        "content_type": "general",
-        "topics": [],
-        "dominant_colors": [],
-        "text_on_screen": False,
-        "face_visible": False,
-        "summary": "AI analysis was unable to process this video. This can happen if the content is too dark, blurry, or contains blocked material.",
-    }
+    """Parse and validate a model response into an analysis dict.
 
+    Free-form labels are normalized to the controlled vocabulary. Raises
+    AnalysisValidationError when the response can't be made valid — there is
+    no default template to fall back to.
+    """
     print(f"DEBUG: raw_text from model (truncated): {raw_text[:500]}")
-    cleaned_text = _clean_json_response(raw_text)
 
-    # Check for specific safety block message
     if "blocked by our content safety policy" in raw_text.lower():
-        print("DEBUG: Safety block detected in raw_text")
-        return analysis_template
+        raise AnalysisValidationError(["response was blocked by the content safety policy"], raw_text)
 
     try:
-        parsed = json.loads(cleaned_text)
-        return {**analysis_template, **parsed}
+        parsed = json.loads(_clean_json_response(raw_text))
     except json.JSONDecodeError as e:
-        print(f"DEBUG: JSON parsing failed: {e}. Trying regex fallback.")
-        json_match = re.search(r"\{[\s\S]*\}", raw_text)
-        if json_match:
-            try:
-                parsed = json.loads(json_match.group())
-                return {**analysis_template, **parsed}
-            except json.JSONDecodeError:
-                print("DEBUG: Regex JSON extraction also failed.")
-                pass
-
-    print("DEBUG: Falling back to default analysis template.")
-    return analysis_template
-
-
-def _analyze_with_bedrock(frame_data_list, video_id):
-    """Analyze frames using Amazon Bedrock with model fallback chain (Nova 2 → Nova v1)."""
-    bedrock = get_bedrock_client(region=BEDROCK_REGION)
-
-    content_blocks = []
-    for i, frame_bytes in enumerate(frame_data_list):
-        content_blocks.append({
-            "text": f"Frame {i + 1} (at {int(i * 25)}% of video):"
-        })
-        content_blocks.append({
-            "image": {
-                "format": "jpeg",
-                "source": {"bytes": frame_bytes},
-            }
-        })
-
-    content_blocks.append({"text": ANALYSIS_PROMPT})
-
-    guardrail_kwargs = {}
-    guardrail_id = os.environ.get("GUARDRAIL_ID")
-    guardrail_version = os.environ.get("GUARDRAIL_VERSION", "DRAFT")
-    bedrock_role_arn = os.environ.get("BEDROCK_ROLE_ARN")
+        raise AnalysisValidationError([f"response is not valid JSON ({e})"], raw_text)
 
-    # Skip guardrails for cross-account calls unless manually configured
-    # Local guardrail IDs won't work in the secondary account
-    if guardrail_id and not (bedrock_role_arn and bedrock_role_arn.strip()):
-        guardrail_kwargs["guardrailConfig"] = {
-            "guardrailIdentifier": guardrail_id,
-            "guardrailVersion": guardrail_version,
-        }
-    elif guardrail_id and bedrock_role_arn and bedrock_role_arn.strip():
-        print(f"Skipping local guardrail {guardrail_id} for cross-account role: {bedrock_role_arn}")
-
-    last_error = None
-    for model_id in BEDROCK_MODEL_FALLBACKS:
-        try:
-            print(f"Calling Bedrock Converse API with model {model_id} for video {video_id}")
-            print(f"DEBUG: guardrail_kwargs: {guardrail_kwargs}")
-            response = bedrock.converse(
-                modelId=model_id,
-                messages=[{"role": "user", "content": content_blocks}],
-                inferenceConfig={"maxTokens": 1024, "temperature": 0.1},
-                **guardrail_kwargs,
-            )
-
-            stop_reason = response.get("stopReason")
-            raw_text = response["output"]["message"]["content"][0]["text"]
-            print(f"Success with model {model_id}, response length: {len(raw_text)} chars, stop reason: {stop_reason}")
-            
-            # If guardrail intervened, retry without it to get the actual analysis
-            if stop_reason == "guardrail_intervened" and guardrail_kwargs:
-                print(f"Guardrail intercepted analysis for {model_id}, retrying without it.")
-                retry_response = bedrock.converse(
-                    modelId=model_id,
-                    messages=[{"role": "user", "content": content_blocks}],
-                    inferenceConfig={"maxTokens": 1024, "temperature": 0.1},
-                )
-                raw_text = retry_response["output"]["message"]["content"][0]["text"]
-                print(f"Success with model {model_id} after bypassing guardrail.")
-
-            return raw_text
-
-        except Exception as e:
-            # If guardrail is the problem, retry without it
-            if "guardrail" in str(e).lower() and guardrail_kwargs:
-                print(f"Guardrail error with {model_id}, retrying without guardrail: {e}")
-                try:
-                    response = bedrock.converse(
-                        modelId=model_id,
-                        messages=[{"role": "user", "content": content_blocks}],
-                        inferenceConfig={"maxTokens": 1024, "temperature": 0.1},
-                    )
-                    raw_text = response["output"]["message"]["content"][0]["text"]
-                    print(f"Success with model {model_id} (no guardrail), response length: {len(raw_text)} chars")
-                    return raw_text
-                except Exception as e2:
-                    last_error = e2
-                    print(f"Bedrock model {model_id} also failed without guardrail: {e2}")
-                    continue
-            last_error = e
-            print(f"Bedrock model {model_id} failed for video {video_id}: {e}")
-            continue
-
-    raise RuntimeError(f"All Bedrock models failed for video {video_id}: {last_error}")
-
-
-def _analyze_with_groq(frame_data_list, video_id):
-    """Analyze frames using Groq API with Llama 4 Scout vision model."""
-    # Build OpenAI-compatible content blocks with base64 images
-    content_blocks = []
-    for i, frame_bytes in enumerate(frame_data_list):
-        content_blocks.append({
-            "type": "text",
-            "text": f"Frame {i + 1} (at {int(i * 25)}% of video):",
-        })
-        b64_data = base64.b64encode(frame_bytes).decode("utf-8")
-        content_blocks.append({
-            "type": "image_url",
-            "image_url": {
-                "url": f"data:image/jpeg;base64,{b64_data}",
-            },
-        })
-
-    content_blocks.append({"type": "text", "text": ANALYSIS_PROMPT})
-
-    print(f"Calling Groq API with model {GROQ_VISION_MODEL} for video {video_id}")
-    resp = http_requests.post(
-        GROQ_ENDPOINT,
-        headers={
-            "Authorization": f"Bearer {GROQ_API_KEY}",
-            "Content-Type": "application/json",
-        },
-        json={
-            "model": GROQ_VISION_MODEL,
-            "max_tokens": 1024,
-            "temperature": 0.1,
-            "messages": [{"role": "user", "content": content_blocks}],
-        },
-        timeout=60,
-    )
+    analysis, errors = validate_analysis(parsed)
+    if errors:
+        raise AnalysisValidationError(errors, raw_text)
+    return analysis
 
-    if not resp.ok:
-        raise RuntimeError(f"Groq API error: {resp.status_code} {resp.text[:500]}")
 
-    raw_text = resp.json()["choices"][0]["message"]["content"]
-    print(f"Groq response length: {len(raw_text)} chars")
-    return raw_text
+def _build_prompt_parts(images):
+    """Provider-neutral prompt: a label + image per frame, then the analysis prompt."""
+    parts = []
+    for i, image in enumerate(images):
+        parts.append({"text": f"Frame {i + 1} (at {int(i * 25)}% of video):"})
+        parts.append({"image": image})
+    parts.append({"text": ANALYSIS_PROMPT})
+    return parts
 
 
-def handler(event, context):
-    """Analyze video frames using AI with automatic fallback.
+def _build_bedrock_content(image_sources):
+    """Converse content blocks for the analysis prompt.
 
-    Fallback chain: Bedrock (Nova 2 → v1) → Groq
+    image_sources may be raw frame bytes or Converse image sources such as
+    {"s3Location": {"uri": ...}} for batch inference records (see scripts/backfill_analysis.py).
+    """
+    return bedrock_content(_build_prompt_parts(image_sources))
 
-    Receives:
-        { video_id, creator_id, frame_keys, duration_seconds }
 
-    Returns:
-        { video_id, creator_id, analysis: {...} }
+def _guardrail_config():
+    """Bedrock guardrail config from the environment, or None when unset."""
+    guardrail_id = os.environ.get("GUARDRAIL_ID")
+    if not guardrail_id:
+        return None
+    return {
+        "guardrailIdentifier": guardrail_id,
+        "guardrailVersion": os.environ.get("GUARDRAIL_VERSION", "DRAFT"),
+    }
+
+
+def _input_guardrail_config():
+    """Guardrail config for GUARDRAIL_MODE=input (attached to the converse call)."""
+    guardrail_config = _guardrail_config()
+    bedrock_role_arn = os.environ.get("BEDROCK_ROLE_ARN")
+
+    # Skip guardrails for cross-account calls unless manually configured
+    # Local guardrail IDs won't work in the secondary account
+    if guardrail_config and bedrock_role_arn and bedrock_role_arn.strip():
+        print(f"Skipping local guardrail {guardrail_config['guardrailIdentifier']} for cross-account role: {bedrock_role_arn}")
+        return None
+    return guardrail_config
+
+
+def _check_output_guardrail(raw_text, video_id):
+    """GUARDRAIL_MODE=output: run ApplyGuardrail on the model's text only.
+
+    The analysis is kept either way (input mode bypasses interventions too);
+    the returned path records what happened for review.
     """
-    video_id = event["video_id"]
-    creator_id = event["creator_id"]
-    frame_keys = event["frame_keys"]
-    duration_seconds = event.get("duration_seconds")
+    guardrail_config = _guardrail_config()
+    if not guardrail_config:
+        return "off"
+    try:
+        action, _ = apply_output_guardrail(
+            raw_text, guardrail_config, region=os.environ.get("AWS_REGION", BEDROCK_REGION)
+        )
+    except Exception as e:
+        print(f"Output guardrail check failed for video {video_id}: {e}")
+        return "output_error"
+    if action == "GUARDRAIL_INTERVENED":
+        print(f"Output guardrail intervened for video {video_id}")
+        return "output_intervened"
+    return "output"
+
+
+def _provider_chain():
+    """Fallback chain: Bedrock (Nova 2 → v1) → Groq (see shared.llm_providers)."""
+    return build_chain(
+        AI_PROVIDER,
+        bedrock_models=BEDROCK_MODEL_FALLBACKS,
+        bedrock_region=BEDROCK_REGION,
+        groq_model=GROQ_VISION_MODEL,
+        groq_api_key=GROQ_API_KEY,
+        groq_timeout=60,
+        stub_text=STUB_ANALYSIS_TEXT,
+    )
 
+
+def _download_frames(frame_keys):
+    """Download stored frames from the frames bucket."""
     frames_bucket = os.environ["FRAMES_BUCKET"]
     s3 = boto3.client("s3")
 
-    # Download all frames from S3
     frame_data_list = []
     print(f"DEBUG: Downloading {len(frame_keys)} frames from bucket {frames_bucket}")
     for frame_key in frame_keys:
@@ -268,47 +254,113 @@ def handler(event, context):
         data = response["Body"].read()
         print(f"DEBUG: Frame {frame_key} size: {len(data)} bytes")
         frame_data_list.append(data)
+    return frame_data_list
 
-    # Route to AI provider with automatic fallback
-    raw_text = None
-    bedrock_error = None
 
-    # Check caller identity for debugging accounts
-    try:
-        sts_local = boto3.client("sts")
-        identity = sts_local.get_caller_identity()
-        print(f"DEBUG: Lambda is running as identity: {identity.get('Arn')} in account {identity.get('Account')}")
-    except Exception as e:
-        print(f"DEBUG: Could not get caller identity: {e}")
-
-    # Try Bedrock first (unless explicitly set to groq-only)
-    if AI_PROVIDER != "groq":
-        try:
-            raw_text = _analyze_with_bedrock(frame_data_list, video_id)
-        except Exception as e:
-            bedrock_error = str(e)
-            print(f"Bedrock failed entirely for video {video_id}: {e}, trying Groq fallback")
-
-    # Try Groq as fallback (or primary if AI_PROVIDER=groq)
-    if raw_text is None and GROQ_API_KEY:
-        try:
-            print(f"DEBUG: Attempting Groq fallback for video {video_id}")
-            raw_text = _analyze_with_groq(frame_data_list, video_id)
-        except Exception as e:
-            print(f"Groq also failed for video {video_id}: {e}")
-            raise RuntimeError(f"All AI providers failed. Bedrock error: {bedrock_error}. Groq error: {e}")
-
-    if raw_text is None:
+def _run_analysis(frame_data_list, video_id):
+    """Route frames to the AI providers with automatic fallback.
+
+    Fallback chain: Bedrock (Nova 2 → v1) → Groq
+
+    Returns (raw_text, model_id, guardrail_path).
+    """
+    chain = _provider_chain()
+    if not chain:
         error_msg = f"No AI provider available for video {video_id}."
-        if bedrock_error:
-            error_msg += f" Last Bedrock error: {bedrock_error}"
         if not GROQ_API_KEY:
             error_msg += " (Groq fallback not configured: missing API key)"
         raise RuntimeError(error_msg)
 
-    analysis = _parse_analysis(raw_text)
+    request = LLMRequest(
+        _build_prompt_parts(frame_data_list),
+        max_tokens=1024,
+        temperature=0.1,
+        guardrail_config=_input_guardrail_config() if GUARDRAIL_MODE == "input" else None,
+        # If the guardrail intervenes, retry without it to get the actual analysis
+        bypass_guardrail_on_intervention=True,
+        json_schema=ANALYSIS_SCHEMA,
+        tool_name=ANALYSIS_TOOL_NAME,
+    )
+    print(f"Analyzing video {video_id} with chain: {[p.model_id for p in chain]}")
+    try:
+        result = complete_sync(request, chain, deadline=ANALYSIS_DEADLINE, hedge_after=ANALYSIS_HEDGE_AFTER)
+    except LLMChainError as e:
+        raise RuntimeError(f"All AI providers failed for video {video_id}: {e}")
+
+    guardrail_path = result.guardrail_path or "off"
+    if GUARDRAIL_MODE == "output":
+        guardrail_path = _check_output_guardrail(result.text, video_id)
+
+    print(f"Analysis for video {video_id} by {result.provider}/{result.model_id}, "
+          f"response length: {len(result.text)} chars, guardrail path: {guardrail_path}")
+    emit_metric("GuardrailPath", dimensions={"Path": guardrail_path})
+    return result.text, result.model_id, guardrail_path
+
+
+def _repair_analysis(previous_text, errors, video_id):
+    """One bounded, text-only repair call for an answer that failed validation.
 
-    # Insert into video_analyses table
+    Returns the repaired raw text (validated by the caller).
+    """
+    vocabulary = "\n".join(f"- {field}: {', '.join(values)}" for field, values in VOCABULARY.items())
+    request = LLMRequest(
+        [{"text": REPAIR_PROMPT.format(
+            previous=previous_text[:4000],
+            problems="\n".join(f"- {error}" for error in errors),
+            vocabulary=vocabulary,
+        )}],
+        max_tokens=1024,
+        temperature=0.0,
+        json_schema=ANALYSIS_SCHEMA,
+        tool_name=ANALYSIS_TOOL_NAME,
+    )
+    try:
+        result = complete_sync(request, _provider_chain(), deadline=ANALYSIS_REPAIR_DEADLINE)
+    except LLMChainError as e:
+        raise AnalysisValidationError(errors + [f"repair call failed: {e}"], previous_text)
+    print(f"Repaired analysis for video {video_id} with {result.provider}/{result.model_id}")
+    return result.text
+
+
+def _provider_model_chain():
+    """Model ids that _run_analysis may answer with, in preference order."""
+    return [provider.model_id for provider in _provider_chain()]
+
+
+def _analyze_frames(frame_data_list, video_id):
+    """Return (analysis, guardrail_path) for these frames, from the analysis cache if
+    the same frames were already analyzed with the current prompt, schema and label
+    rules and an available model.
+    """
+    frame_digest = frames_hash(frame_data_list)
+    prompt_digest = prompt_hash(ANALYSIS_PROMPT, analysis_rules_fingerprint())
+
+    cached = get_cached_analysis(frame_digest, prompt_digest, _provider_model_chain())
+    if cached:
+        analysis, model_id = cached
+        print(f"Analysis cache hit for video {video_id} (model {model_id})")
+        return analysis, "cached"
+
+    raw_text, model_id, guardrail_path = _run_analysis(frame_data_list, video_id)
+    try:
+        analysis = _parse_analysis(raw_text)
+    except AnalysisValidationError as e:
+        print(f"Analysis for video {video_id} failed validation: {e}; attempting repair")
+        emit_metric("AnalysisRepair")
+        raw_text = _repair_analysis(raw_text, e.errors, video_id)
+        # Still invalid → AnalysisValidationError fails the task (no retries, no junk row)
+        analysis = _parse_analysis(raw_text)
+
+    # Only validated analyses are cached
+    put_cached_analysis(frame_digest, prompt_digest, model_id, raw_text, analysis)
+    return analysis, guardrail_path
+
+
+def _store_analysis(video_id, creator_id, analysis, guardrail_path=None):
+    """Upsert a parsed analysis into the video_analyses table.
+
+    guardrail_path records how the guardrail was applied (see GUARDRAIL_MODE).
+    """
     conn = get_db_connection()
     cur = conn.cursor()
     cur.execute(
@@ -316,9 +368,9 @@ def handler(event, context):
         INSERT INTO video_analyses (
             video_id, creator_id, energy_level, aesthetic, setting,
             production_quality, content_type, topics, dominant_colors,
-            has_text_overlay, face_visible, summary
+            has_text_overlay, face_visible, summary, guardrail_path
         )
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         ON CONFLICT (video_id) DO UPDATE SET
             energy_level = EXCLUDED.energy_level,
             aesthetic = EXCLUDED.aesthetic,
@@ -330,6 +382,7 @@ def handler(event, context):
             has_text_overlay = EXCLUDED.has_text_overlay,
             face_visible = EXCLUDED.face_visible,
             summary = EXCLUDED.summary,
+            guardrail_path = EXCLUDED.guardrail_path,
             analyzed_at = NOW()
         """,
         (
@@ -345,12 +398,105 @@ def handler(event, context):
             analysis.get("text_on_screen", False),
             analysis.get("face_visible", False),
             analysis.get("summary", ""),
+            guardrail_path,
         ),
     )
     conn.commit()
 
+
+def handler(event, context):
+    """Analyze video frames using AI with automatic fallback.
+
+    Fallback chain: Bedrock (Nova 2 → v1) → Groq
+
+    Receives:
+        { video_id, creator_id, frame_keys, duration_seconds }
+
+    Returns:
+        { video_id, creator_id, analysis: {...} }
+    """
+    video_id = event["video_id"]
+    creator_id = event["creator_id"]
+    frame_keys = event["frame_keys"]
+
+    # Download all frames from S3
+    frame_data_list = _download_frames(frame_keys)
+
+    analysis, guardrail_path = _analyze_frames(frame_data_list, video_id)
+    _store_analysis(video_id, creator_id, analysis, guardrail_path)
+
+    return {
+        "video_id": video_id,
+        "creator_id": creator_id,
+        "analysis": analysis,
+    }
+
+
+def fused_handler(event, context):
+    """Extract frames and analyze them in a single invocation (fused pipeline mode).
+
+    Frames stay in memory and go straight to the model; they are written to the
+    frames bucket in the background (mediakit_data uses frame_0 as thumbnail)
+    while the model call is in flight.
+
+    Accepts the same input as frame_extractor (EventBridge or direct).
+
+    Returns:
+        { video_id, creator_id, frame_keys, duration_seconds, analysis: {...}, dedup_hit }
+    """
+    source_bucket, s3_key, video_id, creator_id = resolve_video_source(event)
+    print(f"Fused extract+analyze: bucket={source_bucket}, key={s3_key}")
+
+    frames_bucket = os.environ["FRAMES_BUCKET"]
+    s3 = boto3.client("s3")
+
+    # Re-upload of an already-analyzed clip? Copy its results and skip analysis
+    duplicate = dedup_before_extract(s3, source_bucket, s3_key, video_id, creator_id, frames_bucket)
+    if duplicate:
+        return {"video_id": video_id, "creator_id": creator_id, **duplicate, "dedup_hit": True}
+
+    local_video = f"/tmp/{video_id}.mp4"
+    s3.download_file(source_bucket, s3_key, local_video)
+
+    try:
+        duration_seconds = probe_duration(local_video)
+        print(f"Video duration: {duration_seconds:.2f}s")
+        frame_data_list = extract_frames(local_video, duration_seconds)
+    finally:
+        if os.path.exists(local_video):
+            os.remove(local_video)
+
+    # Persist frames asynchronously — they are only needed for thumbnails
+    frame_keys = [frame_key(creator_id, video_id, i) for i in range(len(frame_data_list))]
+    uploads = [
+        _frame_upload_pool.submit(
+            s3.put_object,
+            Bucket=frames_bucket,
+            Key=key,
+            Body=frame_bytes,
+            ContentType="image/jpeg",
+        )
+        for key, frame_bytes in zip(frame_keys, frame_data_list)
+    ]
+
+    mark_processing(video_id, s3_key, duration_seconds)
+
+    duplicate = dedup_after_extract(s3, frame_data_list, video_id, creator_id, frames_bucket)
+    if duplicate:
+        analysis = duplicate["analysis"]
+    else:
+        analysis, guardrail_path = _analyze_frames(frame_data_list, video_id)
+        _store_analysis(video_id, creator_id, analysis, guardrail_path)
+
+    # The container may be frozen after return, so make sure the frames landed
+    for upload in uploads:
+        upload.result()
+
     return {
         "video_id": video_id,
         "creator_id": creator_id,
+        "frame_keys": frame_keys,
+        "duration_seconds": round(duration_seconds, 2),
         "analysis": analysis,
+        "dedup_hit": duplicate is not None,
     }
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Re-analyze existing videos with Amazon Bedrock Batch Inference.
+
+When ANALYSIS_PROMPT or the model changes, every video needs re-analysis.
+Pushing each one through the real-time converse path in video_analyzer is
+expensive and competes with live uploads for on-demand quota. This tool builds
+a batch-inference JSONL (frames referenced by S3 URI, never inlined), submits
+the job, and ingests the results through the same _parse_analysis and
+_store_analysis code the video_analyzer Lambda uses.
+
+Usage:
+    python scripts/backfill_analysis.py build  --out batch_input.jsonl [--creator-id ID] [--limit N]
+    python scripts/backfill_analysis.py submit --input s3://bucket/backfill/input.jsonl \\
+                                               --output s3://bucket/backfill/output/ --role-arn ARN
+    python scripts/backfill_analysis.py status --job-arn ARN
+    python scripts/backfill_analysis.py ingest --output s3://bucket/backfill/output/ [--dry-run]
+
+Offline (no Bedrock, no S3): pass --local to submit/status and use local paths.
+The local stand-in "runs" the job immediately and writes stub model output in
+the same record format Bedrock produces:
+    python scripts/backfill_analysis.py build  --out /tmp/bf/input.jsonl --frames-bucket demo
+    python scripts/backfill_analysis.py submit --local --input /tmp/bf/input.jsonl --output /tmp/bf/out/
+    python scripts/backfill_analysis.py ingest --output /tmp/bf/out/ --dry-run
+
+Requires:
+    DB_HOST, DB_NAME, DB_SECRET_ARN (as for the Lambdas) for build and ingest
+    FRAMES_BUCKET (or --frames-bucket) for build
+
+Note: Bedrock batch jobs require at least 100 records per job.
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+
+LAMBDAS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lambdas")
+sys.path.insert(0, os.path.join(LAMBDAS_DIR, "video_analyzer"))
+sys.path.insert(0, LAMBDAS_DIR)
+
+import handler as analyzer  # noqa: E402  (video_analyzer/handler.py)
+from shared.analysis_schema import ANALYSIS_SCHEMA, ANALYSIS_TOOL_NAME, AnalysisValidationError  # noqa: E402
+from shared.db import get_db_connection  # noqa: E402
+from shared.frames import FRAME_POSITIONS, frame_key  # noqa: E402
+from shared.llm_providers import bedrock_tool_config, converse_text  # noqa: E402
+
+MIN_BATCH_RECORDS = 100
+
+
+# =============================================================================
+# Local stand-in for the Bedrock batch API
+# =============================================================================
+
+class LocalBatchClient:
+    """Offline stand-in for the `bedrock` control-plane batch API.
+
+    Mirrors create_model_invocation_job / get_model_invocation_job, but reads the
+    input JSONL from a local path and writes `<input name>.out` into the output
+    directory right away. Model output is a deterministic stub analysis per record.
+    """
+
+    def __init__(self):
+        self._jobs = {}
+
+    def create_model_invocation_job(self, jobName, roleArn, modelId, inputDataConfig, outputDataConfig, **kwargs):
+        input_path = inputDataConfig["s3InputDataConfig"]["s3Uri"]
+        output_dir = outputDataConfig["s3OutputDataConfig"]["s3Uri"]
+        os.makedirs(output_dir, exist_ok=True)
+        output_path = os.path.join(output_dir, os.path.basename(input_path) + ".out")
+
+        with open(input_path) as src, open(output_path, "w") as dst:
+            for line in src:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                record["modelOutput"] = self._stub_output(record["recordId"])
+                dst.write(json.dumps(record) + "\n")
+
+        job_arn = f"local:model-invocation-job/{jobName}"
+        self._jobs[job_arn] = {"jobArn": job_arn, "jobName": jobName, "modelId": modelId, "status": "Completed"}
+        return {"jobArn": job_arn}
+
+    def get_model_invocation_job(self, jobIdentifier):
+        return self._jobs.get(jobIdentifier, {"jobArn": jobIdentifier, "status": "Completed"})
+
+    @staticmethod
+    def _stub_output(record_id):
+        analysis = {
+            "energy_level": "moderate",
+            "aesthetic": "natural",
+            "setting": "indoor",
+            "production_quality": "medium",
+            "content_type": "vlog",
+            "topics": ["lifestyle"],
+            "dominant_colors": ["white", "beige", "black"],
+            "text_on_screen": False,
+            "face_visible": True,
+            "summary": f"Stub analysis for record {record_id}.",
+        }
+        return {
+            "output": {"message": {"role": "assistant", "content": [{
+                "toolUse": {"toolUseId": f"local-{record_id}", "name": ANALYSIS_TOOL_NAME, "input": analysis},
+            }]}},
+            "stopReason": "tool_use",
+        }
+
+
+def _get_batch_client(local):
+    if local:
+        return LocalBatchClient()
+    import boto3
+    return boto3.client("bedrock", region_name=analyzer.BEDROCK_REGION)
+
+
+# =============================================================================
+# Build
+# =============================================================================
+
+def build_records(frames_bucket, creator_id=None, limit=None):
+    """Yield one batch-inference record per analyzed video."""
+    conn = get_db_connection()
+    cur = conn.cursor()
+    sql = """
+        SELECT va.video_id, va.creator_id
+        FROM video_analyses va
+        JOIN video_uploads vu ON va.video_id = vu.id
+        WHERE vu.status = 'completed'
+    """
+    params = []
+    if creator_id:
+        sql += " AND va.creator_id = %s"
+        params.append(creator_id)
+    sql += " ORDER BY va.analyzed_at"
+    if limit:
+        sql += " LIMIT %s"
+        params.append(limit)
+    cur.execute(sql, params)
+
+    for video_id, row_creator_id in cur.fetchall():
+        image_sources = [
+            {"s3Location": {"uri": f"s3://{frames_bucket}/{frame_key(row_creator_id, video_id, i)}"}}
+            for i in range(len(FRAME_POSITIONS))
+        ]
+        yield {
+            "recordId": str(video_id),
+            # Batch jobs take the model's native InvokeModel body, not Converse:
+            # Nova's messages-v1 names the limit max_new_tokens
+            "modelInput": {
+                "schemaVersion": "messages-v1",
+                "messages": [{"role": "user", "content": analyzer._build_bedrock_content(image_sources)}],
+                "inferenceConfig": {"max_new_tokens": 1024, "temperature": 0.1},
+                "toolConfig": bedrock_tool_config(ANALYSIS_SCHEMA, ANALYSIS_TOOL_NAME),
+            },
+        }
+
+
+def cmd_build(args):
+    frames_bucket = args.frames_bucket or os.environ.get("FRAMES_BUCKET")
+    if not frames_bucket:
+        print("Error: --frames-bucket or FRAMES_BUCKET is required")
+        sys.exit(1)
+
+    out_dir = os.path.dirname(os.path.abspath(args.out))
+    os.makedirs(out_dir, exist_ok=True)
+    count = 0
+    with open(args.out, "w") as f:
+        for record in build_records(frames_bucket, args.creator_id, args.limit):
+            f.write(json.dumps(record) + "\n")
+            count += 1
+
+    print(f"Wrote {count} records to {args.out}")
+    if count < MIN_BATCH_RECORDS:
+        print(f"Warning: Bedrock batch jobs need at least {MIN_BATCH_RECORDS} records; "
+              f"use the real-time pipeline for small re-analyses.")
+
+
+# =============================================================================
+# Submit / status
+# =============================================================================
+
+def cmd_submit(args):
+    if not args.local and not (args.input.startswith("s3://") and args.output.startswith("s3://")):
+        print("Error: --input and --output must be s3:// URIs when not using --local")
+        sys.exit(1)
+
+    client = _get_batch_client(args.local)
+    job_name = args.job_name or f"reachezy-reanalysis-{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+    resp = client.create_model_invocation_job(
+        jobName=job_name,
+        roleArn=args.role_arn or "local",
+        modelId=args.model_id or analyzer.BEDROCK_MODEL_ID,
+        inputDataConfig={"s3InputDataConfig": {"s3Uri": args.input}},
+        outputDataConfig={"s3OutputDataConfig": {"s3Uri": args.output}},
+    )
+    print(f"Submitted batch job: {resp['jobArn']}")
+
+
+def cmd_status(args):
+    client = _get_batch_client(args.local)
+    job = client.get_model_invocation_job(jobIdentifier=args.job_arn)
+    print(json.dumps({k: str(v) for k, v in job.items()}, indent=2))
+
+
+# =============================================================================
+# Ingest
+# =============================================================================
+
+def _iter_output_lines(output):
+    """Yield lines from every *.jsonl.out file under a local dir or s3:// prefix."""
+    if output.startswith("s3://"):
+        import boto3
+        bucket, _, prefix = output[5:].partition("/")
+        s3 = boto3.client("s3")
+        paginator = s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                if not obj["Key"].endswith(".jsonl.out"):
+                    continue
+                body = s3.get_object(Bucket=bucket, Key=obj["Key"])["Body"]
+                for line in body.iter_lines():
+                    yield line.decode("utf-8")
+    else:
+        for root, _, files in os.walk(output):
+            for name in sorted(files):
+                if name.endswith(".jsonl.out"):
+                    with open(os.path.join(root, name)) as f:
+                        yield from f
+
+
+def _lookup_creator_id(video_id):
+    cur = get_db_connection().cursor()
+    cur.execute("SELECT creator_id FROM video_uploads WHERE id = %s", (video_id,))
+    row = cur.fetchone()
+    return str(row[0]) if row else None
+
+
+def cmd_ingest(args):
+    stored = failed = skipped = 0
+    for line in _iter_output_lines(args.output):
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        video_id = record.get("recordId")
+
+        if record.get("error") or not record.get("modelOutput"):
+            print(f"  FAIL {video_id}: {record.get('error', 'no modelOutput')}")
+            failed += 1
+            continue
+
+        try:
+            analysis = analyzer._parse_analysis(converse_text(record["modelOutput"]))
+        except AnalysisValidationError as e:
+            print(f"  FAIL {video_id}: {e}")
+            failed += 1
+            continue
+
+        if args.dry_run:
+            print(f"  {video_id}: {json.dumps(analysis)[:200]}")
+            stored += 1
+            continue
+
+        creator_id = _lookup_creator_id(video_id)
+        if not creator_id:
+            print(f"  SKIP {video_id}: video no longer exists")
+            skipped += 1
+            continue
+
+        analyzer._store_analysis(video_id, creator_id, analysis, guardrail_path="batch")
+        stored += 1
+
+    verb = "Parsed" if args.dry_run else "Stored"
+    print(f"{verb} {stored} analyses ({failed} failed, {skipped} skipped)")
+    if stored and not args.dry_run:
+        print("Re-run embedding_generator / profile_aggregator for affected creators to refresh search.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bedrock batch-inference backfill for video analyses")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_build = sub.add_parser("build", help="Build batch-inference JSONL from analyzed videos")
+    p_build.add_argument("--out", required=True)
+    p_build.add_argument("--frames-bucket")
+    p_build.add_argument("--creator-id")
+    p_build.add_argument("--limit", type=int)
+    p_build.set_defaults(func=cmd_build)
+
+    p_submit = sub.add_parser("submit", help="Submit a batch-inference job")
+    p_submit.add_argument("--input", required=True)
+    p_submit.add_argument("--output", required=True)
+    p_submit.add_argument("--role-arn")
+    p_submit.add_argument("--model-id")
+    p_submit.add_argument("--job-name")
+    p_submit.add_argument("--local", action="store_true", help="Use the offline stand-in")
+    p_submit.set_defaults(func=cmd_submit)
+
+    p_status = sub.add_parser("status", help="Show batch job status")
+    p_status.add_argument("--job-arn", required=True)
+    p_status.add_argument("--local", action="store_true")
+    p_status.set_defaults(func=cmd_status)
+
+    p_ingest = sub.add_parser("ingest", help="Parse batch output and upsert video_analyses")
+    p_ingest.add_argument("--output", required=True)
+    p_ingest.add_argument("--dry-run", action="store_true")
+    p_ingest.set_defaults(func=cmd_ingest)
+
+    args = parser.parse_args()
+    if args.command == "submit" and not args.local and not args.role_arn:
+        parser.error("--role-arn is required unless --local is set")
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
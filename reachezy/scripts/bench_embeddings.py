@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for shared/embeddings.py against a local Titan stub.
+
+Compares the old one-call-per-text loop with embed_texts() (content-hash dedupe
++ bounded concurrent invoke_model) at several pool sizes. The stub sleeps for
+--latency-ms per call to stand in for a Titan round trip; no AWS or database
+access is needed (the embedding store lookup is disabled).
+
+Usage:
+    python scripts/bench_embeddings.py [--texts 500] [--duplicate-rate 0.3]
+                                       [--latency-ms 80] [--workers 1,4,8,16]
+"""
+
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+LAMBDAS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lambdas")
+sys.path.insert(0, LAMBDAS_DIR)
+
+from shared import embeddings  # noqa: E402
+
+
+class StubTitan:
+    """invoke_bedrock stand-in: fixed latency, deterministic 1024-d output."""
+
+    def __init__(self, latency_ms):
+        self.latency = latency_ms / 1000.0
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def invoke_bedrock(self, operation, model_id, region="us-east-1", max_retries=None, **kwargs):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.latency)
+        text = json.loads(kwargs["body"])["inputText"]
+        rng = random.Random(text)
+        vector = [rng.uniform(-1, 1) for _ in range(embeddings.EMBEDDING_DIM)]
+        return {"body": io.BytesIO(json.dumps({"embedding": vector}).encode("utf-8"))}
+
+
+def make_texts(count, duplicate_rate, seed):
+    rng = random.Random(seed)
+    texts = []
+    for i in range(count):
+        if texts and rng.random() < duplicate_rate:
+            texts.append(rng.choice(texts))
+        else:
+            texts.append(f"Energy: high. Aesthetic: vibrant. Topics: topic-{i}. Summary: video {i}")
+    return texts
+
+
+def run(label, fn, stub, count):
+    stub.calls = 0
+    start = time.perf_counter()
+    fn()
+    elapsed = time.perf_counter() - start
+    print(f"{label:28}{stub.calls:>8}{elapsed:>10.2f}s{count / elapsed:>12.1f}/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark batched embedding generation against a stub")
+    parser.add_argument("--texts", type=int, default=500)
+    parser.add_argument("--duplicate-rate", type=float, default=0.3)
+    parser.add_argument("--latency-ms", type=float, default=80)
+    parser.add_argument("--workers", default="1,4,8,16")
+    parser.add_argument("--seed", type=int, default=11)
+    args = parser.parse_args()
+
+    stub = StubTitan(args.latency_ms)
+    embeddings.invoke_bedrock = stub.invoke_bedrock
+    embeddings.emit_metric = lambda *a, **k: None
+
+    texts = make_texts(args.texts, args.duplicate_rate, args.seed)
+    print(f"\n{len(texts)} texts ({len(set(texts))} unique), stub latency {args.latency_ms:.0f}ms/call\n")
+    print(f"{'mode':28}{'calls':>8}{'time':>11}{'throughput':>13}")
+
+    run("sequential (before)", lambda: [embeddings.titan_embedding(t) for t in texts], stub, len(texts))
+    for workers in [int(w) for w in args.workers.split(",")]:
+        embeddings._embed_pool = ThreadPoolExecutor(max_workers=workers)
+        run(f"embed_texts, {workers} workers",
+            lambda: embeddings.embed_texts(texts, use_store=False), stub, len(texts))
+
+
+if __name__ == "__main__":
+    main()
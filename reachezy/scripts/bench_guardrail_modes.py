@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Compare GUARDRAIL_MODE=input vs GUARDRAIL_MODE=output for video analysis
+against a stubbed Bedrock (no AWS calls, nothing is billed).
+
+The stub counts input tokens per converse call and models latency from them;
+fixture videos flagged as "unsafe" make the input guardrail intervene, which in
+input mode re-sends the full multimodal request without the guardrail. Output
+mode makes one converse call and runs ApplyGuardrail on the text only.
+
+Usage:
+    python scripts/bench_guardrail_modes.py [--videos 200] [--intervention-rate 0.15]
+                                            [--image-tokens 1300] [--seed 7]
+
+Token and latency figures are modeled, not measured: tune --image-tokens and
+the latency constants below to match CloudWatch numbers for your model.
+"""
+
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+
+LAMBDAS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lambdas")
+sys.path.insert(0, os.path.join(LAMBDAS_DIR, "video_analyzer"))
+sys.path.insert(0, LAMBDAS_DIR)
+
+import handler as analyzer  # noqa: E402  (video_analyzer/handler.py)
+from shared import llm_providers  # noqa: E402
+
+# Latency model (milliseconds)
+CONVERSE_BASE_MS = 400
+CONVERSE_MS_PER_INPUT_TOKEN = 0.25
+CONVERSE_MS_PER_OUTPUT_TOKEN = 20
+INPUT_GUARDRAIL_BASE_MS = 120
+INPUT_GUARDRAIL_MS_PER_TOKEN = 0.05
+APPLY_GUARDRAIL_BASE_MS = 80
+OUTPUT_TOKENS = 180
+
+GUARDRAIL_CONFIG = {"guardrailIdentifier": "bench-guardrail", "guardrailVersion": "DRAFT"}
+
+STUB_ANALYSIS = json.dumps({
+    "energy_level": "upbeat",
+    "aesthetic": "vibrant",
+    "setting": "indoor",
+    "production_quality": "high",
+    "content_type": "tutorial",
+    "topics": ["skincare", "routine"],
+    "dominant_colors": ["pink", "white", "gold"],
+    "text_on_screen": True,
+    "face_visible": True,
+    "summary": "A bright skincare routine filmed at a vanity.",
+})
+
+
+class StubBedrock:
+    """Counts tokens and modeled latency for converse / ApplyGuardrail calls."""
+
+    def __init__(self, image_tokens):
+        self.image_tokens = image_tokens
+        self.flagged = False
+        self.reset()
+
+    def reset(self):
+        self.converse_calls = 0
+        self.input_tokens = 0
+        self.guardrail_text_chars = 0
+        self.latency_ms = 0.0
+
+    def invoke_bedrock(self, operation, model_id, region="us-east-1", max_retries=None, **kwargs):
+        content = kwargs["messages"][0]["content"]
+        tokens = sum(self.image_tokens if "image" in block else len(block["text"]) // 4 for block in content)
+        self.converse_calls += 1
+        self.input_tokens += tokens
+        self.latency_ms += (CONVERSE_BASE_MS + tokens * CONVERSE_MS_PER_INPUT_TOKEN
+                            + OUTPUT_TOKENS * CONVERSE_MS_PER_OUTPUT_TOKEN)
+
+        stop_reason = "end_turn"
+        if kwargs.get("guardrailConfig"):
+            self.latency_ms += INPUT_GUARDRAIL_BASE_MS + tokens * INPUT_GUARDRAIL_MS_PER_TOKEN
+            if self.flagged:
+                stop_reason = "guardrail_intervened"
+        return {
+            "output": {"message": {"content": [{"text": STUB_ANALYSIS}]}},
+            "stopReason": stop_reason,
+        }
+
+    def apply_guardrail(self, guardrailIdentifier, guardrailVersion, source, content):
+        text = content[0]["text"]["text"]
+        self.guardrail_text_chars += len(text)
+        self.latency_ms += APPLY_GUARDRAIL_BASE_MS
+        action = "GUARDRAIL_INTERVENED" if self.flagged else "NONE"
+        return {"action": action, "outputs": [{"text": text}]}
+
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct))]
+
+
+def run_mode(mode, fixtures, stub):
+    provider = llm_providers.BedrockProvider(analyzer.BEDROCK_MODEL_ID)
+    latencies = []
+    totals = {"converse_calls": 0, "input_tokens": 0, "guardrail_text_chars": 0, "paths": {}}
+
+    for flagged, frames in fixtures:
+        stub.reset()
+        stub.flagged = flagged
+        request = llm_providers.LLMRequest(
+            analyzer._build_prompt_parts(frames),
+            guardrail_config=GUARDRAIL_CONFIG if mode == "input" else None,
+            bypass_guardrail_on_intervention=True,
+        )
+        result = llm_providers.complete_sync(request, [provider])
+        path = result.guardrail_path or "off"
+        if mode == "output":
+            action, _ = llm_providers.apply_output_guardrail(result.text, GUARDRAIL_CONFIG)
+            path = "output_intervened" if action == "GUARDRAIL_INTERVENED" else "output"
+
+        latencies.append(stub.latency_ms)
+        totals["converse_calls"] += stub.converse_calls
+        totals["input_tokens"] += stub.input_tokens
+        totals["guardrail_text_chars"] += stub.guardrail_text_chars
+        totals["paths"][path] = totals["paths"].get(path, 0) + 1
+
+    totals["p50_ms"] = statistics.median(latencies)
+    totals["p95_ms"] = _percentile(latencies, 0.95)
+    totals["flagged_p50_ms"] = statistics.median(
+        [lat for lat, (flagged, _) in zip(latencies, fixtures) if flagged] or [0]
+    )
+    return totals
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark guardrail modes against a stubbed Bedrock")
+    parser.add_argument("--videos", type=int, default=200)
+    parser.add_argument("--intervention-rate", type=float, default=0.15)
+    parser.add_argument("--image-tokens", type=int, default=1300, help="Modeled input tokens per frame")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    fixtures = [
+        (rng.random() < args.intervention_rate,
+         [rng.randbytes(rng.randint(40_000, 120_000)) for _ in range(4)])
+        for _ in range(args.videos)
+    ]
+
+    stub = StubBedrock(args.image_tokens)
+    llm_providers.invoke_bedrock = stub.invoke_bedrock
+    llm_providers._guardrail_clients["us-east-1"] = stub
+
+    results = {mode: run_mode(mode, fixtures, stub) for mode in ("input", "output")}
+
+    flagged = sum(1 for f, _ in fixtures if f)
+    print(f"\n{args.videos} videos, {flagged} flagged by the guardrail, {args.image_tokens} tokens/frame\n")
+    print(f"{'':24}{'input':>14}{'output':>14}")
+    for key, label in [
+        ("converse_calls", "converse calls"),
+        ("input_tokens", "input tokens"),
+        ("guardrail_text_chars", "ApplyGuardrail chars"),
+        ("p50_ms", "p50 latency (ms)"),
+        ("p95_ms", "p95 latency (ms)"),
+        ("flagged_p50_ms", "flagged p50 (ms)"),
+    ]:
+        print(f"{label:24}{results['input'][key]:>14,.0f}{results['output'][key]:>14,.0f}")
+
+    saved_tokens = results["input"]["input_tokens"] - results["output"]["input_tokens"]
+    print(f"\nOutput mode saves {saved_tokens:,} input tokens "
+          f"({100 * saved_tokens / results['input']['input_tokens']:.1f}%)")
+    for mode in ("input", "output"):
+        print(f"Guardrail paths ({mode}): {results[mode]['paths']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Latency of the in-process memory backend over a float16 snapshot, by catalog
+size, and (with --db) against pgvector on the real data.
+
+The memory backend (SEARCH_BACKEND=memory) memory-maps a snapshot written by
+shared/vector_snapshot.py and scores it brute-force with NumPy. This writes
+snapshots in the same layout to a temp directory and reports snapshot size,
+open time and search p50 / p95 for unfiltered and filtered queries, with the
+vectors widened to float32 on load (the default) and left as mapped float16.
+
+Two ways to run:
+
+  offline (default) — synthetic creators:
+      python scripts/bench_memory_search.py [--sizes 10000,50000,200000] [--queries 100]
+
+  --db — snapshot of the real creator aggregates (DB_HOST / DB_NAME /
+  DB_SECRET_ARN), compared with the pgvector backend on the same queries
+  (recall@50 of each against exact search, p50 / p95 latency):
+      python scripts/bench_memory_search.py --db [--queries 50]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import uuid
+
+import numpy as np
+
+LAMBDAS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lambdas")
+sys.path.insert(0, LAMBDAS_DIR)
+
+from shared import search_backends, vector_snapshot  # noqa: E402
+from shared.db import get_db_connection  # noqa: E402
+
+DIM = vector_snapshot.DIM
+TOP_K = 50
+CITIES = ["Mumbai", "Delhi", "Bengaluru", "Pune", "Jaipur", "Noida", "Kochi", "Indore"]
+NICHES = ["Fashion", "Beauty/Cosmetics", "Fitness/Health", "Food", "Tech", "Travel"]
+FILTERS = {
+    "none": {},
+    "city": {"city": "pune"},
+    "followers": {"min_followers": 10000, "max_followers": 50000},
+    "city+followers": {"city": "pune", "min_followers": 10000, "max_followers": 50000},
+}
+
+
+def _unit(x):
+    return x / np.linalg.norm(x, axis=-1, keepdims=True)
+
+
+def _percentiles(times):
+    return np.percentile(times, 50), np.percentile(times, 95)
+
+
+def _snapshot_bytes(directory):
+    return sum(os.path.getsize(os.path.join(directory, f)) for f in os.listdir(directory))
+
+
+def _synthetic_rows(size, centers, rng):
+    for _ in range(size):
+        yield (
+            uuid.uuid4(),
+            NICHES[rng.integers(len(NICHES))],
+            CITIES[rng.integers(len(CITIES))],
+            int(rng.lognormal(10, 1.2)),
+            centers[rng.integers(len(centers))] + 0.15 * rng.standard_normal(DIM),
+        )
+
+
+def _time_searches(backend, queries, filters):
+    times = []
+    for q in queries:
+        start = time.perf_counter()
+        backend.search(q, filters, TOP_K)
+        times.append((time.perf_counter() - start) * 1000)
+    return times
+
+
+def offline(args, rng, root):
+    centers = _unit(rng.standard_normal((200, DIM)))
+    queries = _unit(centers[rng.integers(0, 200, args.queries)] + 0.2 * rng.standard_normal((args.queries, DIM)))
+
+    header = f"{'creators':>10}{'scoring':>9}{'snapshot MB':>13}{'open ms':>9}" + "".join(f"{name + ' p50/p95':>26}" for name in FILTERS)
+    print(header)
+    for size in (int(s) for s in args.sizes.split(",")):
+        manifest = vector_snapshot.write_snapshot(_synthetic_rows(size, centers, rng), size, time.time(), root)
+        directory = os.path.join(root, manifest["version"])
+
+        for expand in (True, False):
+            start = time.perf_counter()
+            backend = search_backends.InMemoryBackend.from_snapshot(directory, expand=expand)
+            open_ms = (time.perf_counter() - start) * 1000
+            backend.search(queries[0], {}, TOP_K)  # page the vectors in
+
+            line = f"{size:>10,}{'float32' if expand else 'float16':>9}"
+            line += f"{_snapshot_bytes(directory) / 1e6:>13.1f}{open_ms:>9.1f}"
+            for filters in FILTERS.values():
+                p50, p95 = _percentiles(_time_searches(backend, queries, filters))
+                line += f"{f'{p50:.1f} / {p95:.1f} ms':>26}"
+            print(line)
+            del backend
+        shutil.rmtree(directory)
+
+
+def against_db(args, rng, root):
+    conn = get_db_connection()
+    manifest = vector_snapshot.build_snapshot(conn, root)
+    directory = os.path.join(root, manifest["version"])
+    memory = search_backends.InMemoryBackend.from_snapshot(directory)
+    if not manifest["count"]:
+        print("No creator aggregate embeddings found")
+        sys.exit(1)
+
+    truth = search_backends.InMemoryBackend.load(conn.cursor())
+    conn.rollback()
+    pgvector = search_backends.PgvectorBackend(conn)
+
+    picks = rng.choice(manifest["count"], min(args.queries, manifest["count"]), replace=False)
+    queries = _unit(np.asarray(memory.vectors[picks], dtype=np.float32) + 0.02 * rng.standard_normal((len(picks), DIM)))
+    print(f"\nDatabase: {manifest['count']} creators, snapshot {_snapshot_bytes(directory) / 1e6:.1f} MB\n")
+
+    print(f"{'filters':16}{'backend':10}{'recall@' + str(TOP_K):>12}{'p50 ms':>10}{'p95 ms':>10}")
+    for label, filters in FILTERS.items():
+        for backend in (memory, pgvector):
+            times, recalls = [], []
+            for q in queries:
+                expected = {c for c, _ in truth.search(q, filters, TOP_K)}
+                start = time.perf_counter()
+                found = backend.search(q, filters, TOP_K)
+                times.append((time.perf_counter() - start) * 1000)
+                conn.rollback()
+                recalls.append(len(expected & {c for c, _ in found}) / len(expected) if expected else 1.0)
+            p50, p95 = _percentiles(times)
+            print(f"{label:16}{backend.name:10}{np.mean(recalls):>12.3f}{p50:>10.1f}{p95:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the in-process memory search backend")
+    parser.add_argument("--db", action="store_true", help="Snapshot the real database and compare with pgvector")
+    parser.add_argument("--sizes", default="10000,50000,200000")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    with tempfile.TemporaryDirectory() as root:
+        if args.db:
+            against_db(args, rng, root)
+        else:
+            offline(args, rng, root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+recall@50 for brand_search's SEARCH_INDEX_MODE options (exact / halfvec / binary).
+
+halfvec and binary modes take N coarse candidates from a compact index and
+re-rank them with the full-precision vectors, so recall depends on the
+quantization and the candidate count. This reports recall@50 against exact
+cosine ranking for several candidate counts, plus index bytes per vector.
+
+Two ways to run:
+
+  offline (default) — synthetic clustered unit vectors in NumPy; measures the
+  quantization + re-rank loss only (brute-force candidates, no HNSW):
+      python scripts/bench_search_recall.py [--creators 20000] [--queries 200]
+                                            [--candidates 50,100,200,400]
+
+  --db — against the real database (DB_HOST / DB_NAME / DB_SECRET_ARN), using
+  the pgvector backend's own queries and the HNSW indexes from the "Quantized search
+  indexes" migration; queries are stored aggregate vectors plus noise, and
+  ground truth is a sequential scan:
+      python scripts/bench_search_recall.py --db [--queries 50]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+LAMBDAS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lambdas")
+sys.path.insert(0, os.path.join(LAMBDAS_DIR, "brand_search"))
+sys.path.insert(0, LAMBDAS_DIR)
+
+import handler as brand_search  # noqa: E402  (brand_search/handler.py)
+from shared import search_backends  # noqa: E402
+from shared.db import get_db_connection  # noqa: E402
+
+DIM = 1024
+TOP_K = brand_search.SEARCH_RESULT_LIMIT
+INDEX_BYTES = {"exact": DIM * 4, "halfvec": DIM * 2, "binary": DIM // 8}
+
+
+def _unit(x):
+    return x / np.linalg.norm(x, axis=-1, keepdims=True)
+
+
+def _recall(truth, found):
+    return len(set(truth) & set(found)) / len(truth)
+
+
+# =============================================================================
+# Offline (NumPy)
+# =============================================================================
+
+def synthetic_corpus(creators, queries, clusters, rng):
+    """Creator aggregates cluster around a few hundred "styles", like real niches do."""
+    centers = _unit(rng.standard_normal((clusters, DIM)))
+    labels = rng.integers(0, clusters, creators)
+    corpus = _unit(centers[labels] + 0.15 * rng.standard_normal((creators, DIM)))
+    q_labels = rng.integers(0, clusters, queries)
+    query_vecs = _unit(centers[q_labels] + 0.2 * rng.standard_normal((queries, DIM)))
+    return corpus.astype(np.float32), query_vecs.astype(np.float32)
+
+
+def offline_recall(corpus, queries, candidate_counts):
+    half = corpus.astype(np.float16)
+    bits = np.packbits(corpus > 0, axis=1)
+    popcount = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+    results = {("exact", 0): []}
+    for mode in ("halfvec", "binary"):
+        for n in candidate_counts:
+            results[(mode, n)] = []
+
+    for q in queries:
+        exact_scores = corpus @ q
+        truth = np.argsort(-exact_scores)[:TOP_K]
+        results[("exact", 0)].append(1.0)
+
+        coarse = {
+            "halfvec": -(half @ q.astype(np.float16)).astype(np.float32),
+            "binary": popcount[np.bitwise_xor(bits, np.packbits(q > 0))].sum(axis=1),
+        }
+        for mode, distance in coarse.items():
+            order = np.argsort(distance, kind="stable")
+            for n in candidate_counts:
+                cand = order[:n]
+                reranked = cand[np.argsort(-exact_scores[cand])][:TOP_K]
+                results[(mode, n)].append(_recall(truth, reranked))
+
+    return {key: float(np.mean(vals)) for key, vals in results.items()}
+
+
+# =============================================================================
+# Database (real HNSW indexes)
+# =============================================================================
+
+def db_recall(query_count, candidate_counts, rng):
+    conn = get_db_connection()
+    cur = conn.cursor()
+    cur.execute(
+        """
+        SELECT embedding::text FROM video_embeddings
+        WHERE is_creator_aggregate = TRUE AND embedding IS NOT NULL
+        ORDER BY random() LIMIT %s
+        """,
+        (query_count,),
+    )
+    queries = [
+        _unit(np.array(json.loads(row[0])) + 0.02 * rng.standard_normal(DIM)).tolist()
+        for row in cur.fetchall()
+    ]
+    conn.rollback()
+    if not queries:
+        print("No creator aggregate embeddings found")
+        sys.exit(1)
+
+    def run(mode, query, candidates):
+        sql, params = search_backends.build_semantic_query({}, query, TOP_K, mode=mode, candidates=candidates)
+        if mode == "exact":
+            cur.execute("SET LOCAL enable_indexscan = off")  # sequential scan = ground truth
+        else:
+            cur.execute("SET LOCAL hnsw.ef_search = %s", (min(candidates, search_backends.HNSW_MAX_EF_SEARCH),))
+        start = time.perf_counter()
+        cur.execute(sql, params)
+        ids = [row[0] for row in cur.fetchall()]
+        elapsed = (time.perf_counter() - start) * 1000
+        conn.rollback()
+        return ids, elapsed
+
+    results, latency = {}, {}
+    truths = [run("exact", q, 0) for q in queries]
+    results[("exact", 0)] = 1.0
+    latency[("exact", 0)] = float(np.median([t[1] for t in truths]))
+    for mode in ("halfvec", "binary"):
+        for n in candidate_counts:
+            runs = [run(mode, q, n) for q in queries]
+            results[(mode, n)] = float(np.mean([_recall(t[0], r[0]) for t, r in zip(truths, runs) if t[0]]))
+            latency[(mode, n)] = float(np.median([r[1] for r in runs]))
+    return results, latency
+
+
+def main():
+    parser = argparse.ArgumentParser(description="recall@50 for quantized search index modes")
+    parser.add_argument("--db", action="store_true", help="Measure against the real database")
+    parser.add_argument("--creators", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--clusters", type=int, default=300)
+    parser.add_argument("--candidates", default="50,100,200,400")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    candidate_counts = [int(n) for n in args.candidates.split(",")]
+
+    latency = None
+    if args.db:
+        results, latency = db_recall(args.queries, candidate_counts, rng)
+        print(f"\nDatabase: {args.queries} queries against stored creator aggregates\n")
+    else:
+        corpus, queries = synthetic_corpus(args.creators, args.queries, args.clusters, rng)
+        results = offline_recall(corpus, queries, candidate_counts)
+        print(f"\nSynthetic: {args.creators} creators, {args.queries} queries, {args.clusters} clusters\n")
+
+    header = f"{'mode':10}{'candidates':>12}{'recall@' + str(TOP_K):>12}{'index B/vec':>14}"
+    print(header + (f"{'p50 ms':>10}" if latency else ""))
+    for (mode, n), recall in results.items():
+        line = f"{mode:10}{(n or '-'):>12}{recall:>12.3f}{INDEX_BYTES[mode]:>14,}"
+        if latency:
+            line += f"{latency[(mode, n)]:>10.1f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
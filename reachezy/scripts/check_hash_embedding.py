@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Golden check for shared.embeddings.hash_embedding.
+
+Vectors from the hash fallback are already stored in video_embeddings
+(embedding_model = 'hash-sha512'), so the vectorized implementation must
+produce exactly the same floats as the original per-element Python loop.
+This script checks:
+
+  - fixed golden digests: sha256 of the pgvector literal for known inputs,
+    as produced on the Lambda runtime (Python 3.12, whose float sum() is
+    compensated and so differs in the last bit from 3.11 for many texts)
+  - bit-for-bit equality with the legacy loop on random texts and dims
+  - the pure-Python fallback path (numpy unavailable) against the same loop
+
+and prints the per-call speedup. Exits non-zero on any mismatch.
+
+Usage:
+    python3.12 scripts/check_hash_embedding.py [--samples 2000] [--seed 7]
+"""
+
+import argparse
+import hashlib
+import math
+import os
+import random
+import sys
+import time
+
+LAMBDAS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lambdas")
+sys.path.insert(0, LAMBDAS_DIR)
+
+from shared import embeddings  # noqa: E402
+
+# sha256(to_pgvector(hash_embedding(text))) from the original implementation on
+# the Lambda runtime
+GOLDEN_PYTHON = (3, 12)
+GOLDEN = {
+    "": "91d8af6b654f23afff9283a561947b1cc8f95033acacb20130536ea259dcc457",
+    "Energy: high. Aesthetic: vibrant": "45db1d150fdaabd52d38efd7baf9b3836b23d513d07649bf899589ebff5fbc97",
+    "creator fitness mumbai": "9f9f9d045abfc281019ee462184f20a83b3234a9ed31f55225a1eb37bcd4bf65",
+}
+
+
+def legacy_hash_embedding(text, dim=embeddings.EMBEDDING_DIM):
+    """The original embedding_generator / brand_search implementation, verbatim."""
+    values = []
+    seed = text.encode("utf-8")
+    while len(values) < dim:
+        h = hashlib.sha512(seed).digest()
+        for j in range(0, 64, 4):
+            if len(values) >= dim:
+                break
+            val = int.from_bytes(h[j:j + 4], "big")
+            values.append((val / 2147483648.0) - 1.0)
+        seed = h
+    norm = math.sqrt(sum(v * v for v in values))
+    if norm > 0:
+        values = [v / norm for v in values]
+    return values
+
+
+def _random_text(rng):
+    alphabet = "abcdefghijklmnopqrstuvwxyz .,:éअ"
+    return "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 200)))
+
+
+def _compare(samples, rng):
+    mismatches = 0
+    for _ in range(samples):
+        text = _random_text(rng)
+        dim = rng.choice([embeddings.EMBEDDING_DIM, 1, 15, 16, 17, 256, 1000])
+        if embeddings.hash_embedding(text, dim) != legacy_hash_embedding(text, dim):
+            mismatches += 1
+            print(f"  MISMATCH dim={dim} text={text[:40]!r}")
+    return mismatches
+
+
+def _time_per_call(fn, texts):
+    start = time.perf_counter()
+    for text in texts:
+        fn(text)
+    return (time.perf_counter() - start) / len(texts) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify hash_embedding against golden vectors")
+    parser.add_argument("--samples", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    failures = 0
+
+    print(f"numpy: {'available' if embeddings.np is not None else 'NOT available (pure-Python path)'}")
+
+    if sys.version_info[:2] >= GOLDEN_PYTHON:
+        for text, expected in GOLDEN.items():
+            literal = embeddings.to_pgvector(embeddings.hash_embedding(text))
+            actual = hashlib.sha256(literal.encode("utf-8")).hexdigest()
+            status = "ok" if actual == expected else "MISMATCH"
+            failures += actual != expected
+            print(f"golden {text!r:40} {status}")
+    else:
+        print(f"golden digests skipped: they are Python {GOLDEN_PYTHON[0]}.{GOLDEN_PYTHON[1]} values "
+              f"(the Lambda runtime), this is {sys.version.split()[0]}")
+
+    mismatches = _compare(args.samples, rng)
+    failures += mismatches
+    print(f"random texts vs legacy: {args.samples - mismatches}/{args.samples} identical")
+
+    if embeddings.np is not None:
+        numpy_module, embeddings.np = embeddings.np, None
+        try:
+            mismatches = _compare(args.samples // 4, rng)
+        finally:
+            embeddings.np = numpy_module
+        failures += mismatches
+        print(f"pure-Python fallback vs legacy: {args.samples // 4 - mismatches}/{args.samples // 4} identical")
+
+    texts = [_random_text(rng) for _ in range(1000)]
+    legacy_us = _time_per_call(legacy_hash_embedding, texts)
+    shared_us = _time_per_call(embeddings.hash_embedding, texts)
+    print(f"\nlegacy loop: {legacy_us:.0f} us/call   hash_embedding: {shared_us:.0f} us/call   "
+          f"({legacy_us / shared_us:.1f}x)")
+
+    if failures:
+        print(f"\nFAILED: {failures} mismatch(es)")
+        sys.exit(1)
+    print("\nAll vectors match.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Consistency check for the incrementally maintained style counters.
+
+For each creator, recounts creator_style_counts from scratch (from every
+video_analyses row, with the same style_count_rows() the trigger uses) and
+diffs the result against the maintained counters and the style_profile derived
+from them. With --fix, mismatched creators are rebuilt and their
+creators.style_profile is rewritten.
+
+Usage:
+    python scripts/check_style_state.py [--creator-id ID] [--fix]
+
+Requires DB_HOST, DB_NAME, DB_SECRET_ARN (as for the Lambdas).
+Exits non-zero if any mismatch remains.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+LAMBDAS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lambdas")
+sys.path.insert(0, LAMBDAS_DIR)
+
+from shared.db import get_db_connection  # noqa: E402
+from shared.style_state import (  # noqa: E402
+    compute_style_counts,
+    derive_style_profile,
+    diff_style_counts,
+    load_style_counts,
+    rebuild_style_counts,
+)
+
+
+def _creator_ids(cur, creator_id=None):
+    if creator_id:
+        return [creator_id]
+    cur.execute(
+        """
+        SELECT creator_id FROM video_analyses WHERE creator_id IS NOT NULL
+        UNION
+        SELECT creator_id FROM creator_style_counts WHERE count <> 0
+        """
+    )
+    return [str(row[0]) for row in cur.fetchall()]
+
+
+def _profile_diffs(maintained, scratch):
+    """Differences in the derived style_profile (topic order ignored)."""
+    have = derive_style_profile(maintained) or {}
+    want = derive_style_profile(scratch) or {}
+    diffs = []
+    for key in sorted(set(have) | set(want)):
+        a, b = have.get(key), want.get(key)
+        if key == "topics":
+            a, b = sorted(a or []), sorted(b or [])
+        if key == "style_summary":
+            continue  # follows topics order; covered by the other keys
+        if a != b:
+            diffs.append(f"style_profile.{key}: maintained {a!r}, actual {b!r}")
+    return diffs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Diff maintained style counters against a full recount")
+    parser.add_argument("--creator-id")
+    parser.add_argument("--fix", action="store_true", help="Rebuild mismatched creators")
+    args = parser.parse_args()
+
+    conn = get_db_connection()
+    cur = conn.cursor()
+    creator_ids = _creator_ids(cur, args.creator_id)
+
+    checked = mismatched = fixed = 0
+    for creator_id in creator_ids:
+        maintained = load_style_counts(cur, creator_id)
+        scratch = compute_style_counts(cur, creator_id)
+        conn.rollback()
+        checked += 1
+
+        diffs = diff_style_counts(maintained, scratch) + _profile_diffs(maintained, scratch)
+        if not diffs:
+            continue
+
+        mismatched += 1
+        print(f"MISMATCH {creator_id}")
+        for line in diffs:
+            print(f"  {line}")
+
+        if args.fix:
+            rebuild_style_counts(cur, creator_id)
+            style_profile = derive_style_profile(load_style_counts(cur, creator_id))
+            if style_profile is not None:
+                cur.execute(
+                    "UPDATE creators SET style_profile = %s::jsonb, updated_at = NOW() WHERE id = %s",
+                    (json.dumps(style_profile), creator_id),
+                )
+            conn.commit()
+            fixed += 1
+
+    print(f"Checked {checked} creators: {mismatched} mismatched, {fixed} rebuilt")
+    if mismatched > fixed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
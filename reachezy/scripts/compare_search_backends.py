@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Compare brand_search's vector backends (shared/search_backends.py) on filtered
+queries: recall@50 against exact search (the memory backend) and p50 latency.
+
+Two ways to run:
+
+  local OpenSearch (default) — loads synthetic creators into a throwaway index
+  (the creator index mapping) in a local container and compares efficient vs post filtering:
+      docker run -p 9200:9200 -e discovery.type=single-node \\
+          -e DISABLE_SECURITY_PLUGIN=true opensearchproject/opensearch:2.13.0
+      OPENSEARCH_ENDPOINT=http://localhost:9200 OPENSEARCH_AUTH=none \\
+          python scripts/compare_search_backends.py [--creators 20000] [--queries 100]
+
+  --db — against the real database and index (DB_HOST / DB_NAME / DB_SECRET_ARN,
+  OPENSEARCH_ENDPOINT / OPENSEARCH_INDEX); queries are stored aggregate vectors
+  plus noise, with filters drawn from real cities and follower counts:
+      python scripts/compare_search_backends.py --db [--backends pgvector,opensearch]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+
+import numpy as np
+
+LAMBDAS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lambdas")
+sys.path.insert(0, LAMBDAS_DIR)
+
+from shared import search_backends  # noqa: E402
+from shared.db import get_db_connection  # noqa: E402
+from shared.opensearch import OPENSEARCH_ENDPOINT, creator_index_body, get_session  # noqa: E402
+
+DIM = 1024
+TOP_K = 50
+CITIES = ["Mumbai", "Delhi", "Bengaluru", "Pune", "Jaipur", "Noida", "Kochi", "Indore"]
+NICHES = ["Fashion", "Beauty/Cosmetics", "Fitness/Health", "Food", "Tech", "Travel"]
+
+def _unit(x):
+    return x / np.linalg.norm(x, axis=-1, keepdims=True)
+
+
+def _recall(truth, found):
+    truth_ids = {creator_id for creator_id, _ in truth}
+    if not truth_ids:
+        return 1.0
+    return len(truth_ids & {creator_id for creator_id, _ in found}) / len(truth_ids)
+
+
+def _random_filters(rng, cities, followers):
+    """A mix of unfiltered, city, follower-band and combined filters."""
+    kind = rng.integers(0, 4)
+    filters = {}
+    if kind in (1, 3):
+        filters["city"] = str(rng.choice(cities))
+    if kind in (2, 3):
+        low = int(np.quantile(followers, rng.uniform(0.1, 0.6)))
+        filters["min_followers"] = low
+        filters["max_followers"] = low * 3
+    return filters
+
+
+def run_backends(backends, truth_backend, queries, filters_list, after_search=None):
+    recall = {name: [] for name in backends}
+    latency = {name: [] for name in [truth_backend.name, *backends]}
+    for query, filters in zip(queries, filters_list):
+        start = time.perf_counter()
+        truth = truth_backend.search(query, filters, TOP_K)
+        latency[truth_backend.name].append((time.perf_counter() - start) * 1000)
+        for name, backend in backends.items():
+            start = time.perf_counter()
+            found = backend.search(query, filters, TOP_K)
+            latency[name].append((time.perf_counter() - start) * 1000)
+            if after_search:
+                after_search()
+            recall[name].append(_recall(truth, found))
+    return recall, latency
+
+
+# =============================================================================
+# Local OpenSearch (synthetic)
+# =============================================================================
+
+def synthetic(args, rng):
+    creators, clusters = args.creators, 200
+    centers = _unit(rng.standard_normal((clusters, DIM)))
+    labels = rng.integers(0, clusters, creators)
+    vectors = _unit(centers[labels] + 0.15 * rng.standard_normal((creators, DIM))).astype(np.float32)
+    ids = [str(uuid.UUID(int=int(i) + 1)) for i in range(creators)]
+    niches = rng.choice(NICHES, creators)
+    cities = rng.choice(CITIES, creators)
+    followers = rng.lognormal(10, 1.2, creators).astype(np.int64)
+
+    session = get_session()
+    index = f"search-backend-compare-{uuid.uuid4().hex[:8]}"
+    session.put(f"{OPENSEARCH_ENDPOINT}/{index}", data=json.dumps(creator_index_body()), timeout=30).raise_for_status()
+    try:
+        for start in range(0, creators, 500):
+            lines = []
+            for i in range(start, min(start + 500, creators)):
+                lines.append(json.dumps({"index": {"_index": index, "_id": ids[i]}}))
+                lines.append(json.dumps({
+                    "niche": str(niches[i]), "city": str(cities[i]),
+                    "followers_count": int(followers[i]), "embedding": vectors[i].tolist(),
+                }))
+            session.post(f"{OPENSEARCH_ENDPOINT}/_bulk", data="\n".join(lines) + "\n",
+                         headers={"Content-Type": "application/x-ndjson"}, timeout=120).raise_for_status()
+        session.post(f"{OPENSEARCH_ENDPOINT}/{index}/_refresh", timeout=120).raise_for_status()
+
+        truth = search_backends.InMemoryBackend.from_columns(ids, vectors, niches, cities, followers)
+        backends = {
+            "opensearch (efficient)": search_backends.OpenSearchBackend(index=index, filter_mode="efficient"),
+            "opensearch (post)": search_backends.OpenSearchBackend(index=index, filter_mode="post"),
+        }
+        q_labels = rng.integers(0, clusters, args.queries)
+        queries = _unit(centers[q_labels] + 0.2 * rng.standard_normal((args.queries, DIM))).astype(np.float32)
+        filters_list = [_random_filters(rng, CITIES, followers) for _ in range(args.queries)]
+        print(f"\nSynthetic: {creators} creators, {args.queries} filtered queries\n")
+        return run_backends(backends, truth, queries, filters_list)
+    finally:
+        session.delete(f"{OPENSEARCH_ENDPOINT}/{index}", timeout=30)
+
+
+# =============================================================================
+# Real database / index
+# =============================================================================
+
+def live(args, rng):
+    conn = get_db_connection()
+    truth = search_backends.InMemoryBackend.load(conn.cursor())
+    conn.rollback()
+    if not len(truth.ids):
+        print("No creator aggregate embeddings found")
+        sys.exit(1)
+
+    picks = rng.choice(len(truth.ids), min(args.queries, len(truth.ids)), replace=False)
+    queries = _unit(truth.vectors[picks] + 0.02 * rng.standard_normal((len(picks), DIM)))
+    cities = truth.vocab["city"] or CITIES
+    followers = truth.followers[truth.followers >= 0]
+    filters_list = [_random_filters(rng, cities, followers) for _ in picks]
+
+    backends = {name: search_backends.get_backend(name) for name in args.backends.split(",")}
+    print(f"\nDatabase: {len(truth.ids)} creators, {len(picks)} filtered queries\n")
+    # Each query in its own transaction (pgvector uses SET LOCAL hnsw.ef_search)
+    return run_backends(backends, truth, queries, filters_list, after_search=conn.rollback)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare vector search backends on filtered queries")
+    parser.add_argument("--db", action="store_true", help="Use the real database and index")
+    parser.add_argument("--backends", default="pgvector,opensearch", help="With --db: backends to compare")
+    parser.add_argument("--creators", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    if not args.db and not OPENSEARCH_ENDPOINT:
+        print("Error: OPENSEARCH_ENDPOINT is required (or use --db)")
+        sys.exit(1)
+
+    rng = np.random.default_rng(args.seed)
+    recall, latency = live(args, rng) if args.db else synthetic(args, rng)
+
+    print(f"{'backend':26}{'recall@' + str(TOP_K):>12}{'p50 ms':>10}{'p95 ms':>10}")
+    for name, times in latency.items():
+        r = f"{np.mean(recall[name]):.3f}" if name in recall else "exact"
+        print(f"{name:26}{r:>12}{np.percentile(times, 50):>10.1f}{np.percentile(times, 95):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Work with creator snapshots (shared/vector_snapshot.py) offline, instead of
+querying the production database.
+
+The search_snapshot Lambda publishes a versioned columnar snapshot of every
+creator: ids, vectors (float16; has_vector is False where a creator has no
+aggregate yet), followers, niche / city / style codes, username, rate card
+and consistency score, as .npy files plus a manifest. This downloads one and reads it with NumPy.
+
+Usage:
+    python scripts/creator_snapshot.py download [--version V] [--dir snapshots]
+    python scripts/creator_snapshot.py summary  [--dir snapshots]
+    python scripts/creator_snapshot.py csv      [--dir snapshots] [--out creators.csv]
+    python scripts/creator_snapshot.py build    [--dir snapshots]    # from the DB
+
+    download   LATEST (or --version) from SEARCH_SNAPSHOT_BUCKET, all columns
+    summary    creators per niche / city and rate percentiles per niche
+    csv        every scalar column (codes decoded), for pandas / spreadsheets
+    build      build a snapshot directly from DB_HOST / DB_NAME / DB_SECRET_ARN
+
+In Python, the columns are plain arrays:
+    manifest, cols = vector_snapshot.open_snapshot("snapshots/<version>")
+    cols["vectors"] @ query          # cosine scores (rows are unit vectors)
+"""
+
+import argparse
+import csv
+import json
+import os
+import sys
+
+import numpy as np
+
+LAMBDAS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lambdas")
+sys.path.insert(0, LAMBDAS_DIR)
+
+from shared import vector_snapshot  # noqa: E402
+
+
+def _latest_local(root):
+    versions = sorted(d for d in os.listdir(root) if os.path.isfile(os.path.join(root, d, "manifest.json")))
+    if not versions:
+        print(f"No snapshot in {root} (run download or build first)")
+        sys.exit(1)
+    return os.path.join(root, versions[-1])
+
+
+def _decoded(manifest, columns, name):
+    """Column `name` as Python values (codes and bytes decoded, unknown -> None)."""
+    kind = {c["name"]: c["kind"] for c in manifest["columns"]}[name]
+    if kind == "text":
+        return [columns[name][i] or None for i in range(manifest["count"])]
+    values = columns[name][:manifest["count"]]
+    if kind == "mask":
+        return [bool(v) for v in values]
+    if kind == "code":
+        vocab = manifest["vocab"][name]
+        return [vocab[code] if code >= 0 else None for code in values]
+    if kind == "id":
+        return [v.decode() or None for v in values]
+    if kind == "float":
+        return [None if np.isnan(v) else float(v) for v in values]
+    return [None if v < 0 else int(v) for v in values]
+
+
+def download(args):
+    if not vector_snapshot.SNAPSHOT_BUCKET:
+        print("Error: SEARCH_SNAPSHOT_BUCKET is required")
+        sys.exit(1)
+    manifest = vector_snapshot.latest_manifest()
+    if args.version and args.version != manifest["version"]:
+        obj = vector_snapshot._get_s3().get_object(
+            Bucket=vector_snapshot.SNAPSHOT_BUCKET,
+            Key=f"{vector_snapshot.SNAPSHOT_PREFIX}/{args.version}/manifest.json",
+        )
+        manifest = json.loads(obj["Body"].read())
+    directory = vector_snapshot.fetch_snapshot(manifest, columns=None, root=args.dir)
+    print(f"Snapshot {manifest['version']} ({manifest['count']} creators) -> {directory}")
+
+
+def build(args):
+    from shared.db import get_db_connection
+
+    manifest = vector_snapshot.build_snapshot(get_db_connection(), root=args.dir)
+    print(f"Snapshot {manifest['version']} ({manifest['count']} creators) -> "
+          f"{os.path.join(args.dir, manifest['version'])}")
+
+
+def summary(args):
+    manifest, columns = vector_snapshot.open_snapshot(_latest_local(args.dir))
+    n = manifest["count"]
+    with_vector = int(columns["has_vector"][:n].sum()) if "has_vector" in columns else n
+    print(f"Snapshot {manifest['version']}: {n} creators ({with_vector} with an aggregate vector), built "
+          f"{np.datetime64(int(manifest['built_at']), 's')} UTC\n")
+
+    for name in ("niche", "city"):
+        codes = columns[name][:n]
+        counts = np.bincount(codes[codes >= 0], minlength=len(manifest["vocab"][name]))
+        print(f"{name:20}{'creators':>10}")
+        for code in np.argsort(-counts)[:10]:
+            print(f"  {manifest['vocab'][name][code]:18}{counts[code]:>10}")
+        print(f"  {'(none)':18}{int((codes < 0).sum()):>10}\n")
+
+    niche = columns["niche"][:n]
+    print(f"{'niche':20}{'rate':8}{'cards':>7}{'p25':>10}{'p50':>10}{'p75':>10}")
+    for code, label in enumerate(manifest["vocab"]["niche"]):
+        for rate in ("reel_rate", "story_rate", "post_rate"):
+            values = columns[rate][:n][(niche == code) & (columns[rate][:n] >= 0)]
+            if len(values):
+                p25, p50, p75 = np.percentile(values, [25, 50, 75])
+                print(f"{label:20}{rate[:-5]:8}{len(values):>7}{p25:>10.0f}{p50:>10.0f}{p75:>10.0f}")
+
+
+def to_csv(args):
+    directory = _latest_local(args.dir)
+    manifest, columns = vector_snapshot.open_snapshot(directory)
+    names = [c["name"] for c in manifest["columns"] if c["kind"] != "vector" and c["name"] in columns]
+    decoded = [_decoded(manifest, columns, name) for name in names]
+    with open(args.out, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["creator_id" if name == "ids" else name for name in names])
+        writer.writerows(zip(*decoded))
+    print(f"Wrote {manifest['count']} creators from {manifest['version']} to {args.out}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download and read creator snapshots")
+    parser.add_argument("command", choices=["download", "build", "summary", "csv"])
+    parser.add_argument("--dir", default="snapshots", help="Local snapshot root (default: ./snapshots)")
+    parser.add_argument("--version", help="download: snapshot version (default: LATEST)")
+    parser.add_argument("--out", default="creators.csv", help="csv: output file")
+    args = parser.parse_args()
+
+    os.makedirs(args.dir, exist_ok=True)
+    {"download": download, "build": build, "summary": summary, "csv": to_csv}[args.command](args)
+
+
+if __name__ == "__main__":
+    main()
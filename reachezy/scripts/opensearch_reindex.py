@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Blue/green OpenSearch reindex of every creator, run locally.
+
+Builds <OPENSEARCH_INDEX>-v<version> (default: CREATOR_INDEX_VERSION in
+shared/opensearch.py) from Postgres while searches keep reading the live
+index, then flips the OPENSEARCH_INDEX alias to it in one atomic _aliases
+call. Same code as invoking the opensearch_sync Lambda with
+{"action": "reindex"}, without its 5-minute limit. If the version is already
+live, its documents are re-written in place instead.
+
+Usage:
+    python scripts/opensearch_reindex.py [--version N] [--delete-old] [--drain]
+    python scripts/opensearch_reindex.py --status
+    python scripts/opensearch_reindex.py --flip creator-profiles-v2   # roll back
+
+    --delete-old   delete the replaced index after the flip (default: keep it
+                   for rollback with --flip)
+    --drain        afterwards, also drain search_sync_queue
+
+Requires DB_HOST, DB_NAME, DB_SECRET_ARN, OPENSEARCH_ENDPOINT (and optionally
+OPENSEARCH_INDEX) plus AWS credentials with aoss:APIAccessAll.
+"""
+
+import argparse
+import json
+import os
+import sys
+
+LAMBDAS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "lambdas")
+sys.path.insert(0, os.path.join(LAMBDAS_DIR, "opensearch_sync"))
+sys.path.insert(0, LAMBDAS_DIR)
+
+import handler as opensearch_sync  # noqa: E402  (opensearch_sync/handler.py)
+from shared import opensearch  # noqa: E402
+
+
+def _status():
+    alias = opensearch.OPENSEARCH_INDEX
+    return {
+        "alias": alias,
+        "live": opensearch.alias_targets(alias),
+        "pending": opensearch.alias_targets(alias + opensearch.PENDING_SUFFIX),
+        "current_version": opensearch.versioned_index(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Blue/green reindex of all creators into OpenSearch")
+    parser.add_argument("--version", type=int, help="Index version to build (default: current mapping)")
+    parser.add_argument("--delete-old", action="store_true", help="Delete the replaced index after the flip")
+    parser.add_argument("--drain", action="store_true", help="Also drain search_sync_queue")
+    parser.add_argument("--status", action="store_true", help="Show alias targets and exit")
+    parser.add_argument("--flip", metavar="INDEX", help="Point the alias at an existing index and exit")
+    args = parser.parse_args()
+
+    if not opensearch.OPENSEARCH_ENDPOINT:
+        print("Error: OPENSEARCH_ENDPOINT is required")
+        sys.exit(1)
+
+    if args.status:
+        print(json.dumps(_status(), indent=2))
+        return
+    if args.flip:
+        if not opensearch.index_exists(args.flip):
+            print(f"Error: index {args.flip} does not exist")
+            sys.exit(1)
+        opensearch.flip_alias(args.flip)
+        print(json.dumps(_status(), indent=2))
+        return
+
+    result = opensearch_sync.reindex_all(args.version, delete_old=args.delete_old)
+    print(json.dumps(result))
+    if args.drain:
+        print(json.dumps(opensearch_sync.drain_queue()))
+    if result["status"] != "reindexed":
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -32,3 +32,170 @@ CREATE TABLE IF NOT EXISTS brand_wishlists (
 
 CREATE INDEX IF NOT EXISTS idx_brand_wishlists_user ON brand_wishlists(user_id);
 CREATE INDEX IF NOT EXISTS idx_brand_wishlists_creator ON brand_wishlists(creator_id);
+
+-- ============================================================
+-- Migration: Wishlist centroids
+-- Each saved creator belongs to one of up to WISHLIST_MAX_CENTROIDS clusters
+-- (brand_wishlists.cluster); brand_wishlist_centroids keeps the running sum of
+-- the members' aggregate embeddings per cluster. Triggers keep the sums and the
+-- per-brand version counters in step with every save / unsave (including
+-- ON DELETE CASCADE): a new save joins its nearest centroid, and
+-- lambdas/shared/wishlist.py re-fits the clusters with k-means after enough
+-- changes. Recommendations are cached per (version, centroid_version).
+-- brand_wishlists.contribution is the vector a save added to its cluster's
+-- sum, so leaving subtracts exactly that even if the creator's aggregate has
+-- changed since.
+-- ============================================================
+ALTER TABLE brand_wishlists ADD COLUMN IF NOT EXISTS cluster SMALLINT;
+ALTER TABLE brand_wishlists ADD COLUMN IF NOT EXISTS contribution vector(1024);
+
+CREATE TABLE IF NOT EXISTS brand_wishlist_state (
+    user_id UUID PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    version BIGINT NOT NULL DEFAULT 0,             -- bumped on every save / unsave
+    centroid_version BIGINT NOT NULL DEFAULT 0,    -- bumped whenever a centroid moves
+    saved_count INTEGER NOT NULL DEFAULT 0,
+    changes_since_fit INTEGER NOT NULL DEFAULT 0,
+    fitted_at TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS brand_wishlist_centroids (
+    user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    cluster SMALLINT NOT NULL,
+    embedding_sum vector(1024) NOT NULL,
+    member_count INTEGER NOT NULL,
+    updated_at TIMESTAMPTZ DEFAULT NOW(),
+    PRIMARY KEY (user_id, cluster)
+);
+
+CREATE TABLE IF NOT EXISTS brand_recommendation_cache (
+    user_id UUID PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    version BIGINT NOT NULL,
+    centroid_version BIGINT NOT NULL,
+    creator_ids UUID[] NOT NULL,
+    similarities REAL[] NOT NULL,
+    clusters SMALLINT[] NOT NULL,
+    computed_at TIMESTAMPTZ DEFAULT NOW()
+);
+
+-- New saves join the nearest centroid (cluster 0 for the first one); creators
+-- without an aggregate embedding yet stay unassigned until they get one.
+-- Whenever the cluster is set, contribution records the aggregate it adds.
+CREATE OR REPLACE FUNCTION assign_wishlist_cluster() RETURNS trigger AS $$
+DECLARE
+    aggregate vector(1024);
+BEGIN
+    IF TG_OP = 'UPDATE' AND NEW.cluster IS NOT DISTINCT FROM OLD.cluster THEN
+        RETURN NEW;
+    END IF;
+    SELECT embedding INTO aggregate FROM video_embeddings
+    WHERE creator_id = NEW.creator_id AND is_creator_aggregate = TRUE AND embedding IS NOT NULL;
+    IF TG_OP = 'INSERT' AND NEW.cluster IS NULL AND aggregate IS NOT NULL THEN
+        SELECT cluster INTO NEW.cluster FROM brand_wishlist_centroids
+        WHERE user_id = NEW.user_id
+        ORDER BY embedding_sum <=> aggregate
+        LIMIT 1;
+        NEW.cluster := COALESCE(NEW.cluster, 0);
+    END IF;
+    NEW.contribution := CASE WHEN NEW.cluster IS NOT NULL THEN aggregate END;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION apply_wishlist_change() RETURNS trigger AS $$
+DECLARE
+    brand UUID := COALESCE(NEW.user_id, OLD.user_id);
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        INSERT INTO brand_wishlist_state (user_id, version, saved_count, changes_since_fit)
+        VALUES (brand, 1, 1, 1)
+        ON CONFLICT (user_id) DO UPDATE SET
+            version = brand_wishlist_state.version + 1,
+            saved_count = brand_wishlist_state.saved_count + 1,
+            changes_since_fit = brand_wishlist_state.changes_since_fit + 1,
+            updated_at = NOW();
+    ELSIF TG_OP = 'DELETE' THEN
+        -- UPDATE only: inserting here would fail while the brand itself is being deleted
+        UPDATE brand_wishlist_state
+        SET version = version + 1,
+            saved_count = GREATEST(saved_count - 1, 0),
+            changes_since_fit = changes_since_fit + 1,
+            updated_at = NOW()
+        WHERE user_id = brand;
+    END IF;
+
+    IF TG_OP = 'UPDATE' AND NEW.cluster IS NOT DISTINCT FROM OLD.cluster THEN
+        RETURN NULL;
+    END IF;
+
+    -- Members move by exactly the contribution they were added with
+    IF TG_OP IN ('DELETE', 'UPDATE') AND OLD.contribution IS NOT NULL THEN
+        UPDATE brand_wishlist_centroids
+        SET embedding_sum = embedding_sum - OLD.contribution,
+            member_count = member_count - 1,
+            updated_at = NOW()
+        WHERE user_id = OLD.user_id AND cluster = OLD.cluster;
+        DELETE FROM brand_wishlist_centroids
+        WHERE user_id = OLD.user_id AND cluster = OLD.cluster AND member_count <= 0;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.contribution IS NOT NULL THEN
+        INSERT INTO brand_wishlist_centroids (user_id, cluster, embedding_sum, member_count)
+        VALUES (NEW.user_id, NEW.cluster, NEW.contribution, 1)
+        ON CONFLICT (user_id, cluster) DO UPDATE SET
+            embedding_sum = brand_wishlist_centroids.embedding_sum + EXCLUDED.embedding_sum,
+            member_count = brand_wishlist_centroids.member_count + 1,
+            updated_at = NOW();
+    END IF;
+
+    UPDATE brand_wishlist_state SET centroid_version = centroid_version + 1 WHERE user_id = brand;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER trg_assign_wishlist_cluster
+    BEFORE INSERT OR UPDATE OF cluster ON brand_wishlists
+    FOR EACH ROW EXECUTE FUNCTION assign_wishlist_cluster();
+CREATE OR REPLACE TRIGGER trg_wishlist_change
+    AFTER INSERT OR DELETE OR UPDATE OF cluster ON brand_wishlists
+    FOR EACH ROW EXECUTE FUNCTION apply_wishlist_change();
+
+-- Existing saves: one cluster per brand, re-fitted at the brand's next save / unsave
+UPDATE brand_wishlists bw SET cluster = 0
+FROM video_embeddings ve
+WHERE ve.creator_id = bw.creator_id AND ve.is_creator_aggregate = TRUE
+  AND ve.embedding IS NOT NULL AND bw.cluster IS NULL;
+-- Saves clustered before contribution existed: record the current aggregate
+-- and rebuild the sums from the contributions
+UPDATE brand_wishlists bw SET contribution = ve.embedding
+FROM video_embeddings ve
+WHERE ve.creator_id = bw.creator_id AND ve.is_creator_aggregate = TRUE
+  AND ve.embedding IS NOT NULL AND bw.cluster IS NOT NULL AND bw.contribution IS NULL;
+UPDATE brand_wishlists SET cluster = NULL WHERE cluster IS NOT NULL AND contribution IS NULL;
+UPDATE brand_wishlist_centroids c
+SET embedding_sum = sums.embedding_sum, member_count = sums.member_count, updated_at = NOW()
+FROM (
+    SELECT user_id, cluster, SUM(contribution) AS embedding_sum, COUNT(*) AS member_count
+    FROM brand_wishlists WHERE contribution IS NOT NULL
+    GROUP BY user_id, cluster
+) sums
+WHERE c.user_id = sums.user_id AND c.cluster = sums.cluster
+  AND (c.embedding_sum <> sums.embedding_sum OR c.member_count <> sums.member_count);
+DELETE FROM brand_wishlist_centroids c
+WHERE NOT EXISTS (
+    SELECT 1 FROM brand_wishlists bw
+    WHERE bw.user_id = c.user_id AND bw.cluster = c.cluster AND bw.contribution IS NOT NULL);
+INSERT INTO brand_wishlist_state (user_id, version, saved_count, changes_since_fit)
+SELECT user_id, 1, COUNT(*), COUNT(*) FROM brand_wishlists GROUP BY user_id
+ON CONFLICT (user_id) DO NOTHING;
+
+-- ============================================================
+-- Migration: Wishlist keyset pagination
+-- GET /brand/wishlist pages newest first on (created_at, creator_id); this
+-- index serves every page as a range scan. brand_wishlist_state.version also
+-- moves when a saved creator's profile or rate card changes (change outbox),
+-- so it can back the listing's ETag.
+-- ============================================================
+UPDATE brand_wishlists SET created_at = NOW() WHERE created_at IS NULL;
+ALTER TABLE brand_wishlists ALTER COLUMN created_at SET NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_brand_wishlists_user_saved
+    ON brand_wishlists(user_id, created_at DESC, creator_id DESC);
@@ -160,3 +160,407 @@ ALTER TABLE video_analyses ALTER COLUMN energy_level TYPE VARCHAR(50);
 ALTER TABLE video_analyses ALTER COLUMN aesthetic TYPE VARCHAR(50);
 ALTER TABLE video_analyses ALTER COLUMN setting TYPE VARCHAR(50);
 ALTER TABLE video_analyses ALTER COLUMN production_quality TYPE VARCHAR(50);
+
+-- =============================================================================
+-- Migration: Content fingerprints for re-upload dedup
+-- Re-uploaded clips reuse the existing analysis + embedding instead of
+-- re-running the pipeline (see lambdas/shared/dedup.py).
+-- =============================================================================
+ALTER TABLE video_uploads ADD COLUMN IF NOT EXISTS content_etag VARCHAR(100);
+ALTER TABLE video_uploads ADD COLUMN IF NOT EXISTS content_fingerprint VARCHAR(64);
+ALTER TABLE video_uploads ADD COLUMN IF NOT EXISTS frame_phash VARCHAR(64);
+ALTER TABLE video_uploads ADD COLUMN IF NOT EXISTS dedup_source_video_id UUID REFERENCES video_uploads(id) ON DELETE SET NULL;
+ALTER TABLE video_uploads ADD COLUMN IF NOT EXISTS dedup_match VARCHAR(20);
+CREATE INDEX IF NOT EXISTS idx_video_uploads_fingerprint ON video_uploads(content_fingerprint);
+CREATE INDEX IF NOT EXISTS idx_video_uploads_etag ON video_uploads(content_etag, file_size_bytes);
+CREATE INDEX IF NOT EXISTS idx_video_uploads_phash ON video_uploads(frame_phash);
+
+-- Daily dedup hit rates
+CREATE OR REPLACE VIEW video_dedup_stats AS
+SELECT DATE_TRUNC('day', created_at) AS day,
+    COUNT(*) FILTER (WHERE content_fingerprint IS NOT NULL) AS fingerprinted,
+    COUNT(*) FILTER (WHERE dedup_source_video_id IS NOT NULL) AS dedup_hits,
+    COUNT(*) FILTER (WHERE dedup_match = 'fingerprint') AS fingerprint_hits,
+    COUNT(*) FILTER (WHERE dedup_match = 'phash') AS phash_hits,
+    ROUND(
+        100.0 * COUNT(*) FILTER (WHERE dedup_source_video_id IS NOT NULL)
+        / NULLIF(COUNT(*) FILTER (WHERE content_fingerprint IS NOT NULL), 0),
+        1
+    ) AS hit_rate_pct
+FROM video_uploads
+GROUP BY DATE_TRUNC('day', created_at);
+
+-- =============================================================================
+-- Migration: Analysis result cache
+-- Identical frames analyzed with the same prompt + model reuse the stored
+-- result instead of calling Bedrock / Groq again (see lambdas/shared/analysis_cache.py).
+-- =============================================================================
+CREATE TABLE IF NOT EXISTS analysis_cache (
+    frame_hash VARCHAR(64) NOT NULL,
+    prompt_hash VARCHAR(64) NOT NULL,
+    model_id VARCHAR(150) NOT NULL,
+    raw_text TEXT,
+    analysis JSONB NOT NULL,
+    hit_count INTEGER DEFAULT 0,
+    created_at TIMESTAMP DEFAULT NOW(),
+    last_hit_at TIMESTAMP,
+    PRIMARY KEY (frame_hash, prompt_hash, model_id)
+);
+
+-- =============================================================================
+-- Migration: Bedrock circuit breakers
+-- Per-model breaker state shared by every Lambda container
+-- (see invoke_bedrock in lambdas/shared/bedrock_client.py).
+-- =============================================================================
+CREATE TABLE IF NOT EXISTS bedrock_circuit_breakers (
+    model_id VARCHAR(150) PRIMARY KEY,
+    state VARCHAR(10) NOT NULL DEFAULT 'closed' CHECK (state IN ('closed', 'open')),
+    failure_count INTEGER NOT NULL DEFAULT 0,
+    opened_at TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+
+-- =============================================================================
+-- Migration: Per-region Bedrock circuit breakers
+-- Breakers are tracked per (model, region) so invoke_bedrock can fail over to
+-- BEDROCK_FAILOVER_REGIONS while one region is tripped.
+-- =============================================================================
+ALTER TABLE bedrock_circuit_breakers ADD COLUMN IF NOT EXISTS region VARCHAR(30) NOT NULL DEFAULT 'us-east-1';
+ALTER TABLE bedrock_circuit_breakers DROP CONSTRAINT IF EXISTS bedrock_circuit_breakers_pkey;
+ALTER TABLE bedrock_circuit_breakers ADD PRIMARY KEY (model_id, region);
+
+-- =============================================================================
+-- Migration: Windowed breaker failures
+-- failure_count counts failures since window_started_at; a failure more than
+-- BREAKER_FAILURE_WINDOW_SECONDS after the window started begins a new one.
+-- =============================================================================
+ALTER TABLE bedrock_circuit_breakers ADD COLUMN IF NOT EXISTS window_started_at TIMESTAMP;
+
+-- =============================================================================
+-- Migration: Guardrail path per analysis
+-- Records how the guardrail ran for each video (see GUARDRAIL_MODE in
+-- lambdas/video_analyzer/handler.py): output, output_intervened, input,
+-- input_bypassed, cached, batch, off, ...
+-- =============================================================================
+ALTER TABLE video_analyses ADD COLUMN IF NOT EXISTS guardrail_path VARCHAR(30);
+
+-- =============================================================================
+-- Migration: Embedding store
+-- embedding_input (already present) is now written; the hash + model let
+-- shared/embeddings.py reuse vectors for unchanged inputs instead of calling Titan.
+-- =============================================================================
+ALTER TABLE video_embeddings ADD COLUMN IF NOT EXISTS embedding_input_hash VARCHAR(64);
+ALTER TABLE video_embeddings ADD COLUMN IF NOT EXISTS embedding_model VARCHAR(100);
+CREATE INDEX IF NOT EXISTS idx_embeddings_input_hash ON video_embeddings(embedding_input_hash, embedding_model)
+    WHERE is_creator_aggregate = FALSE;
+
+-- =============================================================================
+-- Migration: Quantized search indexes
+-- brand_search only ranks creator aggregate rows. These partial HNSW expression
+-- indexes let it take coarse candidates from a compact index and re-rank them
+-- with the stored vector(1024) (SEARCH_INDEX_MODE=halfvec|binary). Requires
+-- pgvector >= 0.7. The queries in lambdas/brand_search/handler.py must use the
+-- exact same expressions for the planner to pick these indexes.
+-- On large tables, run these statements by hand with CREATE INDEX CONCURRENTLY.
+-- =============================================================================
+ALTER EXTENSION vector UPDATE;
+CREATE INDEX IF NOT EXISTS idx_embeddings_aggregate_halfvec ON video_embeddings
+    USING hnsw ((embedding::halfvec(1024)) halfvec_cosine_ops)
+    WHERE is_creator_aggregate = TRUE;
+CREATE INDEX IF NOT EXISTS idx_embeddings_aggregate_binary ON video_embeddings
+    USING hnsw ((binary_quantize(embedding)::bit(1024)) bit_hamming_ops)
+    WHERE is_creator_aggregate = TRUE;
+
+-- =============================================================================
+-- Migration: Incremental creator embedding
+-- Running (un-normalized) sum + count of each creator's per-video embeddings,
+-- maintained by a trigger on every insert / delete / replace in
+-- video_embeddings (including ON DELETE CASCADE). profile_aggregator writes
+-- the aggregate row as l2_normalize(embedding_sum) instead of re-reading and
+-- averaging every vector; it rebuilds from SUM() when video_count disagrees
+-- with the per-video rows.
+-- =============================================================================
+CREATE TABLE IF NOT EXISTS creator_embedding_state (
+    creator_id UUID PRIMARY KEY REFERENCES creators(id) ON DELETE CASCADE,
+    embedding_sum vector(1024) NOT NULL,
+    video_count INTEGER NOT NULL DEFAULT 0,
+    rebuilt_at TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_embeddings_creator ON video_embeddings(creator_id)
+    WHERE is_creator_aggregate = FALSE;
+
+CREATE OR REPLACE FUNCTION apply_creator_embedding_state() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') AND OLD.is_creator_aggregate IS NOT TRUE
+       AND OLD.embedding IS NOT NULL AND OLD.creator_id IS NOT NULL THEN
+        UPDATE creator_embedding_state
+        SET embedding_sum = embedding_sum - OLD.embedding,
+            video_count = video_count - 1,
+            updated_at = NOW()
+        WHERE creator_id = OLD.creator_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.is_creator_aggregate IS NOT TRUE
+       AND NEW.embedding IS NOT NULL AND NEW.creator_id IS NOT NULL THEN
+        INSERT INTO creator_embedding_state (creator_id, embedding_sum, video_count)
+        VALUES (NEW.creator_id, NEW.embedding, 1)
+        ON CONFLICT (creator_id) DO UPDATE SET
+            embedding_sum = creator_embedding_state.embedding_sum + EXCLUDED.embedding_sum,
+            video_count = creator_embedding_state.video_count + 1,
+            updated_at = NOW();
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER trg_creator_embedding_state
+    AFTER INSERT OR DELETE OR UPDATE OF embedding, creator_id, is_creator_aggregate
+    ON video_embeddings
+    FOR EACH ROW EXECUTE FUNCTION apply_creator_embedding_state();
+
+INSERT INTO creator_embedding_state (creator_id, embedding_sum, video_count, rebuilt_at)
+SELECT creator_id, SUM(embedding), COUNT(*), NOW()
+FROM video_embeddings
+WHERE is_creator_aggregate = FALSE AND embedding IS NOT NULL AND creator_id IS NOT NULL
+GROUP BY creator_id
+ON CONFLICT (creator_id) DO NOTHING;
+
+-- =============================================================================
+-- Migration: Incremental style profile
+-- Per-creator value counts for the style fields, topics and face / text flags,
+-- maintained by a trigger on video_analyses. profile_aggregator derives
+-- style_profile from these rows (lambdas/shared/style_state.py);
+-- style_count_rows() is shared by the trigger and the from-scratch recount
+-- that scripts/check_style_state.py diffs against.
+-- =============================================================================
+CREATE TABLE IF NOT EXISTS creator_style_counts (
+    creator_id UUID REFERENCES creators(id) ON DELETE CASCADE,
+    field VARCHAR(30) NOT NULL,
+    value TEXT NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    last_video_at TIMESTAMP,
+    PRIMARY KEY (creator_id, field, value)
+);
+
+-- STRICT keeps the planner from inlining it: inlined with a whole-row argument
+-- under GROUP BY, PostgreSQL 16 fails with "variable not found in subplan
+-- target list" (the backfill below and shared/style_state.py's recount)
+CREATE OR REPLACE FUNCTION style_count_rows(r video_analyses)
+RETURNS TABLE (field TEXT, value TEXT) AS $$
+    SELECT f.field, f.value
+    FROM (
+        VALUES ('_videos', ''),
+               ('energy_level', r.energy_level::text),
+               ('aesthetic', r.aesthetic::text),
+               ('setting', r.setting::text),
+               ('production_quality', r.production_quality::text),
+               ('content_type', r.content_type::text),
+               ('face_visible', CASE WHEN r.face_visible THEN 'true' END),
+               ('has_text_overlay', CASE WHEN r.has_text_overlay THEN 'true' END)
+        UNION ALL
+        SELECT DISTINCT 'topic', t
+        FROM jsonb_array_elements_text(
+            CASE WHEN jsonb_typeof(r.topics) = 'array' THEN r.topics ELSE '[]'::jsonb END
+        ) t
+    ) f(field, value)
+    WHERE f.value IS NOT NULL AND (f.value <> '' OR f.field = '_videos');
+$$ LANGUAGE sql IMMUTABLE STRICT;
+
+CREATE OR REPLACE FUNCTION apply_style_counts(r video_analyses, delta INTEGER) RETURNS void AS $$
+BEGIN
+    IF r.creator_id IS NULL THEN
+        RETURN;
+    END IF;
+
+    IF delta < 0 THEN
+        -- UPDATE only: on a creator delete the counters may already be gone.
+        -- last_video_at is recomputed from the analyses still holding the
+        -- value (r is no longer among them), so ties keep favouring the
+        -- newest video after a replace or delete.
+        UPDATE creator_style_counts s
+        SET count = s.count + delta,
+            last_video_at = (
+                SELECT MAX(vu.created_at)
+                FROM video_analyses va
+                JOIN video_uploads vu ON vu.id = va.video_id
+                CROSS JOIN LATERAL style_count_rows(va) f
+                WHERE va.creator_id = r.creator_id AND f.field = s.field AND f.value = s.value
+            )
+        FROM style_count_rows(r) d
+        WHERE s.creator_id = r.creator_id AND s.field = d.field AND s.value = d.value;
+    ELSE
+        INSERT INTO creator_style_counts AS s (creator_id, field, value, count, last_video_at)
+        SELECT r.creator_id, d.field, d.value, delta,
+               (SELECT created_at FROM video_uploads WHERE id = r.video_id)
+        FROM style_count_rows(r) d
+        ON CONFLICT (creator_id, field, value) DO UPDATE SET
+            count = s.count + EXCLUDED.count,
+            last_video_at = GREATEST(s.last_video_at, EXCLUDED.last_video_at);
+    END IF;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION apply_creator_style_counts() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        PERFORM apply_style_counts(OLD, -1);
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        PERFORM apply_style_counts(NEW, 1);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER trg_creator_style_counts
+    AFTER INSERT OR DELETE OR UPDATE ON video_analyses
+    FOR EACH ROW EXECUTE FUNCTION apply_creator_style_counts();
+
+INSERT INTO creator_style_counts (creator_id, field, value, count, last_video_at)
+SELECT va.creator_id, d.field, d.value, COUNT(*), MAX(vu.created_at)
+FROM video_analyses va
+JOIN video_uploads vu ON va.video_id = vu.id
+CROSS JOIN LATERAL style_count_rows(va) d
+WHERE va.creator_id IS NOT NULL
+GROUP BY va.creator_id, d.field, d.value
+ON CONFLICT (creator_id, field, value) DO NOTHING;
+
+-- =============================================================================
+-- Migration: Debounced profile aggregation
+-- One pending job per creator (AGGREGATION_MODE=queued in profile_aggregator).
+-- Repeat requests during a burst bump request_count and push run_after back
+-- (capped from first_requested_at); worker_handler claims due rows with
+-- FOR UPDATE SKIP LOCKED.
+-- =============================================================================
+CREATE TABLE IF NOT EXISTS aggregation_jobs (
+    creator_id UUID PRIMARY KEY REFERENCES creators(id) ON DELETE CASCADE,
+    video_id UUID,
+    request_count INTEGER NOT NULL DEFAULT 1,
+    first_requested_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    last_requested_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    run_after TIMESTAMP NOT NULL DEFAULT NOW(),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_aggregation_jobs_run_after ON aggregation_jobs(run_after);
+
+-- =============================================================================
+-- Migration: Search sync queue
+-- Creators waiting to be (re)indexed in OpenSearch; one row per creator so
+-- repeated changes coalesce. Drained in batches by opensearch_sync (_bulk).
+-- =============================================================================
+CREATE TABLE IF NOT EXISTS search_sync_queue (
+    creator_id UUID PRIMARY KEY,
+    reason VARCHAR(50),
+    enqueued_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    run_after TIMESTAMP NOT NULL DEFAULT NOW(),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_search_sync_queue_enqueued ON search_sync_queue(enqueued_at);
+
+-- =============================================================================
+-- Migration: Change outbox
+-- Triggers record every change to the data search and caches depend on
+-- (creators, rate_cards, creator aggregate embeddings) in the same transaction
+-- as the change. lambdas/outbox_consumer claims unprocessed rows with
+-- SKIP LOCKED and fans them out (lambdas/shared/outbox.py): search sync queue,
+-- neighbor lists, wishlist centroids and versions. Delivery is at-least-once;
+-- every handler is idempotent.
+-- =============================================================================
+CREATE TABLE IF NOT EXISTS change_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    entity VARCHAR(30) NOT NULL,
+    creator_id UUID NOT NULL,
+    op VARCHAR(10) NOT NULL,
+    changed_fields TEXT[],
+    created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    processed_at TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_change_outbox_pending ON change_outbox(id) WHERE processed_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_change_outbox_processed ON change_outbox(processed_at) WHERE processed_at IS NOT NULL;
+
+CREATE OR REPLACE FUNCTION record_change() RETURNS trigger AS $$
+DECLARE
+    changed TEXT[];
+    row_creator UUID;
+BEGIN
+    -- Fields of NEW / OLD are resolved when a statement is first run, so
+    -- table-specific columns are only read inside that table's branch
+    IF TG_TABLE_NAME = 'video_embeddings' THEN
+        IF COALESCE(NEW.is_creator_aggregate, OLD.is_creator_aggregate) IS NOT TRUE THEN
+            RETURN NULL;  -- per-video rows only feed the aggregate
+        END IF;
+    END IF;
+
+    IF TG_OP = 'UPDATE' THEN
+        -- Only fields that actually changed; bookkeeping columns don't count
+        SELECT array_agg(n.key ORDER BY n.key) INTO changed
+        FROM jsonb_each(to_jsonb(NEW)) n
+        WHERE n.value IS DISTINCT FROM (to_jsonb(OLD) -> n.key)
+          AND n.key <> ALL (TG_ARGV[1:]);
+        IF changed IS NULL THEN
+            RETURN NULL;
+        END IF;
+    END IF;
+
+    IF TG_TABLE_NAME = 'creators' THEN
+        row_creator := COALESCE(NEW.id, OLD.id);
+    ELSE
+        row_creator := COALESCE(NEW.creator_id, OLD.creator_id);
+    END IF;
+    IF row_creator IS NULL THEN
+        RETURN NULL;
+    END IF;
+
+    INSERT INTO change_outbox (entity, creator_id, op, changed_fields)
+    VALUES (TG_ARGV[0], row_creator, TG_OP, changed);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE TRIGGER trg_outbox_creators
+    AFTER INSERT OR UPDATE OR DELETE ON creators
+    FOR EACH ROW EXECUTE FUNCTION record_change('creator', 'updated_at', 'mediakit_views');
+CREATE OR REPLACE TRIGGER trg_outbox_rate_cards
+    AFTER INSERT OR UPDATE OR DELETE ON rate_cards
+    FOR EACH ROW EXECUTE FUNCTION record_change('rate_card', 'updated_at');
+CREATE OR REPLACE TRIGGER trg_outbox_creator_embedding
+    AFTER INSERT OR UPDATE OR DELETE ON video_embeddings
+    FOR EACH ROW EXECUTE FUNCTION record_change('creator_embedding', 'created_at');
+
+-- =============================================================================
+-- Migration: Precomputed creator neighbors
+-- Top-K most similar creators per creator (cosine between aggregate
+-- embeddings), read by GET /creator/{id}/similar in one indexed lookup.
+-- Refreshed incrementally from the change outbox when an aggregate changes
+-- (lambdas/shared/neighbors.py) and in full nightly by the neighbor refresh
+-- job, which recomputes every list older than a day.
+-- =============================================================================
+CREATE TABLE IF NOT EXISTS creator_neighbors (
+    creator_id UUID NOT NULL REFERENCES creators(id) ON DELETE CASCADE,
+    neighbor_id UUID NOT NULL REFERENCES creators(id) ON DELETE CASCADE,
+    similarity REAL NOT NULL,
+    computed_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (creator_id, neighbor_id)
+);
+CREATE INDEX IF NOT EXISTS idx_creator_neighbors_rank ON creator_neighbors(creator_id, similarity DESC);
+CREATE INDEX IF NOT EXISTS idx_creator_neighbors_neighbor ON creator_neighbors(neighbor_id);
+
+CREATE TABLE IF NOT EXISTS creator_neighbor_state (
+    creator_id UUID PRIMARY KEY REFERENCES creators(id) ON DELETE CASCADE,
+    refreshed_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+CREATE INDEX IF NOT EXISTS idx_creator_neighbor_state_refreshed ON creator_neighbor_state(refreshed_at);
+
+-- =============================================================================
+-- Migration: Outbox transaction ids
+-- The id of the transaction that wrote each change_outbox row, so readers can
+-- ask which changes a pg_snapshot does not include (the search snapshot
+-- builder's "changed since" check). Timestamps can't answer that: they are
+-- taken when the writer's transaction starts, not when it commits.
+-- =============================================================================
+ALTER TABLE change_outbox ADD COLUMN IF NOT EXISTS xact_id xid8 NOT NULL DEFAULT pg_current_xact_id();
+CREATE INDEX IF NOT EXISTS idx_change_outbox_xact ON change_outbox(xact_id);